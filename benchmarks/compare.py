@@ -0,0 +1,50 @@
+"""
+Compare two benchmark results written by `run.py`.
+
+    python benchmarks/compare.py before.json after.json --threshold 1.2
+
+Prints each time in both runs and their ratio, and exits with status 1 if any time grew by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Ratio of after to before above which a time counts as a regression",
+    )
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+
+    print(f"before: {before['commit']}\nafter:  {after['commit']}\n")
+    print(
+        f"{'aircraft':>8}  {'benchmark':<26} {'before':>10} {'after':>10} {'ratio':>7}"
+    )
+    regressions = 0
+    for size, results in after["results"].items():
+        for name, value in results.items():
+            if not name.endswith("_ms") or name not in before["results"].get(size, {}):
+                continue
+            previous = before["results"][size][name]
+            ratio = value / previous if previous > 0.0 else float("inf")
+            flag = ""
+            if ratio > args.threshold:
+                regressions += 1
+                flag = "  slower"
+            print(
+                f"{size:>8}  {name:<26} {previous:>10.3f} {value:>10.3f} {ratio:>7.2f}{flag}"
+            )
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,168 @@
+"""
+Benchmarks of the simulator at increasing numbers of aircraft.
+
+Scenarios are generated with `simulator.scenario_generator`, then loading, ticking, queueing actions and building the dynamic and static data are timed on each.
+Results are written as JSON, with the commit and settings they were measured at, so runs can be compared with `compare.py`:
+
+    python benchmarks/run.py --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/compare.py benchmarks/results/before.json benchmarks/results/after.json
+
+Times are the median over repeats, in milliseconds.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from simulator import Simulator, scenario_generator, settings
+from simulator.state import State
+
+
+SIZES = [10, 100, 1000, 10000]  # Numbers of aircraft benchmarked
+CATEGORY = "Generated"  # Category of the generated scenarios
+
+
+def benchmark(num_aircraft: int, repeats: int) -> dict:
+    """
+    Time each operation on a generated scenario of `num_aircraft` aircraft, already written to the scenario directory.
+    """
+
+    name = f"N{num_aircraft}"
+    scenario_dir = os.path.join(settings.SCENARIO_DIR, CATEGORY, name)
+    results = {}
+
+    results["load_source_ms"] = _time(
+        lambda: State.load(scenario_dir, compiled=False), repeats
+    )
+    State.load(scenario_dir)  # Writes the cache
+    results["load_cached_ms"] = _time(lambda: State.load(scenario_dir), repeats)
+
+    sim = Simulator(CATEGORY, name)
+    sim.evolve(1.0)
+    step = settings.TIME_STEP_DELTA.total_seconds()
+    results["tick_ms"] = _time(lambda: sim.evolve(step), 10 * repeats)
+
+    actions = [
+        {
+            "time": (sim.state.time + datetime.timedelta(seconds=n)).strftime(
+                settings.TIME_FORMAT
+            ),
+            "agent": "human",
+            "callsign": callsign,
+            "kind": "heading",
+            "subkind": "relative",
+            "value": "10",
+        }
+        for n, callsign in enumerate(sim.state.aircraft_store.callsigns[:100])
+    ]
+    forks = [sim.state.fork() for _ in range(repeats)]
+    results["queue_100_actions_ms"] = _time(
+        lambda: forks.pop().queue_actions(actions), repeats
+    )
+
+    results["dynamic_data_ms"] = _time(sim.dynamic_data, repeats)
+    results["dynamic_data_columns_ms"] = _time(
+        lambda: sim.dynamic_data(format="columns"), repeats
+    )
+    version = sim.state.version
+    sim.evolve(step)
+    results["dynamic_data_since_ms"] = _time(
+        lambda: sim.dynamic_data_since(version), repeats
+    )
+
+    def cold_static_data():
+        sim.invalidate_static_data()
+        sim.static_data()
+
+    results["static_data_cold_ms"] = _time(cold_static_data, repeats)
+    results["static_data_json_ms"] = _time(sim.static_data_json, repeats)
+    results["memory_bytes"] = sim.state.memory_usage()
+
+    return results
+
+
+def _time(function, repeats: int) -> float:
+    """
+    Median time of `repeats` calls of `function`, in milliseconds.
+    """
+
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    return 1e3 * float(np.median(durations))
+
+
+def _commit() -> str:
+    """
+    Commit of the working tree, or None outside a git checkout.
+    """
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="JSON file to write results to")
+    parser.add_argument(
+        "--scenario-dir",
+        help="Directory to generate scenarios in (a temporary directory by default)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        # Generated scenarios are loaded through a Simulator, so are put in their own scenario directory
+        settings.SCENARIO_DIR = args.scenario_dir or temporary_dir
+        for num_aircraft in args.sizes:
+            scenario_generator.generate(
+                os.path.join(settings.SCENARIO_DIR, CATEGORY, f"N{num_aircraft}"),
+                num_aircraft,
+            )
+
+        report = {
+            "commit": _commit(),
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "settings": {
+                name: value
+                for name, value in settings.ENV.dict().items()
+                if name != "RESOURCES_DIR"
+            },
+            "results": {},
+        }
+        for num_aircraft in args.sizes:
+            results = benchmark(num_aircraft, args.repeats)
+            report["results"][str(num_aircraft)] = results
+            print(
+                f"{num_aircraft:>6} aircraft: "
+                + ", ".join(
+                    f"{name} {value:.3f}"
+                    for name, value in results.items()
+                    if name.endswith("_ms")
+                )
+            )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
@@ -1 +1,11 @@
-from .simulator import Simulator
+def __getattr__(name: str):
+    """
+    Import the `Simulator` on first use, so importing the package alone does not import its dependencies.
+    """
+
+    if name == "Simulator":
+        from .simulator import Simulator
+
+        return Simulator
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
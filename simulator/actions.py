@@ -0,0 +1,241 @@
+import bisect
+import datetime
+import sys
+
+import pandas as pd
+
+from . import settings
+from .memory import object_bytes
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class ActionQueue:
+    """
+    Time-ordered queue of actions.
+    Actions are kept sorted by time, with ties kept in the order they were queued.
+    A cursor marks the first action that has not yet been due, so each tick only looks at the actions it delivers.
+    """
+
+    columns = ["time", "agent", "callsign", "kind", "subkind", "value"]
+
+    def __init__(self):
+        """
+        Construct an empty queue.
+        """
+
+        self.times = []  # Sorted action times (nanoseconds since the epoch)
+        self.records = {  # Remaining action fields, in the same order as `times`
+            name: [] for name in self.columns[1:]
+        }
+        self.added = []  # Version at which each action was queued
+        self.consumed = []  # Version at which each action was delivered, or -1
+        self.reordered = 0  # Last version at which an insertion moved queued actions
+        self.cursor = 0  # Index of the first action that has not yet been due
+        self.cursor_time = None  # End of the last window passed to `due`
+        self._frame = None  # Lazily materialised DataFrame of the queue
+        self._time_strings = None  # Lazily formatted action times
+        self._shared = False  # Whether the lists are shared with a copy of the queue
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @staticmethod
+    def from_frame(frame: pd.DataFrame):
+        """
+        Build a queue from a DataFrame indexed by time.
+        """
+
+        queue = ActionQueue()
+        queue.extend(
+            pd.DatetimeIndex(frame.index).asi8.tolist(),
+            {name: frame[name].tolist() for name in queue.records},
+        )
+
+        return queue
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Materialise the queue as a DataFrame indexed by time.
+        """
+
+        if self._frame is None:
+            self._frame = pd.DataFrame(
+                self.records,
+                index=pd.DatetimeIndex(
+                    pd.to_datetime(self.times, unit="ns"), name="time"
+                ),
+                columns=self.columns[1:],
+            )
+
+        return self._frame
+
+    def copy(self):
+        """
+        Copy the queue, including its cursor.
+        The lists of actions are shared until either queue is extended.
+        """
+
+        queue = ActionQueue()
+        queue.times = self.times
+        queue.records = self.records
+        queue.added = self.added
+        queue.consumed = self.consumed
+        queue.reordered = self.reordered
+        queue._shared = self._shared = True
+        queue.cursor = self.cursor
+        queue.cursor_time = self.cursor_time
+        queue._frame = self._frame
+        queue._time_strings = self._time_strings
+
+        return queue
+
+    def time_strings(self) -> list[str]:
+        """
+        Action times formatted as strings, in time order.
+        """
+
+        if self._time_strings is None:
+            self._time_strings = [str(pd.Timestamp(time)) for time in self.times]
+
+        return self._time_strings
+
+    def extend(self, times: list[int], records: dict, version: int = 0):
+        """
+        Queue actions in bulk.
+        `times` are nanoseconds since the epoch and `records` maps every other column to a list of values.
+        Actions later than all queued actions are appended, others are inserted in time order.
+        `version` is recorded against each new action, and against the queue if an insertion moves actions already queued.
+        """
+
+        self._unshare()
+
+        for n, time in enumerate(times):
+            if not self.times or time >= self.times[-1]:
+                position = len(self.times)
+                self.times.append(time)
+                for name, values in records.items():
+                    self.records[name].append(values[n])
+                self.added.append(version)
+                self.consumed.append(-1)
+            else:
+                position = bisect.bisect_right(self.times, time)
+                self.times.insert(position, time)
+                for name, values in records.items():
+                    self.records[name].insert(position, values[n])
+                self.added.insert(position, version)
+                self.consumed.insert(position, -1)
+                self.reordered = version
+
+            if position < self.cursor:
+                self.cursor += 1
+
+        self._frame = None
+        self._time_strings = None
+
+    def due(self, start: int, end: int) -> range:
+        """
+        Indices of the actions with times in [`start`, `end`), advancing the cursor past them.
+        Actions before `start` that were never delivered are skipped.
+        """
+
+        if self.cursor_time is not None and self.cursor_time > start:
+            start = self.cursor_time
+
+        first = self.cursor
+        if first < len(self.times) and self.times[first] < start:
+            first = bisect.bisect_left(self.times, start, lo=first)
+
+        last = first
+        while last < len(self.times) and self.times[last] < end:
+            last += 1
+
+        self.cursor = last
+        self.cursor_time = end
+
+        return range(first, last)
+
+    def consume(self, n: int, version: int):
+        """
+        Mark the `n`th action as delivered at `version`.
+        """
+
+        self._unshare()
+        self.consumed[n] = version
+
+    def _unshare(self):
+        """
+        Take private copies of lists shared with a copy of the queue, before changing them.
+        """
+
+        if self._shared:
+            self.times = list(self.times)
+            self.records = {name: list(values) for name, values in self.records.items()}
+            self.added = list(self.added)
+            self.consumed = list(self.consumed)
+            self._shared = False
+
+    def compact(self):
+        """
+        Share one string object between equal agents, callsigns, kinds and subkinds, so each action only holds references to them.
+        """
+
+        self._unshare()
+        for name in ["agent", "callsign", "kind", "subkind"]:
+            self.records[name] = [
+                sys.intern(value) if isinstance(value, str) else value
+                for value in self.records[name]
+            ]
+        self._frame = None
+
+    def memory_usage(self) -> int:
+        """
+        Bytes held by the queue's lists and the objects they refer to.
+        """
+
+        seen = set()
+        return object_bytes([self.times, self.added, self.consumed], seen) + sum(
+            object_bytes([values], seen) for values in self.records.values()
+        )
+
+    def record(self, n: int) -> dict:
+        """
+        Get the fields of the `n`th action in time order.
+        """
+
+        return {"time": self.times[n]} | {
+            name: values[n] for name, values in self.records.items()
+        }
+
+
+def to_ns(time: datetime.datetime) -> int:
+    """
+    Convert a naive datetime to nanoseconds since the epoch.
+    """
+
+    return (time - EPOCH) // datetime.timedelta(microseconds=1) * 1000
+
+
+def parse_actions(actions: list[dict]):
+    """
+    Parse a list of action dicts into the `times` and `records` taken by `ActionQueue.extend`.
+    All times are parsed in one vectorised call.
+    Fields other than the time may be left out, and are then None.
+    """
+
+    times = pd.to_datetime(
+        [action["time"] for action in actions], format=settings.TIME_FORMAT
+    ).asi8.tolist()
+
+    records = {name: [] for name in ActionQueue.columns[1:]}
+    for action in actions:
+        for name, values in records.items():
+            values.append(action.get(name))
+
+        # Convert values to correct types
+        if action.get("kind") in ["flight_level", "heading", "speed"]:
+            if action.get("subkind") == "absolute":
+                records["value"][-1] = float(action["value"])
+
+    return times, records
@@ -0,0 +1,393 @@
+import numpy as np
+import pandas as pd
+
+from . import settings
+from .history import PositionHistory
+from .memory import object_bytes
+
+
+class AircraftStore:
+    """
+    Struct-of-arrays store of the aircraft in a simulation.
+    Every field is held in one contiguous array, with one row per aircraft.
+    Past positions are held in a `PositionHistory`, with rows in the same order.
+
+    A compact store (see `compacted`) holds strings as integer codes into `categories`, and routes as codes of distinct routes, each an array of indices into the `fix` category.
+    Indexing the store and `get` return the values themselves in either form, while `data` holds the codes.
+    """
+
+    fields = {  # Field names and dtypes, in DataFrame column order
+        "type": "object",  # Vortex type of aircraft
+        "agent": "object",  # Agent controlling the aircraft
+        "bay": "object",  # Bay to hold the aircraft strip
+        "lat": "float64",  # Degrees North/South
+        "lon": "float64",  # Degrees East/West
+        "flight_level": "float64",  # Flight level
+        "target_flight_level": "float64",  # Target flight level
+        "heading": "float64",  # Degrees clockwise from North
+        "target_heading": "float64",  # Degrees clockwise from North
+        "speed": "float64",  # Knots
+        "target_speed": "float64",  # Knots
+        "rise": "float64",  # Flight levels per second (absolute value)
+        "max_rise_rate": "float64",  # Maximum rate of rise and fall (flight_levels per second)
+        "turn": "float64",  # Degrees clockwise per second
+        "max_turn_rate": "float64",  # Maximum rate of turn (degrees per second)
+        "acceleration": "float64",  # Knots
+        "max_acceleration": "float64",  # Knots
+        "route": "object",  # List of fixes to route through
+    }
+    coded_fields = ["type", "agent", "bay", "route"]  # Held as codes when compact
+    position_fields = ["lat", "lon"]  # Fields kept in float64 when compact
+
+    def __init__(self, history_depth: int = None):
+        """
+        Construct an empty store, keeping `history_depth` past positions (settings.HISTORY_DEPTH by default).
+        """
+
+        self.callsigns = []  # Callsign of each row
+        self.index = {}  # Row of each callsign
+        self.data = {
+            name: np.empty(0, dtype=dtype) for name, dtype in self.fields.items()
+        }
+        self.versions = {  # State version at which each field of each row last changed
+            name: np.zeros(0, dtype=np.int64) for name in self.fields
+        }
+        self.history = PositionHistory(history_depth or settings.HISTORY_DEPTH)
+        self.dtypes = dict(self.fields)  # Dtype of each field array
+        self.categories = None  # Values of each coded field, or None if not compact
+
+    def __len__(self) -> int:
+        return len(self.callsigns)
+
+    def __contains__(self, callsign: str) -> bool:
+        return callsign in self.index
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if self.categories is not None and name in self.coded_fields:
+            return self._decode(name, self.data[name])
+        return self.data[name]
+
+    @staticmethod
+    def from_frame(frame: pd.DataFrame, history_depth: int = None):
+        """
+        Build a store from a DataFrame indexed by callsign.
+        Every past position starts at the current position.
+        """
+
+        if set(AircraftStore.fields) != set(frame.columns):
+            print(f"Expected headings: {list(AircraftStore.fields)}")
+            print(f"Given headings: {frame.columns}")
+            raise ValueError(
+                f"Column headings for aircraft dataframe differ to those expected"
+            )
+
+        store = AircraftStore(history_depth)
+        store.callsigns = frame.index.tolist()
+        store.index = {callsign: row for row, callsign in enumerate(store.callsigns)}
+        store.data = {
+            name: frame[name].to_numpy(dtype=dtype, copy=True)
+            for name, dtype in AircraftStore.fields.items()
+        }
+        store.versions = {
+            name: np.zeros(len(store.callsigns), dtype=np.int64)
+            for name in AircraftStore.fields
+        }
+        store.history = PositionHistory.filled(
+            store.history.depth, store.data["lat"], store.data["lon"]
+        )
+
+        return store
+
+    @staticmethod
+    def from_arrays(callsigns: list, data: dict, history_depth: int = None):
+        """
+        Build a store from a list of callsigns and a dict of one array per field, which are used without copying.
+        Every past position starts at the current position.
+        """
+
+        if set(AircraftStore.fields) != set(data):
+            raise ValueError(f"Fields for aircraft store differ to those expected")
+
+        store = AircraftStore(history_depth)
+        store.callsigns = list(callsigns)
+        store.index = {callsign: row for row, callsign in enumerate(store.callsigns)}
+        store.data = {name: data[name] for name in AircraftStore.fields}
+        store.versions = {
+            name: np.zeros(len(store.callsigns), dtype=np.int64)
+            for name in AircraftStore.fields
+        }
+        store.history = PositionHistory.filled(
+            store.history.depth, store.data["lat"], store.data["lon"]
+        )
+
+        return store
+
+    def to_frame(self, read_only: bool = False) -> pd.DataFrame:
+        """
+        Materialise the store as a DataFrame indexed by callsign.
+        The string fields of a compact store are categoricals.
+        If `read_only`, writing to the values of the DataFrame raises a ValueError.
+        """
+
+        columns = {}
+        for name in self.fields:
+            if self.categories is not None and name in ["type", "agent", "bay"]:
+                columns[name] = pd.Categorical.from_codes(
+                    self.data[name], self.categories[name]
+                )
+                if read_only:
+                    # Codes already of the categorical's own dtype are kept, not copied
+                    codes = columns[name].codes.copy()
+                    codes.flags.writeable = False
+                    columns[name] = pd.Categorical.from_codes(
+                        codes, self.categories[name]
+                    )
+            elif self.categories is not None and name == "route":
+                columns[name] = self[name]
+            else:
+                columns[name] = self.data[name].copy()
+            if read_only and isinstance(columns[name], np.ndarray):
+                columns[name].flags.writeable = False
+
+        # Without copying, each column keeps its own (possibly read-only) array
+        return pd.DataFrame(
+            columns, index=pd.Index(self.callsigns, dtype="object"), copy=False
+        )
+
+    def compacted(self, bay_names: list = None, float32: bool = False):
+        """
+        Copy the store into the compact form, with strings and routes held as codes.
+        Bays are coded in the order of `bay_names`, and other values in order of appearance.
+        If `float32`, fields other than the position are held in float32, which keeps them to about 7 significant figures.
+        """
+
+        if self.categories is not None:
+            raise ValueError(f"Aircraft store is already compact")
+
+        store = self.copy()
+        store.dtypes = dict(self.dtypes)
+        store.categories = {}
+        for name in ["type", "agent", "bay"]:
+            known = (bay_names or []) if name == "bay" else []
+            lookup = {value: code for code, value in enumerate(known)}
+            codes = [lookup.setdefault(value, len(lookup)) for value in self.data[name]]
+            if len(lookup) > np.iinfo(np.int16).max:
+                raise ValueError(f"Too many distinct values of {name} to code")
+            store.categories[name] = list(lookup)
+            store.data[name] = np.array(codes, dtype=np.int16)
+            store.dtypes[name] = np.int16
+
+        # Distinct routes are coded once, as arrays of fix indices
+        store.categories["route"] = []
+        fixes = {}
+        routes = {}
+        codes = np.empty(len(self), dtype=np.int32)
+        for row, route in enumerate(self.data["route"]):
+            key = tuple(route)
+            if key not in routes:
+                routes[key] = len(routes)
+                store.categories["route"].append(
+                    np.array(
+                        [fixes.setdefault(fix, len(fixes)) for fix in key],
+                        dtype=np.int32,
+                    )
+                )
+            codes[row] = routes[key]
+        store.categories["fix"] = list(fixes)
+        store.data["route"] = codes
+        store.dtypes["route"] = np.int32
+
+        for name, dtype in self.fields.items():
+            if float32 and dtype == "float64" and name not in self.position_fields:
+                store.data[name] = store.data[name].astype(np.float32)
+                store.dtypes[name] = np.float32
+
+        return store
+
+    def memory_usage(self) -> dict:
+        """
+        Bytes held by the field arrays (with the objects and categories they refer to), their versions and the position history.
+        """
+
+        fields = 0
+        seen = set()
+        for values in self.data.values():
+            fields += values.nbytes
+            if values.dtype == object:
+                fields += object_bytes(values, seen)
+        if self.categories is not None:
+            fields += sum(
+                object_bytes([values], seen) for values in self.categories.values()
+            )
+
+        return {
+            "aircraft": fields,
+            "versions": sum(values.nbytes for values in self.versions.values()),
+            "history": self.history.buffer.nbytes,
+        }
+
+    def copy(self):
+        """
+        Copy the store. Field arrays are copied, but the objects they hold are shared.
+        The callsigns and index are shared too, as they are replaced rather than changed when aircraft are added or removed.
+        """
+
+        store = AircraftStore()
+        store.callsigns = self.callsigns
+        store.index = self.index
+        store.data = {name: values.copy() for name, values in self.data.items()}
+        store.versions = {name: values.copy() for name, values in self.versions.items()}
+        store.history = self.history.copy()
+        store.dtypes = self.dtypes
+        store.categories = self.categories
+
+        return store
+
+    def take(self, rows: np.ndarray):
+        """
+        Copy of the aircraft in `rows`, in that order, with their versions and history.
+        """
+
+        store = AircraftStore(self.history.depth)
+        store.callsigns = [self.callsigns[row] for row in rows]
+        store.index = {callsign: n for n, callsign in enumerate(store.callsigns)}
+        store.data = {name: values[rows] for name, values in self.data.items()}
+        store.versions = {name: values[rows] for name, values in self.versions.items()}
+        store.history = self.history.take(rows)
+        store.dtypes = self.dtypes
+        store.categories = self.categories
+
+        return store
+
+    @staticmethod
+    def concatenate(stores: list):
+        """
+        Join stores of different aircraft into one, in order.
+        Compact stores code their values independently, so only full stores can be joined.
+        """
+
+        if any(store.categories is not None for store in stores):
+            raise ValueError(f"Only full aircraft stores can be joined")
+
+        store = AircraftStore(stores[0].history.depth)
+        store.callsigns = [callsign for other in stores for callsign in other.callsigns]
+        store.index = {callsign: n for n, callsign in enumerate(store.callsigns)}
+        if len(store.index) < len(store.callsigns):
+            raise ValueError(f"Aircraft stores to join share aircraft")
+        store.data = {
+            name: np.concatenate([other.data[name] for other in stores])
+            for name in store.fields
+        }
+        store.versions = {
+            name: np.concatenate([other.versions[name] for other in stores])
+            for name in store.fields
+        }
+        store.history = PositionHistory.concatenate([other.history for other in stores])
+
+        return store
+
+    def get(self, callsign: str, name: str):
+        """
+        Get the value of a field for one aircraft.
+        """
+
+        value = self.data[name][self.index[callsign]]
+        if self.categories is not None and name in self.coded_fields:
+            return self._decode(name, np.array([value]))[0]
+        return value
+
+    def set(self, callsign: str, name: str, value, version: int = 0):
+        """
+        Set the value of a field for one aircraft, recording the state `version` of the change.
+        """
+
+        self.data[name][self.index[callsign]] = self._encode(name, value)
+        self.versions[name][self.index[callsign]] = version
+
+    def set_many(self, callsigns: list, name: str, value, version: int = 0):
+        """
+        Set a field to the same value for many aircraft, recording the state `version` of the change.
+        The value is coded once, and written to every row in one go.
+        """
+
+        rows = np.array([self.index[callsign] for callsign in callsigns], dtype=np.intp)
+        self.data[name][rows] = self._encode(name, value)
+        self.versions[name][rows] = version
+
+    def append(self, callsign: str, values: dict, version: int = 0):
+        """
+        Add an aircraft to the end of the store.
+        """
+
+        if callsign in self.index:
+            raise ValueError(f"Aircraft {callsign} already exists")
+
+        for name, dtype in self.dtypes.items():
+            row = np.empty(1, dtype=dtype)
+            row[0] = self._encode(name, values[name])
+            self.data[name] = np.concatenate([self.data[name], row])
+            self.versions[name] = np.append(self.versions[name], version)
+        self.history.append(values["lat"], values["lon"])
+        self.index = self.index | {callsign: len(self.callsigns)}
+        self.callsigns = self.callsigns + [callsign]
+
+    def remove(self, callsign: str):
+        """
+        Remove an aircraft, preserving the order of the remaining rows.
+        """
+
+        if callsign not in self.index:
+            raise ValueError(f"Aircraft {callsign} does not exist")
+
+        row = self.index[callsign]
+        for name in self.fields:
+            self.data[name] = np.delete(self.data[name], row)
+            self.versions[name] = np.delete(self.versions[name], row)
+        self.history.remove(row)
+        self.callsigns = self.callsigns[:row] + self.callsigns[row + 1 :]
+        self.index = {other: n for n, other in enumerate(self.callsigns)}
+
+    def _encode(self, name: str, value):
+        """
+        Code a value of a field, adding it to the categories of a compact store if it is new.
+        Categories are replaced rather than changed, as copies of the store share them.
+        """
+
+        if self.categories is None or name not in self.coded_fields:
+            return value
+
+        if name == "route":
+            fixes = self.categories["fix"]
+            new_fixes = [fix for fix in dict.fromkeys(value) if fix not in fixes]
+            if new_fixes:
+                fixes = fixes + new_fixes
+                self.categories = self.categories | {"fix": fixes}
+            route = np.array([fixes.index(fix) for fix in value], dtype=np.int32)
+            for code, known in enumerate(self.categories["route"]):
+                if np.array_equal(known, route):
+                    return code
+            routes = self.categories["route"] + [route]
+            self.categories = self.categories | {"route": routes}
+            return len(routes) - 1
+
+        categories = self.categories[name]
+        if value not in categories:
+            self.categories = self.categories | {name: categories + [value]}
+            return len(categories)
+        return categories.index(value)
+
+    def _decode(self, name: str, codes: np.ndarray) -> np.ndarray:
+        """
+        Values of a coded field, as an object array.
+        """
+
+        if name == "route":
+            fixes = self.categories["fix"]
+            categories = [
+                [fixes[fix] for fix in route] for route in self.categories["route"]
+            ]
+            values = np.empty(len(codes), dtype=object)
+            values[:] = [categories[code] for code in codes]
+            return values
+
+        return np.array(self.categories[name], dtype=object)[codes]
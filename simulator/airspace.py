@@ -1,22 +1,59 @@
-import json
-import pandas as pd
+import numpy as np
 import shapely.geometry
 
 
+MAX_PAIRS = 1 << 18  # Most candidate (point, volume) pairs held at once
+MAX_EDGE_TESTS = 1 << 20  # Most (point, edge) tests made at once
+
+
 class Airspace:
     """
     Region of three-dimensional airspace.
     """
 
-    def __init__(self, vols: list):
+    def __init__(self, vols: list, fixes=None):
         """
-        Construct an empty airspace.
+        Construct an airspace from a list of volumes.
+        Each volume is a dict with `min`/`max` flight levels, a `boundary` of points and optionally a list of `holes`, each a boundary of points.
+        Points are [lat, lon] pairs, or names of fixes looked up in the `fixes` DataFrame.
         """
 
         if vols is None:
             raise ValueError("Airspace must contain at least one volume.")
 
+        def resolve(point):
+            if isinstance(point, str):
+                if fixes is None or point not in fixes.index:
+                    raise ValueError(f"Unknown fix {point} in airspace boundary.")
+                return fixes.loc[point, "lat"], fixes.loc[point, "lon"]
+            return point
+
         self.vols = vols
+        self.rings = [  # Boundary and holes of each volume, in (lon, lat) coordinates
+            [
+                [(lon, lat) for lat, lon in map(resolve, boundary)]
+                for boundary in [vol["boundary"], *vol.get("holes", [])]
+            ]
+            for vol in vols
+        ]
+        self._areas = None  # Polygon of each volume, built on first use
+        self.min_levels = np.array([vol["min"] for vol in vols], dtype=float)
+        self.max_levels = np.array([vol["max"] for vol in vols], dtype=float)
+        self._index = None  # Index over this airspace alone, built on first query
+
+    @property
+    def areas(self) -> list:
+        """
+        Polygon of each volume, in (lon, lat) coordinates.
+        """
+
+        if self._areas is None:
+            self._areas = [
+                shapely.geometry.Polygon(boundary, holes)
+                for boundary, *holes in self.rings
+            ]
+
+        return self._areas
 
     def contains(self, lat: float, lon: float, flight_level: float):
         """
@@ -24,9 +61,245 @@ class Airspace:
         Points on the boundary are considered to be contained.
         """
 
-        for min, max, area in self.vols:
-            if flight_level < min or flight_level > max:
-                continue
-            if area.contains(shapely.geometry.Point(lon, lat)):
-                return True
-        return False
+        if self._index is None:
+            self._index = SectorIndex([self])
+
+        sectors, _ = self._index.locate([lat], [lon], [flight_level])
+        return bool(sectors[0] >= 0)
+
+
+class SectorIndex:
+    """
+    Index over the volumes of many airspaces, answering point-in-sector queries in bulk.
+    Volumes are compiled into flat arrays of bounds, flight levels and boundary edges, so a query is a handful of array operations however many volumes there are.
+    """
+
+    ARRAYS = [  # Compiled arrays, as saved by `to_arrays`
+        "sectors",
+        "vols",
+        "boxes",
+        "bounds",
+        "min_levels",
+        "max_levels",
+        "edges",
+    ]
+
+    def __init__(self, airspaces: list):
+        """
+        Compile the volumes of each airspace.
+        """
+
+        self.airspaces = airspaces
+        self.sectors = []  # Index of the airspace each volume belongs to
+        self.vols = []  # Index of each volume within its airspace
+        self.boxes = []  # Whether each volume is exactly its bounding box
+        areas = []
+        for sector, airspace in enumerate(airspaces):
+            for vol, area in enumerate(airspace.areas):
+                self.sectors.append(sector)
+                self.vols.append(vol)
+                self.boxes.append(area.equals(shapely.geometry.box(*area.bounds)))
+                areas.append(area)
+        self.sectors = np.array(self.sectors, dtype=int)
+        self.vols = np.array(self.vols, dtype=int)
+        self.boxes = np.array(self.boxes, dtype=bool)
+
+        self.bounds = np.array(  # (min_lon, min_lat, max_lon, max_lat) of each volume
+            [area.bounds for area in areas], dtype=float
+        ).reshape(-1, 4)
+        self.min_levels = np.concatenate(
+            [airspace.min_levels for airspace in airspaces] + [np.empty(0)]
+        )
+        self.max_levels = np.concatenate(
+            [airspace.max_levels for airspace in airspaces] + [np.empty(0)]
+        )
+
+        # Boundary edges of each volume, holes included, as (lon_1, lat_1, lon_2, lat_2), padded with zero-length edges
+        edges = [
+            np.concatenate(
+                [
+                    np.hstack([coords[:-1], coords[1:]])
+                    for coords in (
+                        np.array(ring.coords, dtype=float).reshape(-1, 2)
+                        for ring in [area.exterior, *area.interiors]
+                    )
+                ]
+            )
+            for area in areas
+        ]
+        num_edges = max([len(vol_edges) for vol_edges in edges], default=0)
+        self.edges = np.zeros((len(edges), num_edges, 4))
+        for n, vol_edges in enumerate(edges):
+            self.edges[n, : len(vol_edges)] = vol_edges
+            self.edges[n, len(vol_edges) :] = np.tile(vol_edges[-1, 2:], 2)
+
+    @staticmethod
+    def from_arrays(airspaces: list, arrays: dict):
+        """
+        Rebuild the index of `airspaces` from the arrays returned by `to_arrays`, without compiling the volumes again.
+        """
+
+        index = SectorIndex.__new__(SectorIndex)
+        index.airspaces = airspaces
+        for name in SectorIndex.ARRAYS:
+            setattr(index, name, arrays[name])
+
+        return index
+
+    def to_arrays(self) -> dict:
+        """
+        Compiled arrays of the index, by name.
+        """
+
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def locate(self, lat, lon, flight_level):
+        """
+        Find the airspace and volume containing each point.
+        Returns two integer arrays, with -1 for points outside every volume.
+        Points on a boundary are contained, and where volumes overlap the first airspace (and first volume within it) wins.
+        """
+
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        flight_level = np.asarray(flight_level, dtype=float)
+
+        sectors = np.full(lat.shape, -1, dtype=int)
+        vols = np.full(lat.shape, -1, dtype=int)
+
+        if len(lat) == 0 or len(self.bounds) == 0:
+            return sectors, vols
+
+        # Bin the points into columns of longitude, sorted by latitude within each column
+        num_columns = max(1, int(np.sqrt(len(lat))))
+        lon_0, lat_0 = lon.min(), lat.min()
+        width = max(lon.max() - lon_0, 1e-9) / num_columns
+        span = 2.0 * (lat.max() - lat_0) + 1.0
+        columns = np.clip(((lon - lon_0) / width).astype(int), 0, num_columns - 1)
+        keys = columns * span + (lat - lat_0)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+
+        # Expand each volume to the columns its bounding box overlaps
+        first_columns = np.clip(
+            np.floor((self.bounds[:, 0] - lon_0) / width), 0, num_columns - 1
+        ).astype(int)
+        last_columns = np.clip(
+            np.floor((self.bounds[:, 2] - lon_0) / width), -1, num_columns - 1
+        ).astype(int)
+        num_spans = np.maximum(last_columns - first_columns + 1, 0)
+        span_vols = np.repeat(np.arange(len(num_spans)), num_spans)
+        span_columns = first_columns[span_vols] + _ranges(num_spans)
+
+        # Each (volume, column) span covers a contiguous run of points, found with its latitudes clipped to those of the points
+        lat_range = lat.max() - lat_0
+        starts = np.searchsorted(
+            keys,
+            span_columns * span + np.clip(self.bounds[span_vols, 1] - lat_0, 0.0, None),
+            "left",
+        )
+        ends = np.searchsorted(
+            keys,
+            span_columns * span
+            + np.clip(self.bounds[span_vols, 3] - lat_0, None, lat_range),
+            "right",
+        )
+        counts = np.maximum(ends - starts, 0)
+
+        # Expand the spans to candidate pairs a batch at a time, keeping the pairs in volume order
+        batches = np.searchsorted(
+            np.cumsum(counts), np.arange(MAX_PAIRS, counts.sum(), MAX_PAIRS), "left"
+        )
+        found_vols = []
+        found_points = []
+        for batch in np.split(np.arange(len(counts)), batches + 1):
+            vol_batch, point_batch = self._test_pairs(
+                span_vols[batch],
+                starts[batch],
+                counts[batch],
+                order,
+                lat,
+                lon,
+                flight_level,
+            )
+            found_vols.append(vol_batch)
+            found_points.append(point_batch)
+        pair_vols = np.concatenate(found_vols)
+        pair_points = np.concatenate(found_points)
+
+        # Pairs are in volume order, so the first pair for each point is the winning volume
+        points, first = np.unique(pair_points, return_index=True)
+        sectors[points] = self.sectors[pair_vols[first]]
+        vols[points] = self.vols[pair_vols[first]]
+
+        return sectors, vols
+
+    def _test_pairs(self, span_vols, starts, counts, order, lat, lon, flight_level):
+        """
+        Volumes and points of the candidate pairs in a batch of spans that are inside each other, in volume order.
+        """
+
+        pair_vols = np.repeat(span_vols, counts)
+        pair_points = order[np.repeat(starts, counts) + _ranges(counts)]
+
+        keep = (
+            (lon[pair_points] >= self.bounds[pair_vols, 0])
+            & (lon[pair_points] <= self.bounds[pair_vols, 2])
+            & (lat[pair_points] >= self.bounds[pair_vols, 1])
+            & (lat[pair_points] <= self.bounds[pair_vols, 3])
+            & (flight_level[pair_points] >= self.min_levels[pair_vols])
+            & (flight_level[pair_points] <= self.max_levels[pair_vols])
+        )
+        pair_vols = pair_vols[keep]
+        pair_points = pair_points[keep]
+
+        # Only volumes that are not boxes need the full boundary test, made a chunk at a time
+        keep = self.boxes[pair_vols]
+        tests = np.flatnonzero(~keep)
+        chunk = max(1, MAX_EDGE_TESTS // max(1, self.edges.shape[1]))
+        for first in range(0, len(tests), chunk):
+            rows = tests[first : first + chunk]
+            keep[rows] = _covers(
+                self.edges[pair_vols[rows]],
+                lon[pair_points[rows], None],
+                lat[pair_points[rows], None],
+            )
+
+        return pair_vols[keep], pair_points[keep]
+
+
+def _ranges(counts):
+    """
+    Concatenation of `arange(count)` for each count.
+    """
+
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _covers(edges, x, y):
+    """
+    Even-odd test of points (`x`, `y`) against polygons given by their `edges`, counting points on an edge as inside.
+    Edges of holes are included in `edges`, so points in a hole cross them once more and count as outside.
+    """
+
+    x1, y1, x2, y2 = edges[..., 0], edges[..., 1], edges[..., 2], edges[..., 3]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        straddles = (y1 > y) != (y2 > y)
+        crossings = straddles & (x < x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+    inside = np.count_nonzero(crossings, axis=-1) % 2 == 1
+
+    # Points outside may still lie on an edge
+    outside = np.flatnonzero(~inside)
+    x, y = x[outside], y[outside]
+    x1, y1, x2, y2 = x1[outside], y1[outside], x2[outside], y2[outside]
+    on_edge = (
+        ((x2 - x1) * (y - y1) == (y2 - y1) * (x - x1))
+        & (x >= np.minimum(x1, x2))
+        & (x <= np.maximum(x1, x2))
+        & (y >= np.minimum(y1, y2))
+        & (y <= np.maximum(y1, y2))
+    )
+    inside[outside] = on_edge.any(axis=-1)
+
+    return inside
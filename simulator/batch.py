@@ -0,0 +1,84 @@
+import concurrent.futures
+import datetime
+import os
+
+import numpy as np
+
+from . import settings
+from .state import State
+
+
+_templates = {}  # Parsed scenarios, keyed by (category, scenario_name), in each worker
+
+
+def run_batch(jobs: list, max_workers: int = None, seed: int = 0):
+    """
+    Run many episodes over a pool of processes, yielding results as each episode finishes.
+
+    Each job is a `(category, scenario_name, actions, horizon)` tuple.
+    `actions` is a list of action dicts, or a picklable callable taking a `numpy.random.Generator` and returning one.
+    `horizon` is the number of simulated seconds to evolve for.
+
+    Every distinct scenario is parsed once here and handed to each worker when it starts, rather than re-read from disk for every job.
+    Each job gets its own seed spawned from `seed`, so results do not depend on which worker runs which job.
+    Results are dicts with the job `index` and `seed`, the final `time` and `tick`, and the final aircraft kinematics as arrays.
+    """
+
+    templates = {}
+    for category, scenario_name, _, _ in jobs:
+        if (category, scenario_name) not in templates:
+            templates[(category, scenario_name)] = State.load(
+                os.path.join(settings.SCENARIO_DIR, category, scenario_name)
+            )
+
+    seeds = [
+        int(sequence.generate_state(1)[0])
+        for sequence in np.random.SeedSequence(seed).spawn(len(jobs))
+    ]
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_initialise_worker,
+        initargs=(templates,),
+    ) as executor:
+        futures = [
+            executor.submit(_run_job, index, job, job_seed)
+            for index, (job, job_seed) in enumerate(zip(jobs, seeds))
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def _initialise_worker(templates: dict):
+    """
+    Keep the parsed scenarios for every job run by this worker.
+    """
+
+    _templates.update(templates)
+
+
+def _run_job(index: int, job: tuple, seed: int) -> dict:
+    """
+    Run a single episode from a fork of its parsed scenario, sharing the static data with it.
+    """
+
+    category, scenario_name, actions, horizon = job
+    state = _templates[(category, scenario_name)].fork()
+
+    if callable(actions):
+        actions = actions(np.random.default_rng(seed))
+    state.queue_actions(actions)
+    state.evolve(datetime.timedelta(seconds=horizon))
+
+    data = state.aircraft_store.data
+    return {
+        "index": index,
+        "seed": seed,
+        "time": state.time,
+        "tick": state.tick,
+        "callsigns": list(state.aircraft_store.callsigns),
+        "aircraft": {
+            name: data[name].copy()
+            for name in ["lat", "lon", "flight_level", "heading", "speed"]
+        },
+    }
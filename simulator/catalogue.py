@@ -0,0 +1,99 @@
+"""
+Catalogue of the scenarios in a scenario directory, so they can be listed without scanning the directory each time.
+
+The catalogue maps each category to its scenarios and their meta.json contents.
+It is kept in memory, and on disk in a `.catalogue` directory inside the scenario directory, so new processes start with it too.
+Either copy is used while the modification times of the scenario directory and its category directories are unchanged, so adding or removing a category or scenario is noticed with one `os.stat` per category.
+Editing the meta.json of an existing scenario is not noticed, so pass `refresh=True` after doing so.
+"""
+
+import json
+import os
+import tempfile
+
+
+FORMAT = 1  # Version of the catalogue layout, bumped when it changes
+CATALOGUE_DIR = ".catalogue"  # Inside the scenario directory
+
+_catalogues = {}  # Signature and catalogue of each scenario directory read so far
+
+
+def scenarios(scenario_dir: str, refresh: bool = False) -> dict:
+    """
+    Catalogue of `scenario_dir`: a dict of each category to a dict of each scenario name to its meta.json contents, all sorted by name.
+    If `refresh`, the directory is scanned afresh.
+    """
+
+    if not refresh:
+        cached = _catalogues.get(scenario_dir)
+        if cached is not None and cached[0] == _signature(scenario_dir, cached[1]):
+            return cached[1]
+
+        try:
+            with open(
+                os.path.join(scenario_dir, CATALOGUE_DIR, "catalogue.json")
+            ) as file:
+                stored = json.load(file)
+            if stored["format"] == FORMAT and stored["signature"] == _signature(
+                scenario_dir, stored["scenarios"]
+            ):
+                _catalogues[scenario_dir] = (stored["signature"], stored["scenarios"])
+                return stored["scenarios"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    # Scan, after taking the signature, so changes made during the scan are caught next time
+    try:
+        os.makedirs(os.path.join(scenario_dir, CATALOGUE_DIR), exist_ok=True)
+    except OSError:
+        pass  # e.g. the scenario directory is read-only
+    categories = _subdirectories(scenario_dir)
+    signature = _signature(scenario_dir, categories)
+    catalogue = {}
+    for category in categories:
+        catalogue[category] = {}
+        for name in _subdirectories(os.path.join(scenario_dir, category)):
+            with open(os.path.join(scenario_dir, category, name, "meta.json")) as file:
+                catalogue[category][name] = json.load(file)
+
+    _catalogues[scenario_dir] = (signature, catalogue)
+    try:
+        with tempfile.NamedTemporaryFile(
+            "w", dir=os.path.join(scenario_dir, CATALOGUE_DIR), delete=False
+        ) as file:
+            json.dump(
+                {"format": FORMAT, "signature": signature, "scenarios": catalogue}, file
+            )
+        os.replace(
+            file.name, os.path.join(scenario_dir, CATALOGUE_DIR, "catalogue.json")
+        )
+    except OSError:
+        pass  # e.g. the scenario directory is read-only
+
+    return catalogue
+
+
+def _signature(scenario_dir: str, categories) -> list:
+    """
+    Modification times of the scenario directory and each of its `categories`, which change when entries are added or removed.
+    """
+
+    try:
+        return [os.stat(scenario_dir).st_mtime_ns] + [
+            os.stat(os.path.join(scenario_dir, category)).st_mtime_ns
+            for category in categories
+        ]
+    except OSError:
+        return None
+
+
+def _subdirectories(path: str) -> list:
+    """
+    Sorted names of the directories in `path`, leaving out hidden ones such as caches.
+    """
+
+    return sorted(
+        entry.name
+        for entry in os.scandir(path)
+        if entry.is_dir() and not entry.name.startswith(".")
+    )
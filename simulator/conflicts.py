@@ -0,0 +1,180 @@
+import numpy as np
+
+from .airspace import _ranges
+
+
+NAUTICAL_MILES_PER_DEGREE = 60.0  # Along a meridian
+MAX_TABLE_SIZE = 1 << 16  # Largest hash table, so buckets sort in linear time
+
+
+class ConflictDetector:
+    """
+    Finds pairs of aircraft closer than the lateral and vertical separation minima.
+
+    Candidate pairs are found with a spatial hash: aircraft are bucketed by lat/lon cell, so only aircraft in the same or neighbouring cells are compared.
+    Candidates are found within the minima widened by a skin, and reused until some aircraft has moved more than half a skin since, so most checks only test the candidates.
+    Lateral distances use a local flat-earth approximation, accurate to well under 1% at separation distances. Cells do not wrap around the antimeridian.
+    """
+
+    def __init__(
+        self,
+        lateral: float = 5.0,
+        vertical: float = 10.0,
+        lateral_skin: float = 2.0,
+        vertical_skin: float = 10.0,
+    ):
+        """
+        Construct a detector for a `lateral` minimum in nautical miles and a `vertical` minimum in flight levels.
+        Aircraft are in conflict when they are within both minima.
+        Larger skins make candidates last longer, but give more of them to test.
+        """
+
+        if lateral <= 0.0 or vertical <= 0.0:
+            raise ValueError(
+                f"Separation minima must be positive. Received: {lateral}, {vertical}."
+            )
+
+        self.lateral = lateral
+        self.vertical = vertical
+        self.lateral_skin = lateral_skin
+        self.vertical_skin = vertical_skin
+        self._key = None  # Identifies the aircraft rows the candidates were found for
+        self._positions = None  # Positions the candidates were found at
+        self._candidates = None  # Candidate pairs of rows
+
+    def detect(
+        self,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        flight_level: np.ndarray,
+        key: object = None,
+    ):
+        """
+        Find every pair of aircraft in conflict.
+        `key` identifies the rows, e.g. the list of callsigns, and candidates are found afresh when it changes.
+        Returns two arrays of row indices, with each pair once and in order (first < second).
+        """
+
+        if not self._valid(lat, lon, flight_level, key):
+            self._key = key
+            self._positions = (
+                lat.copy(),
+                lon.copy(),
+                flight_level.copy(),
+                np.cos(np.radians(lat)),
+            )
+            self._candidates = find_pairs(
+                lat,
+                lon,
+                flight_level,
+                self.lateral + self.lateral_skin,
+                self.vertical + self.vertical_skin,
+            )
+
+        first, second = self._candidates
+        conflicts = _within(
+            lat, lon, flight_level, first, second, self.lateral, self.vertical
+        )
+
+        return first[conflicts], second[conflicts]
+
+    def _valid(self, lat, lon, flight_level, key) -> bool:
+        """
+        Whether the candidates still hold every pair that could be in conflict.
+        """
+
+        if self._candidates is None or key is not self._key:
+            return False
+        lat_0, lon_0, flight_level_0, cos_lat_0 = self._positions
+        if len(lat) != len(lat_0) or len(lat) == 0:
+            return len(lat) == len(lat_0)
+
+        # Crossing the antimeridian counts as a long way, so just finds candidates afresh
+        dy = lat - lat_0
+        dx = (lon - lon_0) * cos_lat_0
+        lateral = NAUTICAL_MILES_PER_DEGREE * np.sqrt((dx * dx + dy * dy).max())
+        vertical = np.abs(flight_level - flight_level_0).max()
+
+        return 2.0 * lateral < self.lateral_skin and 2.0 * vertical < self.vertical_skin
+
+
+def find_pairs(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    flight_level: np.ndarray,
+    lateral: float,
+    vertical: float,
+):
+    """
+    Find every pair of aircraft within `lateral` nautical miles and `vertical` flight levels of each other, with a spatial hash.
+    Returns two arrays of row indices, with each pair once and in order (first < second).
+    """
+
+    num_aircraft = len(lat)
+    if num_aircraft < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    # Cells are narrow enough in longitude at the latitude furthest from the equator
+    cos_lat = max(np.cos(np.radians(min(np.abs(lat).max(), 89.0))), 1e-3)
+    cell_lat = lateral / NAUTICAL_MILES_PER_DEGREE
+    cell_lon = cell_lat / cos_lat
+    x = np.floor(lon / cell_lon).astype(np.int64)
+    y = np.floor(lat / cell_lat).astype(np.int64)
+
+    # Sort aircraft by bucket, with bucket ranges from their counts
+    table_size = min(1 << int(2 * num_aircraft - 1).bit_length(), MAX_TABLE_SIZE)
+    buckets = _hash(x, y, table_size)
+    order = np.argsort(buckets, kind="stable")
+    counts = np.bincount(buckets, minlength=table_size)
+    starts = np.cumsum(counts) - counts
+
+    # Each pair is found once: from the earlier aircraft in a shared bucket, or else from the cell to its left or below
+    sorted_buckets = buckets[order]
+    positions = np.arange(num_aircraft)
+    query_owners = [positions]
+    query_starts = [positions + 1]
+    query_counts = [starts[sorted_buckets] + counts[sorted_buckets] - positions - 1]
+    for dx, dy in [(1, -1), (1, 0), (1, 1), (0, 1)]:
+        neighbours = _hash(x[order] + dx, y[order] + dy, table_size)
+        query_owners.append(positions)
+        query_starts.append(starts[neighbours])
+        query_counts.append(
+            np.where(neighbours == sorted_buckets, 0, counts[neighbours])
+        )
+    query_counts = np.concatenate(query_counts)
+    owners = np.repeat(np.concatenate(query_owners), query_counts)
+    others = np.repeat(np.concatenate(query_starts), query_counts) + _ranges(
+        query_counts
+    )
+    first, second = order[owners], order[others]
+    first, second = np.minimum(first, second), np.maximum(first, second)
+
+    # Hash collisions can find a pair more than once
+    within = _within(lat, lon, flight_level, first, second, lateral, vertical)
+    pairs = np.unique(first[within] * num_aircraft + second[within])
+
+    return pairs // num_aircraft, pairs % num_aircraft
+
+
+def _within(lat, lon, flight_level, first, second, lateral, vertical) -> np.ndarray:
+    """
+    Whether each pair of rows is within `lateral` nautical miles and `vertical` flight levels.
+    """
+
+    dy = lat[second] - lat[first]
+    dx = ((lon[second] - lon[first] + 180.0) % 360.0 - 180.0) * np.cos(
+        np.radians(0.5 * (lat[first] + lat[second]))
+    )
+    limit = lateral / NAUTICAL_MILES_PER_DEGREE
+
+    return (np.abs(flight_level[second] - flight_level[first]) < vertical) & (
+        dx * dx + dy * dy < limit * limit
+    )
+
+
+def _hash(x: np.ndarray, y: np.ndarray, table_size: int) -> np.ndarray:
+    """
+    Bucket of each (x, y) cell in a table of `table_size`, a power of two.
+    """
+
+    return (((x * 73856093) ^ (y * 19349663)) & (table_size - 1)).astype(np.uint16)
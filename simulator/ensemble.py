@@ -0,0 +1,153 @@
+import copy
+import datetime
+import os
+
+import numpy as np
+
+from . import kinematics, settings
+from .actions import parse_actions, to_ns
+from .state import State, split_steps
+
+
+class Ensemble:
+    """
+    Many perturbed copies (members) of one scenario, evolved together.
+    Kinematic fields are stacked into (members, aircraft) arrays, while static data and the action queue are shared by every member.
+    """
+
+    fields = [  # Kinematic fields carried per member
+        "lat",
+        "lon",
+        "flight_level",
+        "target_flight_level",
+        "heading",
+        "target_heading",
+        "speed",
+        "target_speed",
+        "rise",
+        "max_rise_rate",
+        "turn",
+        "max_turn_rate",
+        "acceleration",
+        "max_acceleration",
+    ]
+
+    def __init__(
+        self,
+        state: State,
+        num_members: int,
+        perturbations: dict = None,
+        seed: int = None,
+    ):
+        """
+        Stack `num_members` copies of the aircraft in `state`.
+        `perturbations` maps kinematic fields to the standard deviation of Gaussian noise added independently to each member and aircraft, e.g. `{"heading": 2.0, "max_turn_rate": 0.1}`.
+        Rates (`max_*`) are kept non-negative after perturbation.
+        """
+
+        if num_members < 1:
+            raise ValueError("Ensemble must contain at least one member.")
+
+        self.state = state  # Template state, shared for static data
+        self.time = state.time
+        self.tick = state.tick
+        self.extra_time = state.extra_time
+        self.callsigns = list(state.aircraft_store.callsigns)
+        self.index = dict(state.aircraft_store.index)  # Column of each callsign
+        self.action_queue = copy.deepcopy(state.action_queue)
+
+        unknown = set(perturbations or {}) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Cannot perturb unknown fields {sorted(unknown)}")
+
+        rng = np.random.default_rng(seed)
+        self.data = {}
+        for name in self.fields:
+            values = np.repeat(state.aircraft_store[name][None, :], num_members, axis=0)
+            scale = (perturbations or {}).get(name)
+            if scale:
+                values += rng.normal(0.0, scale, values.shape)
+                if name.startswith("max_"):
+                    np.maximum(values, 0.0, out=values)
+            self.data[name] = values
+
+    @staticmethod
+    def load(category: str, scenario_name: str, num_members: int, **kwargs):
+        """
+        Build an ensemble from a bundled scenario. Keyword arguments are passed to `Ensemble`.
+        """
+
+        state = State.load(os.path.join(settings.SCENARIO_DIR, category, scenario_name))
+        return Ensemble(state, num_members, **kwargs)
+
+    @property
+    def num_members(self) -> int:
+        return self.data["lat"].shape[0]
+
+    def positions(self) -> np.ndarray:
+        """
+        Stacked (members, aircraft, 3) array of lat, lon and flight level.
+        """
+
+        return np.stack(
+            [self.data["lat"], self.data["lon"], self.data["flight_level"]], axis=-1
+        )
+
+    def queue_actions(self, actions: list[dict]):
+        """
+        Add a list of actions to the queue shared by every member.
+        """
+
+        self.action_queue.extend(*parse_actions(actions))
+
+    def evolve(self, evolve_delta: datetime.timedelta):
+        """
+        Evolve every member by a given time delta, with the same steps as `State.evolve`.
+        """
+
+        if evolve_delta < datetime.timedelta(seconds=0):
+            raise ValueError(f"Evolve delta must be positive")
+
+        num_steps, self.extra_time = split_steps(evolve_delta, self.extra_time)
+        dt = settings.TIME_STEP_DELTA.total_seconds()
+
+        for _ in range(num_steps):
+            start = to_ns(self.time)
+            end = to_ns(self.time + settings.TIME_STEP_DELTA)
+            for n in self.action_queue.due(start, end):
+                self._handle_action(self.action_queue.record(n))
+
+            kinematics.rotate(self.data, dt, shortest_turn=self.state.lnav_ticks > 0)
+            kinematics.accelerate(self.data, dt)
+            kinematics.move_laterally(
+                self.data, dt, self.state.geod, self.state.geodesy
+            )
+            kinematics.move_vertically(self.data, dt)
+            self.time += settings.TIME_STEP_DELTA
+            self.tick += 1
+
+    def _handle_action(self, action: dict):
+        """
+        Perform the given action on the aircraft in every member.
+        """
+
+        kind = action["kind"]
+        if kind in ["flight_level", "speed", "heading"]:
+            if action["callsign"] not in self.index:
+                return
+            row = self.index[action["callsign"]]
+            targets = self.data[f"target_{kind}"]
+
+            if action["subkind"] == "absolute":
+                targets[:, row] = float(action["value"])
+                return
+            elif action["subkind"] == "relative":
+                targets[:, row] += float(action["value"])
+                return
+
+        if kind == "select_aircraft":
+            return
+
+        raise ValueError(
+            f"Don't know how to handle {action['kind']}-{action['subkind']} action."
+        )
@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class PositionHistory:
+    """
+    Ring buffer of the last `depth` sampled (lat, lon) positions of each aircraft, newest first.
+    Each sample is written twice, `depth` slots apart, so the newest `depth` samples are always one contiguous slice of the buffer and can be read without copying.
+    """
+
+    def __init__(self, depth: int, num_aircraft: int = 0):
+        """
+        Construct a history holding `depth` samples for each of `num_aircraft` aircraft.
+        """
+
+        if depth < 1:
+            raise ValueError(f"History depth must be at least 1. Received: {depth}.")
+
+        self.depth = depth
+        self.buffer = np.empty((num_aircraft, 2 * depth, 2))  # Samples, stored twice
+        self.start = 0  # Slot of the newest sample
+        self.version = 0  # State version at which the last sample was recorded
+
+    def __len__(self) -> int:
+        return self.buffer.shape[0]
+
+    @staticmethod
+    def filled(depth: int, lat: np.ndarray, lon: np.ndarray):
+        """
+        Build a history with every sample set to the given positions.
+        """
+
+        history = PositionHistory(depth, len(lat))
+        history.buffer[:, :, 0] = lat[:, None]
+        history.buffer[:, :, 1] = lon[:, None]
+
+        return history
+
+    def positions(self) -> np.ndarray:
+        """
+        (aircraft, depth, 2) view of the samples, newest first.
+        The view is overwritten as samples are recorded, so copy it to keep it.
+        """
+
+        return self.buffer[:, self.start : self.start + self.depth]
+
+    def record(self, lat: np.ndarray, lon: np.ndarray, version: int = 0):
+        """
+        Record a sample of every aircraft, replacing the oldest.
+        """
+
+        self.start = (self.start - 1) % self.depth
+        for slot in [self.start, self.start + self.depth]:
+            self.buffer[:, slot, 0] = lat
+            self.buffer[:, slot, 1] = lon
+        self.version = version
+
+    def copy(self):
+        """
+        Copy the history.
+        """
+
+        history = PositionHistory(self.depth)
+        history.buffer = self.buffer.copy()
+        history.start = self.start
+        history.version = self.version
+
+        return history
+
+    def take(self, rows: np.ndarray):
+        """
+        Copy of the history of the aircraft in `rows`, in that order.
+        """
+
+        history = PositionHistory(self.depth)
+        history.buffer = self.buffer[rows]
+        history.start = self.start
+        history.version = self.version
+
+        return history
+
+    @staticmethod
+    def concatenate(histories: list):
+        """
+        Join the histories of several sets of aircraft, which must have been sampled at the same times.
+        """
+
+        first = histories[0]
+        if any(
+            (history.depth, history.start) != (first.depth, first.start)
+            for history in histories
+        ):
+            raise ValueError(f"Histories to join must have the same samples")
+
+        history = PositionHistory(first.depth)
+        history.buffer = np.concatenate([history.buffer for history in histories])
+        history.start = first.start
+        history.version = max(history.version for history in histories)
+
+        return history
+
+    def append(self, lat: float, lon: float):
+        """
+        Add an aircraft to the end, with every sample set to its position.
+        """
+
+        row = np.empty((1, 2 * self.depth, 2))
+        row[0, :, 0] = lat
+        row[0, :, 1] = lon
+        self.buffer = np.concatenate([self.buffer, row])
+
+    def remove(self, row: int):
+        """
+        Remove the aircraft in `row`, preserving the order of the others.
+        """
+
+        self.buffer = np.delete(self.buffer, row, axis=0)
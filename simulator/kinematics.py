@@ -0,0 +1,245 @@
+import numpy as np
+
+
+KNOTS_TO_METRES_PER_SECOND = 1852.0 / 3600.0
+SEMI_MAJOR_AXIS = 6378137.0  # WGS84 equatorial radius (metres)
+FLATTENING = 1.0 / 298.257223563  # WGS84 flattening
+ECCENTRICITY_SQUARED = FLATTENING * (2.0 - FLATTENING)
+GEODESY_MODES = ["exact", "fast"]  # Ways of moving aircraft laterally
+FAST_MAX_LATITUDE = 80.0  # Fast steps poleward of this use `geod.fwd` (degrees)
+FAST_MAX_STEP = 2000.0  # Fast steps longer than this use `geod.fwd` (metres)
+THIRD_FLATTENING = FLATTENING / (2.0 - FLATTENING)
+RHUMB_MAX_LATITUDE = 85.0  # Rhumb lines are not followed poleward of this (degrees)
+
+
+def rotate(data: dict, dt: float, shortest_turn: bool = False):
+    """
+    Evolve the turn and heading of the aircraft in `data` (a dict of field arrays) by `dt` seconds, in place.
+    See `heading_difference` for `shortest_turn`.
+    """
+
+    data["turn"][...] = turn_rate(
+        data["heading"], data["target_heading"], data["max_turn_rate"], shortest_turn
+    )
+    data["heading"] += data["turn"] * dt
+    data["heading"] %= 360.0
+
+
+def accelerate(data: dict, dt: float):
+    """
+    Evolve the acceleration and speed of the aircraft in `data` by `dt` seconds, in place.
+    """
+
+    data["acceleration"][...] = acceleration(
+        data["speed"], data["target_speed"], data["max_acceleration"]
+    )
+    data["speed"] += data["acceleration"] * dt
+
+
+def move_laterally(data: dict, dt: float, geod, geodesy: str = "exact"):
+    """
+    Evolve the lateral (lat, lon) position of the aircraft in `data` by `dt` seconds, in place.
+    With `geodesy` "exact", arrays of any shape are projected in a single call to `geod.fwd`.
+    With "fast", see `move_laterally_fast`.
+    """
+
+    if geodesy == "fast":
+        move_laterally_fast(data, dt, geod)
+        return
+    if geodesy != "exact":
+        raise ValueError(
+            f"Geodesy must be one of {GEODESY_MODES}. Received: {geodesy}."
+        )
+
+    distances = data["speed"] * KNOTS_TO_METRES_PER_SECOND * dt
+    proj_lon, proj_lat, _ = geod.fwd(
+        data["lon"].ravel(),
+        data["lat"].ravel(),
+        data["heading"].ravel(),
+        distances.ravel(),
+    )
+
+    data["lat"][...] = np.reshape(proj_lat, data["lat"].shape)
+    data["lon"][...] = np.reshape(proj_lon, data["lon"].shape)
+
+
+def move_laterally_fast(data: dict, dt: float, geod):
+    """
+    Evolve the lateral (lat, lon) position of the aircraft in `data` by `dt` seconds, in place, without `geod.fwd`.
+
+    Each aircraft takes one midpoint step along the geodesic leaving at its heading: latitude and azimuth are advanced half a step, then the whole step is taken with the ellipsoid's radii of curvature and the azimuth at that midpoint.
+    The error of a step grows with the cube of its length, so with steps of a second or less the track follows the `geod.fwd` steps of the exact mode to within 0.01 m per hour of simulated time, and to within 1 m per hour for steps up to `FAST_MAX_STEP`.
+    Longer steps, and aircraft poleward of `FAST_MAX_LATITUDE` where the azimuth changes quickly, are projected with `geod.fwd` instead.
+    """
+
+    distances = data["speed"] * KNOTS_TO_METRES_PER_SECOND * dt
+    lat = data["lat"]
+    lon = data["lon"]
+    exact = (np.abs(lat) > FAST_MAX_LATITUDE) | (np.abs(distances) > FAST_MAX_STEP)
+    if exact.any():
+        exact_lon, exact_lat, _ = geod.fwd(
+            lon[exact], lat[exact], data["heading"][exact], distances[exact]
+        )
+
+    # Half a step, with sines and cosines of the small changes expanded to second order
+    phi = np.radians(lat)
+    azimuth = np.radians(data["heading"])
+    sin_lat, cos_lat = np.sin(phi), np.cos(phi)
+    sin_azimuth, cos_azimuth = np.sin(azimuth), np.cos(azimuth)
+    meridian, prime_vertical = radii(lat)
+    half = 0.5 * distances
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d_lat = half * cos_azimuth / meridian
+        d_azimuth = half * sin_azimuth * sin_lat / (cos_lat * prime_vertical)
+        sin_lat, cos_lat = (
+            sin_lat + d_lat * (cos_lat - 0.5 * d_lat * sin_lat),
+            cos_lat - d_lat * (sin_lat + 0.5 * d_lat * cos_lat),
+        )
+        sin_azimuth, cos_azimuth = (
+            sin_azimuth + d_azimuth * (cos_azimuth - 0.5 * d_azimuth * sin_azimuth),
+            cos_azimuth - d_azimuth * (sin_azimuth + 0.5 * d_azimuth * cos_azimuth),
+        )
+
+        # The whole step, with the radii and azimuth at its midpoint
+        w2 = 1.0 - ECCENTRICITY_SQUARED * sin_lat * sin_lat
+        prime_vertical = SEMI_MAJOR_AXIS / np.sqrt(w2)
+        meridian = prime_vertical * (1.0 - ECCENTRICITY_SQUARED) / w2
+        lat += np.degrees(distances * cos_azimuth / meridian)
+        lon += np.degrees(distances * sin_azimuth / (prime_vertical * cos_lat))
+    lon[...] = (lon + 180.0) % 360.0 - 180.0
+
+    if exact.any():
+        lat[exact] = exact_lat
+        lon[exact] = exact_lon
+
+
+def move_vertically(data: dict, dt: float):
+    """
+    Evolve the rise and flight level of the aircraft in `data` by `dt` seconds, in place.
+    """
+
+    data["rise"][...] = rise_rate(
+        data["flight_level"], data["target_flight_level"], data["max_rise_rate"]
+    )
+    data["flight_level"] += data["rise"] * dt
+
+
+def move_rhumb(lat, lon, heading, distance):
+    """
+    Positions reached from (`lat`, `lon`) by flying `distance` metres at a constant `heading`, along a rhumb line of the WGS84 ellipsoid.
+    Returns arrays of lat and lon.
+
+    Flying a constant heading in many short `geod.fwd` steps traces a rhumb line, so this gives the position after any number of steps of an aircraft flying straight and level in one go.
+    The latitude is found from the meridian arc length travelled, and the longitude from the change in isometric latitude.
+    Rhumb lines spiral into the poles, so positions poleward of `RHUMB_MAX_LATITUDE` are not meaningful.
+    """
+
+    phi = np.radians(lat)
+    azimuth = np.radians(heading)
+    north = distance * np.cos(azimuth)
+
+    # Latitude reached, by Newton's method on the meridian arc length
+    arc = meridian_arc(phi) + north
+    meridian, _ = radii(lat)
+    phi_2 = phi + north / meridian
+    for _ in range(3):
+        meridian, _ = radii(np.degrees(phi_2))
+        phi_2 -= (meridian_arc(phi_2) - arc) / meridian
+
+    # Longitude change, by the change in isometric latitude per metre north, or on an east-west line the parallel's radius
+    e = np.sqrt(ECCENTRICITY_SQUARED)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        isometric = np.arcsinh(np.tan(phi_2)) - e * np.arctanh(e * np.sin(phi_2))
+        isometric -= np.arcsinh(np.tan(phi)) - e * np.arctanh(e * np.sin(phi))
+        _, prime_vertical = radii(lat)
+        per_metre = np.where(
+            np.abs(phi_2 - phi) > 1e-8,
+            isometric / north,
+            1.0 / (prime_vertical * np.cos(phi)),
+        )
+    lon_2 = lon + np.degrees(distance * np.sin(azimuth) * per_metre)
+
+    return np.degrees(phi_2), (lon_2 + 180.0) % 360.0 - 180.0
+
+
+def meridian_arc(phi):
+    """
+    Distance (metres) along a meridian of the WGS84 ellipsoid from the equator to latitudes `phi` (radians), by Helmert's series.
+    """
+
+    n = THIRD_FLATTENING
+    return (
+        SEMI_MAJOR_AXIS
+        / (1.0 + n)
+        * (1.0 + n**2 / 4.0 + n**4 / 64.0)
+        * (
+            phi
+            - (1.5 * n - 9.0 / 16.0 * n**3) * np.sin(2.0 * phi)
+            + (15.0 / 16.0 * n**2 - 15.0 / 32.0 * n**4) * np.sin(4.0 * phi)
+            - 35.0 / 48.0 * n**3 * np.sin(6.0 * phi)
+            + 315.0 / 512.0 * n**4 * np.sin(8.0 * phi)
+        )
+    )
+
+
+def radii(lat):
+    """
+    Meridian and prime vertical radii of curvature (metres) of the WGS84 ellipsoid at latitudes `lat` (degrees).
+    A small step north moves by its length over the meridian radius (radians), and a small step east by its length over the prime vertical radius times cos(lat).
+    """
+
+    w2 = 1.0 - ECCENTRICITY_SQUARED * np.sin(np.radians(lat)) ** 2
+    prime_vertical = SEMI_MAJOR_AXIS / np.sqrt(w2)
+    meridian = prime_vertical * (1.0 - ECCENTRICITY_SQUARED) / w2
+
+    return meridian, prime_vertical
+
+
+def turn_rate(heading, target_heading, max_turn_rate, shortest_turn: bool = False):
+    """
+    Rate of turn (degrees clockwise per second) steering each aircraft towards its target heading.
+    See `heading_difference` for `shortest_turn`.
+    """
+
+    delta = heading_difference(heading, target_heading, shortest_turn)
+    return calc_sign(0.0, delta, 5.0) * max_turn_rate
+
+
+def heading_difference(heading, target_heading, shortest_turn: bool = False):
+    """
+    Turn (degrees clockwise) from each heading to its target heading.
+    Differences below -180 are turned the other way, and with `shortest_turn` so are those above +180, so every turn takes the shorter way round.
+    `shortest_turn` is used when steering along routes, whose bearings often cross north.
+    """
+
+    delta = target_heading - heading
+    delta = np.where(delta < -180.0, delta + 360.0, delta)
+    if shortest_turn:
+        delta = np.where(delta > 180.0, delta - 360.0, delta)
+
+    return delta
+
+
+def acceleration(speed, target_speed, max_acceleration):
+    """
+    Acceleration (knots per second) driving each aircraft towards its target speed.
+    """
+
+    return calc_sign(speed, target_speed, 10.0) * max_acceleration
+
+
+def rise_rate(flight_level, target_flight_level, max_rise_rate):
+    """
+    Rate of rise (flight levels per second) driving each aircraft towards its target flight level.
+    """
+
+    return calc_sign(flight_level, target_flight_level, 10.0) * max_rise_rate
+
+
+def calc_sign(x, target_x, length_scale):
+    n = (target_x - x) / length_scale
+    return clamp(n, -1.0, 1.0)
+
+
+def clamp(num, min_value, max_value):
+    return np.clip(num, min_value, max_value)
@@ -0,0 +1,21 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """
+    Import the module `name`, deferring running it until one of its attributes is first used.
+    Modules already imported are returned as they are.
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    return module
@@ -0,0 +1,26 @@
+import sys
+
+
+def object_bytes(values, seen: set) -> int:
+    """
+    Bytes held by the Python objects in `values`, following lists, tuples, dicts and arrays of objects.
+    Objects whose ids are in `seen` are not counted again, so objects shared between values are counted once.
+    """
+
+    total = 0
+    stack = list(values)
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif getattr(value, "dtype", None) == object:
+            stack.extend(value.ravel().tolist())
+
+    return total
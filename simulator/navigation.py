@@ -0,0 +1,241 @@
+"""
+Lateral navigation: steering aircraft along their routes.
+
+Routes are encoded once against the fixes of a state, in compressed sparse row form: the fixes of every route are held in one array of fix indices, with the route of the aircraft in row `n` from `offsets[n]` up to `offsets[n + 1]`.
+Each aircraft has a pointer into that array to its active fix, which is at the end of its route once every fix has been reached.
+Every steering pass finds the bearing and distance from each following aircraft to its active fix in one batched call, sets the bearings as target headings, and moves the pointers of aircraft that have reached their fix on to the next.
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import kinematics
+
+
+CAPTURE_RADIUS_NM = 0.5  # Distance within which a fix counts as reached
+
+
+class RouteFollower:
+    """
+    Routes of the aircraft in an `AircraftStore` as arrays of fix indices, and the progress of each aircraft along its route.
+
+    Fix names are matched without regard to case, so a route of ["a", "b"] flies to the fixes "A" then "B".
+    A fix also counts as reached once it is behind the aircraft and within its turning circle, so aircraft do not circle fixes they cannot turn tightly enough to pass within the capture radius of.
+    Aircraft can be `disengage`d, e.g. when given a heading, after which they keep their target heading until the route is re-encoded.
+    """
+
+    def __init__(
+        self,
+        store,
+        fixes: pd.DataFrame,
+        capture_radius_nm: float = CAPTURE_RADIUS_NM,
+    ):
+        """
+        Encode the routes of the aircraft in `store` against `fixes`, with every aircraft heading for the first fix of its route.
+        """
+
+        lookup = {str(name).strip().upper(): n for n, name in enumerate(fixes.index)}
+        routes = store["route"]
+        unknown = sorted(
+            {fix for route in routes for fix in route if str(fix).upper() not in lookup}
+        )
+        if unknown:
+            raise ValueError(f"Routes contain unknown fixes {unknown}")
+
+        lengths = np.fromiter(map(len, routes), dtype=np.int64, count=len(routes))
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])  # Start of each route
+        self.fixes = np.fromiter(  # Index into `fixes` of each fix of every route
+            (lookup[str(fix).upper()] for route in routes for fix in route),
+            dtype=np.int64,
+            count=self.offsets[-1],
+        )
+        self.position = self.offsets[:-1].copy()  # Active fix of each aircraft
+        self.engaged = np.ones(len(routes), dtype=bool)  # Following its route
+        self.fix_lat = fixes["lat"].to_numpy(dtype=np.float64)
+        self.fix_lon = fixes["lon"].to_numpy(dtype=np.float64)
+        self.capture_radius = capture_radius_nm * 1852.0  # Metres
+        self.callsigns = store.callsigns  # Callsign of each row when encoded
+        self.route_version = _route_version(store)
+
+    def matches(self, store) -> bool:
+        """
+        Whether the encoded routes are still those of the aircraft in `store`, row for row.
+        The callsign list of a store is replaced whenever aircraft are added or removed, so is compared by identity.
+        """
+
+        return (
+            store.callsigns is self.callsigns
+            and _route_version(store) == self.route_version
+        )
+
+    def reencoded(self, store, fixes: pd.DataFrame):
+        """
+        Encode the routes of `store` afresh, keeping the progress of aircraft whose route is unchanged.
+        """
+
+        follower = RouteFollower(store, fixes, self.capture_radius / 1852.0)
+        rows = {callsign: row for row, callsign in enumerate(self.callsigns)}
+        for new_row, callsign in enumerate(follower.callsigns):
+            row = rows.get(callsign)
+            if row is None:
+                continue
+            route = self.fixes[self.offsets[row] : self.offsets[row + 1]]
+            new_route = follower.fixes[
+                follower.offsets[new_row] : follower.offsets[new_row + 1]
+            ]
+            if np.array_equal(route, new_route):
+                follower.position[new_row] += self.position[row] - self.offsets[row]
+                follower.engaged[new_row] = self.engaged[row]
+
+        return follower
+
+    def copy(self):
+        """
+        Copy the follower. The progress of each aircraft is copied, and the encoded routes shared.
+        """
+
+        follower = RouteFollower.__new__(RouteFollower)
+        follower.__dict__.update(self.__dict__)
+        follower.position = self.position.copy()
+        follower.engaged = self.engaged.copy()
+
+        return follower
+
+    def active_fixes(self) -> np.ndarray:
+        """
+        Index into the fixes of the active fix of each aircraft, or -1 for aircraft not following a route.
+        """
+
+        following = self.engaged & (self.position < self.offsets[1:])
+        active = np.full(len(self.position), -1, dtype=np.int64)
+        active[following] = self.fixes[self.position[following]]
+
+        return active
+
+    def progress(self, rows: np.ndarray) -> dict:
+        """
+        Number of fixes reached by the aircraft in `rows`, and whether they are following their routes.
+        """
+
+        return {
+            "reached": self.position[rows] - self.offsets[rows],
+            "engaged": self.engaged[rows].copy(),
+        }
+
+    def set_progress(self, rows: np.ndarray, progress: dict):
+        """
+        Move the aircraft in `rows` on by the number of fixes they have reached, as given by `progress`.
+        """
+
+        self.position[rows] = np.minimum(
+            self.offsets[rows] + progress["reached"], self.offsets[rows + 1]
+        )
+        self.engaged[rows] = progress["engaged"]
+
+    def disengage(self, row: int):
+        """
+        Stop the aircraft in `row` following its route.
+        """
+
+        self.engaged[row] = False
+
+    def steer(self, data: dict, geod, geodesy: str = "exact"):
+        """
+        Set the target heading of every following aircraft in `data` (a dict of field arrays) to the bearing of its active fix, moving on from fixes that have been reached.
+        With `geodesy` "exact", bearings come from one call to `geod.inv`, and with "fast" from a local flat approximation (see `bearings_fast`).
+        """
+
+        rows = np.flatnonzero(self.engaged & (self.position < self.offsets[1:]))
+        if rows.size == 0:
+            return
+
+        azimuths, distances = self._bearings(data, rows, geod, geodesy)
+        reached = self._reached(data, rows, azimuths, distances)
+        while reached.any():
+            moved = rows[reached]
+            self.position[moved] += 1
+
+            # Find the bearings to the next fixes, which may themselves be reached already
+            again = np.flatnonzero(reached)
+            again = again[self.position[moved] < self.offsets[moved + 1]]
+            reached[:] = False
+            if again.size:
+                azimuths[again], distances[again] = self._bearings(
+                    data, rows[again], geod, geodesy
+                )
+                reached[again] = self._reached(
+                    data, rows[again], azimuths[again], distances[again]
+                )
+
+        following = self.position[rows] < self.offsets[rows + 1]
+        data["target_heading"][rows[following]] = azimuths[following] % 360.0
+
+    def _bearings(self, data: dict, rows: np.ndarray, geod, geodesy: str):
+        """
+        Bearings (degrees) and distances (metres) from the aircraft in `rows` to their active fixes.
+        """
+
+        fixes = self.fixes[self.position[rows]]
+        if geodesy == "fast":
+            return bearings_fast(
+                data["lat"][rows],
+                data["lon"][rows],
+                self.fix_lat[fixes],
+                self.fix_lon[fixes],
+            )
+        if geodesy != "exact":
+            raise ValueError(
+                f"Geodesy must be one of {kinematics.GEODESY_MODES}. Received: {geodesy}."
+            )
+
+        azimuths, _, distances = geod.inv(
+            data["lon"][rows],
+            data["lat"][rows],
+            self.fix_lon[fixes],
+            self.fix_lat[fixes],
+        )
+        return np.asarray(azimuths), np.asarray(distances)
+
+    def _reached(self, data: dict, rows, azimuths, distances) -> np.ndarray:
+        """
+        Whether the aircraft in `rows` have reached their active fixes: within the capture radius, or behind them and within their turning circle.
+        """
+
+        off_heading = np.abs((azimuths - data["heading"][rows] + 180.0) % 360.0 - 180.0)
+        with np.errstate(divide="ignore"):
+            turn_diameter = (
+                2.0
+                * data["speed"][rows]
+                * kinematics.KNOTS_TO_METRES_PER_SECOND
+                / np.radians(data["max_turn_rate"][rows])
+            )
+
+        return (distances < self.capture_radius) | (
+            (off_heading > 90.0) & (distances < turn_diameter)
+        )
+
+
+def bearings_fast(lat, lon, to_lat, to_lon):
+    """
+    Bearings (degrees) and distances (metres) from points to others nearby, treating the ellipsoid as flat around the midpoint of each pair.
+    Over legs of up to a few hundred kilometres away from the poles, bearings are within about a tenth of a degree of `geod.inv`.
+    """
+
+    mid_lat = 0.5 * (lat + to_lat)
+    meridian, prime_vertical = kinematics.radii(mid_lat)
+    north = np.radians(to_lat - lat) * meridian
+    east = (
+        np.radians((to_lon - lon + 180.0) % 360.0 - 180.0)
+        * prime_vertical
+        * np.cos(np.radians(mid_lat))
+    )
+
+    return np.degrees(np.arctan2(east, north)), np.hypot(north, east)
+
+
+def _route_version(store) -> int:
+    """
+    Latest version at which any route in `store` changed.
+    """
+
+    return int(store.versions["route"].max(initial=0))
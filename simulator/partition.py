@@ -0,0 +1,283 @@
+"""
+Sector-partitioned simulation across worker processes.
+
+Sectors are shared out between workers, and each worker process evolves only the aircraft inside its sectors, in a `State` of its own.
+Every `handoff_ticks` ticks the workers locate their aircraft, and hand those that have crossed into another worker's sector over, through the coordinating process, with their history and progress along their routes.
+Aircraft outside every sector stay where they are.
+
+Aircraft move independently of each other, so every aircraft follows exactly the track it would in a single state, whichever worker holds it.
+Actions are sent to every worker, and each ignores those for aircraft it does not hold.
+The coordinator keeps the global `time`, `tick` and `extra_time`, and workers always evolve by whole ticks in lockstep.
+Separation is only checked when the aircraft are gathered (see `gather`), as pairs in conflict can span workers.
+"""
+
+import datetime
+import multiprocessing
+import os
+import traceback
+
+import numpy as np
+
+from . import settings
+from .aircraft import AircraftStore
+from .state import State, split_steps
+
+
+class PartitionedSimulation:
+    """
+    A state split between worker processes by sector, evolved in lockstep.
+
+        with PartitionedSimulation.load("Basic", "Mission1", num_workers=4) as sim:
+            sim.queue_actions(actions)
+            sim.evolve(datetime.timedelta(minutes=5))
+            data = sim.dynamic_data()
+    """
+
+    def __init__(self, state: State, num_workers: int, handoff_ticks: int = 8):
+        """
+        Share the sectors of `state` out between `num_workers` worker processes, each starting with a fork of `state` holding the aircraft in its sectors.
+        Sectors are dealt largest first to the worker with the fewest aircraft so far.
+        """
+
+        if num_workers < 1:
+            raise ValueError(f"Need at least one worker. Received: {num_workers}.")
+        if handoff_ticks < 1:
+            raise ValueError(
+                f"Handoff ticks must be at least 1. Received: {handoff_ticks}."
+            )
+        if state.aircraft_store.categories is not None:
+            raise ValueError(f"Only states with the full aircraft schema can be split")
+
+        self.state = state  # Template state, for static data
+        self.time = state.time
+        self.tick = state.tick
+        self.extra_time = state.extra_time
+        self.handoff_ticks = handoff_ticks  # Ticks between handing aircraft over
+        self.callsigns = list(state.aircraft_store.callsigns)  # Aircraft order
+        self.handoffs = 0  # Number of aircraft handed over between workers
+
+        # Deal the sectors out by the number of aircraft in them now
+        store = state.aircraft_store
+        sector, _ = state.locate_aircraft()
+        counts = np.bincount(sector[sector >= 0], minlength=len(state.sectors))
+        loads = np.zeros(num_workers, dtype=np.int64)
+        self.owners = np.empty(len(state.sectors), dtype=np.int64)  # Worker of each
+        for row in np.argsort(-counts, kind="stable"):
+            self.owners[row] = np.argmin(loads)
+            loads[self.owners[row]] += counts[row] + 1
+
+        holders = _holders(sector, self.owners, np.arange(len(store)) % num_workers)
+
+        context = multiprocessing.get_context()
+        self._connections = []
+        self._processes = []
+        for worker in range(num_workers):
+            part = state.fork()
+            part.aircraft_store = store.take(np.flatnonzero(holders == worker))
+            part._aircraft_view = None
+            part.extra_time = datetime.timedelta(0)
+            part.conflict_ticks = 0
+            connection, worker_connection = context.Pipe()
+            process = context.Process(
+                target=_work,
+                args=(worker_connection, part, worker, self.owners),
+                daemon=True,
+            )
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+        self._pending = [[] for _ in range(num_workers)]  # Aircraft to hand over
+
+    @staticmethod
+    def load(category: str, scenario_name: str, num_workers: int, **kwargs):
+        """
+        Split a bundled scenario. Keyword arguments are passed to `PartitionedSimulation`.
+        """
+
+        state = State.load(os.path.join(settings.SCENARIO_DIR, category, scenario_name))
+        return PartitionedSimulation(state, num_workers, **kwargs)
+
+    @property
+    def num_workers(self) -> int:
+        return len(self._connections)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+
+        for connection, process in zip(self._connections, self._processes):
+            if process.is_alive():
+                connection.send(("close", None))
+            connection.close()
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def queue_actions(self, actions: list[dict]):
+        """
+        Add a list of actions to the queue of every worker.
+        """
+
+        self._call_all([("queue_actions", actions)] * self.num_workers)
+
+    def evolve(self, evolve_delta: datetime.timedelta):
+        """
+        Evolve the simulation by a given time delta, handing aircraft over every `handoff_ticks` ticks.
+        Hand-overs fall on the same ticks however the time is split between calls.
+        """
+
+        if evolve_delta < datetime.timedelta(seconds=0):
+            raise ValueError(f"Evolve delta must be positive")
+
+        num_steps, self.extra_time = split_steps(evolve_delta, self.extra_time)
+        while num_steps:
+            ticks = min(num_steps, self.handoff_ticks - self.tick % self.handoff_ticks)
+            results = self._call_all(
+                [("evolve", (ticks, pending)) for pending in self._pending]
+            )
+            self._pending = [[] for _ in range(self.num_workers)]
+            for outgoing in results:
+                for worker, detached in outgoing.items():
+                    self._pending[worker].append(detached)
+                    self.handoffs += len(detached["aircraft"])
+
+            self.time += ticks * settings.TIME_STEP_DELTA
+            self.tick += ticks
+            num_steps -= ticks
+
+    def gather(self) -> State:
+        """
+        Collect the aircraft of every worker into one `State`, in their original order, and check their separation.
+        The state shares static data with the template state, and its actions are those of the first worker.
+        """
+
+        parts = self._call_all([("gather", None)] * self.num_workers)
+        stores = [part["aircraft"] for part in parts]
+        stores += [
+            detached["aircraft"] for pending in self._pending for detached in pending
+        ]
+        store = AircraftStore.concatenate(stores)
+        order = np.array(
+            [store.index[callsign] for callsign in self.callsigns], dtype=np.intp
+        )
+
+        state = self.state.fork()
+        state.aircraft_store = store.take(order)
+        state._aircraft_view = None
+        state.action_queue = parts[0]["action_queue"]
+        state.time = self.time
+        state.tick = self.tick
+        state.extra_time = self.extra_time
+        state._reset_version()
+        if state.conflict_ticks:
+            state.detect_conflicts()
+
+        return state
+
+    def dynamic_data(self, format: str = "records") -> dict:
+        """
+        Dynamic data of the gathered aircraft, as returned by `Simulator.dynamic_data`.
+        """
+
+        from .simulator import state_dynamic_data
+
+        if format not in ["records", "columns"]:
+            raise ValueError(f"Unknown dynamic data format {format}.")
+
+        return state_dynamic_data(self.gather(), format)
+
+    def worker_sizes(self) -> list[int]:
+        """
+        Number of aircraft held by each worker, including those being handed over to it.
+        """
+
+        sizes = self._call_all([("size", None)] * self.num_workers)
+        return [
+            size + sum(len(detached["aircraft"]) for detached in pending)
+            for size, pending in zip(sizes, self._pending)
+        ]
+
+    def _call_all(self, messages: list) -> list:
+        """
+        Send a message to each worker, then wait for all their replies, raising any error a worker hit.
+        """
+
+        for connection, message in zip(self._connections, messages):
+            connection.send(message)
+
+        replies = [connection.recv() for connection in self._connections]
+        for error, _ in replies:
+            if error is not None:
+                raise RuntimeError(f"Worker failed:\n{error}")
+
+        return [value for _, value in replies]
+
+
+def _work(connection, state: State, worker: int, owners: np.ndarray):
+    """
+    Serve the coordinator's messages for one worker's part of the state until told to close.
+    Each reply is an (error, value) pair, with the traceback of any error raised.
+    """
+
+    while True:
+        command, argument = connection.recv()
+        if command == "close":
+            connection.close()
+            return
+
+        try:
+            if command == "evolve":
+                ticks, incoming = argument
+                for detached in incoming:
+                    state.attach_aircraft(detached)
+                state.evolve(ticks * settings.TIME_STEP_DELTA)
+                value = _handoffs(state, worker, owners)
+            elif command == "queue_actions":
+                value = state.queue_actions(argument)
+            elif command == "gather":
+                value = {
+                    "aircraft": state.aircraft_store,
+                    "action_queue": state.action_queue,
+                }
+            elif command == "size":
+                value = len(state.aircraft_store)
+            else:
+                raise ValueError(f"Unknown command {command}")
+            connection.send((None, value))
+        except Exception:
+            connection.send((traceback.format_exc(), None))
+
+
+def _handoffs(state: State, worker: int, owners: np.ndarray) -> dict:
+    """
+    Detach the aircraft of `state` that are in sectors of other workers, returning them by worker.
+    """
+
+    sector, _ = state.locate_aircraft()
+    holders = _holders(sector, owners, worker)
+    callsigns = np.array(state.aircraft_store.callsigns, dtype=object)
+
+    return {
+        int(other): state.detach_aircraft(callsigns[holders == other].tolist())
+        for other in np.unique(holders[holders != worker])
+    }
+
+
+def _holders(sector: np.ndarray, owners: np.ndarray, default) -> np.ndarray:
+    """
+    Worker holding each aircraft, given the sector it is in (-1 for none), or `default` outside every sector.
+    """
+
+    if len(owners) == 0:
+        return np.broadcast_to(default, sector.shape).copy()
+
+    return np.where(sector >= 0, owners[np.maximum(sector, 0)], default)
@@ -0,0 +1,178 @@
+"""
+Look-ahead prediction of aircraft tracks.
+
+Instead of stepping the simulation, each aircraft's heading, speed and flight level are found in closed form on a time grid.
+The steering laws in `kinematics` close a saturated proportional loop: the rate is at its maximum while far from the target, then the remaining difference shrinks by a constant factor each step.
+Queued actions split the grid into segments, with the closed form restarted from the state at each action.
+Positions are then integrated along the grid in one pass over every aircraft and time, stepping latitude and longitude with the ellipsoid's radii of curvature so tracks follow the heading as the simulation does.
+"""
+
+import bisect
+import datetime
+import math
+
+import numpy as np
+
+from . import kinematics, settings
+from .actions import to_ns
+
+
+def predict(
+    state,
+    horizon: datetime.timedelta,
+    step: datetime.timedelta,
+    resolution: datetime.timedelta = None,
+) -> np.ndarray:
+    """
+    Predict the position of every aircraft in `state` at each `step` up to `horizon` ahead, without changing the state.
+    Returns an (aircraft, steps, 3) array of lat, lon and flight level, in aircraft store order.
+    Headings and speeds are found every `resolution` (at most one second by default) to integrate positions.
+    """
+
+    if step <= datetime.timedelta(0) or horizon <= datetime.timedelta(0):
+        raise ValueError(f"Horizon and step must be positive")
+
+    num_steps = math.ceil(horizon / step)
+    if resolution is None:
+        resolution = min(step, datetime.timedelta(seconds=1))
+    num_substeps = max(1, math.ceil(step / resolution))
+    h = step.total_seconds() / num_substeps
+    dt = settings.TIME_STEP_DELTA.total_seconds()
+    times = h * np.arange(1, num_steps * num_substeps + 1)
+
+    store = state.aircraft_store
+    data = store.data
+    segments = {  # Start of the current segment of each aircraft
+        "start": np.zeros(len(store)),
+        "heading": data["heading"].copy(),
+        "speed": data["speed"].copy(),
+        "flight_level": data["flight_level"].copy(),
+        "target_heading": data["target_heading"].copy(),
+        "target_speed": data["target_speed"].copy(),
+        "target_flight_level": data["target_flight_level"].copy(),
+    }
+    shortest_turn = state.lnav_ticks > 0
+    tracks = _evaluate(segments, data, slice(None), times, dt, shortest_turn)
+
+    # Restart the segment of each aircraft given an action, from the tick it is delivered in
+    queue = state.action_queue
+    now = to_ns(state.time)
+    end = to_ns(state.time + horizon)
+    first = bisect.bisect_left(queue.times, now, lo=queue.cursor)
+    for n in range(first, len(queue.times)):
+        if queue.times[n] >= end:
+            break
+        action = queue.record(n)
+        kind = action["kind"]
+        if kind not in ["flight_level", "speed", "heading"]:
+            continue
+        if action["callsign"] not in store:
+            continue
+
+        row = store.index[action["callsign"]]
+        start = dt * ((action["time"] - now) // (dt * 1e9))
+        at_start = _evaluate(
+            segments, data, [row], np.array([start]), dt, shortest_turn
+        )
+        for name, values in at_start.items():
+            segments[name][row] = values[0, 0]
+        segments["start"][row] = start
+
+        target = segments[f"target_{kind}"]
+        if action["subkind"] == "absolute":
+            target[row] = float(action["value"])
+        elif action["subkind"] == "relative":
+            target[row] += float(action["value"])
+
+        later = times > start
+        for name, values in _evaluate(
+            segments, data, [row], times[later], dt, shortest_turn
+        ).items():
+            tracks[name][row, later] = values[0]
+
+    # Integrate positions, stepping along the heading at the speed at the end of each substep
+    distances = tracks["speed"] * (kinematics.KNOTS_TO_METRES_PER_SECOND * h)
+    headings = np.radians(tracks["heading"])
+    north = distances * np.cos(headings)
+    east = distances * np.sin(headings)
+
+    lat_0 = data["lat"][:, None]
+    meridian, _ = kinematics.radii(lat_0)
+    lat = lat_0 + np.degrees(np.cumsum(north / meridian, axis=1))
+
+    # Step again with the radii halfway through each substep
+    mid_lat = lat - 0.5 * np.degrees(north / meridian)
+    meridian, prime_vertical = kinematics.radii(mid_lat)
+    steps_lat = np.degrees(north / meridian)
+    lat = lat_0 + np.cumsum(steps_lat, axis=1)
+    mid_lat = lat - 0.5 * steps_lat
+    lon = data["lon"][:, None] + np.degrees(
+        np.cumsum(east / (prime_vertical * np.cos(np.radians(mid_lat))), axis=1)
+    )
+    lon = (lon + 180.0) % 360.0 - 180.0
+
+    samples = slice(num_substeps - 1, None, num_substeps)
+    return np.stack(
+        [lat[:, samples], lon[:, samples], tracks["flight_level"][:, samples]], axis=-1
+    )
+
+
+def _evaluate(
+    segments: dict,
+    data: dict,
+    rows,
+    times: np.ndarray,
+    dt: float,
+    shortest_turn: bool = False,
+) -> dict:
+    """
+    Heading, speed and flight level of the aircraft in `rows` at `times` (seconds from now), from the start of their current segments.
+    Turns follow `kinematics.heading_difference`, given `shortest_turn`.
+    """
+
+    elapsed = times[None, :] - segments["start"][rows, None]
+
+    heading = segments["heading"][rows, None]
+    target_heading = segments["target_heading"][rows, None]
+    delta = kinematics.heading_difference(heading, target_heading, shortest_turn)
+    delta = _remaining(delta, data["max_turn_rate"][rows, None], 5.0, elapsed, dt)
+
+    speed = _remaining(
+        segments["target_speed"][rows, None] - segments["speed"][rows, None],
+        data["max_acceleration"][rows, None],
+        10.0,
+        elapsed,
+        dt,
+    )
+    flight_level = _remaining(
+        segments["target_flight_level"][rows, None]
+        - segments["flight_level"][rows, None],
+        data["max_rise_rate"][rows, None],
+        10.0,
+        elapsed,
+        dt,
+    )
+
+    return {
+        "heading": (target_heading - delta) % 360.0,
+        "speed": segments["target_speed"][rows, None] - speed,
+        "flight_level": segments["target_flight_level"][rows, None] - flight_level,
+    }
+
+
+def _remaining(delta, max_rate, length_scale, elapsed, dt):
+    """
+    Difference from target left after `elapsed` seconds of steering by `kinematics.calc_sign` from an initial difference `delta`.
+    The rate is `max_rate` until the difference falls within `length_scale`, after which it shrinks by a factor of (1 - max_rate * dt / length_scale) every step of `dt`.
+    """
+
+    size = np.abs(delta)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saturated = np.maximum(size - length_scale, 0.0) / max_rate
+        factor = np.maximum(1.0 - max_rate * dt / length_scale, 0.0)
+        decayed = np.minimum(size, length_scale) * factor ** (
+            np.maximum(elapsed - saturated, 0.0) / dt
+        )
+    remaining = np.where(elapsed < saturated, size - max_rate * elapsed, decayed)
+
+    return np.sign(delta) * remaining
@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+
+
+NUM_BUCKETS = 40  # Latency histogram buckets, the last holding everything slower
+
+
+class Profile:
+    """
+    Time spent in each phase of `State.evolve`, and histograms of the latency of whole calls.
+
+    Phases are timed by wrapping the functions that run them (see `wrap`), so a state without a profile runs them unwrapped and pays nothing.
+    Latencies fall into power-of-two buckets of nanoseconds: bucket `k` holds calls taking from 2^(k-1) up to 2^k ns.
+    """
+
+    def __init__(self):
+        """
+        Construct an empty profile.
+        """
+
+        self.phases = {}  # Total nanoseconds and number of calls of each phase
+        self.latencies = {}  # Latency histogram of each kind of call
+
+    def wrap(self, name: str, function):
+        """
+        Wrap `function` so that each call is added to the time of the phase `name`.
+        """
+
+        phase = self.phases.setdefault(name, [0, 0])
+
+        def timed(*args):
+            start = time.perf_counter_ns()
+            result = function(*args)
+            phase[0] += time.perf_counter_ns() - start
+            phase[1] += 1
+            return result
+
+        return timed
+
+    def observe(self, name: str, elapsed: int):
+        """
+        Add a call taking `elapsed` nanoseconds to the latency histogram `name`.
+        """
+
+        histogram = self.latencies.get(name)
+        if histogram is None:
+            histogram = self.latencies[name] = {
+                "counts": np.zeros(NUM_BUCKETS, dtype=np.int64),
+                "total": 0,
+                "max": 0,
+            }
+        histogram["counts"][min(elapsed.bit_length(), NUM_BUCKETS - 1)] += 1
+        histogram["total"] += elapsed
+        histogram["max"] = max(histogram["max"], elapsed)
+
+    def stats(self) -> dict:
+        """
+        Summary of the profile: calls and total, mean and share of time of each phase, and the count, mean, maximum, percentiles and buckets of each latency histogram.
+        Times are in milliseconds, and percentiles are the upper bounds of their buckets, or the maximum if lower.
+        """
+
+        phase_total = sum(total for total, _ in self.phases.values())
+        phases = {
+            name: {
+                "calls": calls,
+                "total_ms": 1e-6 * total,
+                "mean_ms": 1e-6 * total / calls if calls else 0.0,
+                "fraction": total / phase_total if phase_total else 0.0,
+            }
+            for name, (total, calls) in self.phases.items()
+        }
+
+        latencies = {}
+        bounds = 1e-6 * 2.0 ** np.arange(NUM_BUCKETS)
+        for name, histogram in self.latencies.items():
+            counts = histogram["counts"]
+            count = int(counts.sum())
+            cumulative = np.cumsum(counts)
+            summary = {
+                "count": count,
+                "mean_ms": 1e-6 * histogram["total"] / count,
+                "max_ms": 1e-6 * histogram["max"],
+            }
+            for percentile in [50, 90, 99]:
+                bucket = np.searchsorted(cumulative, percentile / 100.0 * count)
+                summary[f"p{percentile}_ms"] = min(
+                    float(bounds[bucket]), summary["max_ms"]
+                )
+            summary["buckets"] = {  # Count of calls up to each bound (ms)
+                f"{bound:.6g}": int(n) for bound, n in zip(bounds, counts) if n > 0
+            }
+            latencies[name] = summary
+
+        return {"phases": phases, "latencies": latencies}
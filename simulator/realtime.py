@@ -0,0 +1,190 @@
+"""
+Running a simulation in real time with asyncio.
+
+`RealtimeDriver` ticks a `Simulator` so its simulated time follows the wall clock, scaled by a rate of time.
+Each tick runs `Simulator.evolve` in an executor, so the event loop stays free to serve observers (display, network pushes) at their own rates.
+"""
+
+import asyncio
+import inspect
+import time
+
+
+class RealtimeDriver:
+    """
+    Drives a `Simulator` so that simulated time stays locked to wall-clock time multiplied by `rate_of_time`.
+
+    Ticks are scheduled every `update_period` seconds of a monotonic clock, from a fixed start, so lateness does not accumulate.
+    Each tick evolves the simulation by however much simulated time is owed, so after an overrun the next tick catches up with a larger delta.
+
+    Observers are called every `period` seconds with a snapshot of the simulator, taken between ticks, so they see a consistent state.
+    The snapshot is a fork without hooks or profile, for reading: nothing attached to it or done to it reaches the running simulation.
+    Observers run in a worker thread of the event loop's default executor, so a slow observer does not hold up the ticks.
+    If an observer returns an awaitable, such as a coroutine sending the data it read, that is awaited on the event loop.
+
+    Anything that must see every tick, such as a `Recorder`, is attached as a hook to the live simulator's state before running instead:
+
+        driver = RealtimeDriver(sim, update_period=0.1)
+        driver.observe(lambda sim: sim.state.display(clear=True), period=0.5)
+        driver.observe(lambda sim: push(sim.dynamic_data()), period=1.0)
+        with Recorder("runs/episode") as recorder:
+            recorder.attach(sim.state)
+            await driver.run()
+    """
+
+    def __init__(
+        self,
+        simulator,
+        update_period: float = 0.5,
+        rate_of_time: float = 1.0,
+        executor=None,
+        clock=time.monotonic,
+        sleep=asyncio.sleep,
+    ):
+        """
+        Construct a driver ticking `simulator` every `update_period` wall-clock seconds, at `rate_of_time` simulated seconds per wall-clock second.
+        Ticks run in `executor`, or the event loop's default executor.
+        Wall-clock time is read from `clock` and waited for with the coroutine function `sleep`, which can be replaced to drive the schedule from a simulated clock.
+        """
+
+        if update_period <= 0.0:
+            raise ValueError(
+                f"Update period must be positive. Received: {update_period}."
+            )
+        if rate_of_time <= 0.0:
+            raise ValueError(
+                f"Rate of time must be positive. Received: {rate_of_time}."
+            )
+
+        self.simulator = simulator
+        self.update_period = update_period  # Wall-clock seconds between ticks
+        self.rate_of_time = rate_of_time  # Simulated seconds per wall-clock second
+        self.executor = executor
+        self.clock = clock  # Seconds of a monotonic clock
+        self.sleep = sleep  # Coroutine function waiting a number of seconds
+        self.observers = []  # (callback, period) of each observer
+        self.ticks = 0  # Number of ticks run
+        self.overruns = 0  # Number of ticks that missed their deadline
+        self._lock = asyncio.Lock()  # Held while evolving or forking for observers
+        self._stopping = False
+        self._anchor = None  # (wall-clock, simulated) seconds time is locked to
+        self._simulated = 0.0  # Simulated seconds evolved since the start
+
+    def observe(self, callback, period: float):
+        """
+        Call `callback(simulator)` every `period` wall-clock seconds while running, with a snapshot of the simulator rather than the running one.
+        """
+
+        if period <= 0.0:
+            raise ValueError(f"Observer period must be positive. Received: {period}.")
+
+        self.observers.append((callback, period))
+
+    def set_rate_of_time(self, rate_of_time: float):
+        """
+        Change the rate of time from now on, without jumping simulated time.
+        """
+
+        if rate_of_time <= 0.0:
+            raise ValueError(
+                f"Rate of time must be positive. Received: {rate_of_time}."
+            )
+
+        if self._anchor is not None:
+            now = self.clock()
+            self._anchor = (now, self._target(now))
+        self.rate_of_time = rate_of_time
+
+    async def action(self, actions: list[dict]) -> bool:
+        """
+        Add actions to the simulator's queue, between ticks.
+        """
+
+        async with self._lock:
+            return self.simulator.action(actions)
+
+    def stop(self):
+        """
+        Stop running after the current tick.
+        """
+
+        self._stopping = True
+
+    async def run(self, duration: float = None):
+        """
+        Tick the simulation until `stop` is called, or for `duration` wall-clock seconds.
+        Observers are run alongside, and cancelled on return. An exception raised by an observer stops the run and is raised here.
+        """
+
+        loop = asyncio.get_running_loop()
+        start = self.clock()
+        self._stopping = False
+        self._anchor = (start, self._simulated)
+        observers = [
+            asyncio.create_task(self._observe(callback, period))
+            for callback, period in self.observers
+        ]
+
+        try:
+            deadline = start
+            while not self._stopping:
+                for task in observers:
+                    if task.done():
+                        task.result()
+
+                now = self.clock()
+                if duration is not None and now - start >= duration:
+                    break
+
+                delta = self._target(now) - self._simulated
+                if delta > 0.0:
+                    async with self._lock:
+                        await loop.run_in_executor(
+                            self.executor, self.simulator.evolve, delta
+                        )
+                    self._simulated += delta
+                self.ticks += 1
+
+                # Sleep until the next deadline, skipping any already missed
+                deadline += self.update_period
+                now = self.clock()
+                if now > deadline:
+                    self.overruns += 1
+                    deadline += self.update_period * (
+                        (now - deadline) // self.update_period + 1
+                    )
+                if duration is not None:
+                    deadline = min(deadline, start + duration)
+                await self.sleep(deadline - now)
+        finally:
+            for task in observers:
+                task.cancel()
+            await asyncio.gather(*observers, return_exceptions=True)
+
+    def _target(self, now: float) -> float:
+        """
+        Simulated seconds since the start that are owed at monotonic time `now`.
+        """
+
+        wall, simulated = self._anchor
+        return simulated + (now - wall) * self.rate_of_time
+
+    async def _observe(self, callback, period: float):
+        """
+        Call an observer every `period` seconds, from the start of the run, with a fork of the simulator taken under the lock.
+        """
+
+        loop = asyncio.get_running_loop()
+        deadline = self.clock()
+        while True:
+            async with self._lock:
+                simulator = self.simulator.fork()
+            result = await loop.run_in_executor(None, callback, simulator)
+            if inspect.isawaitable(result):
+                await result
+
+            deadline += period
+            now = self.clock()
+            if now > deadline:
+                deadline += period * ((now - deadline) // period + 1)
+            await self.sleep(deadline - now)
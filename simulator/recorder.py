@@ -0,0 +1,418 @@
+"""
+Recording of simulation runs to disk, and their replay.
+
+A recording is a directory holding:
+- `meta.json`: the recorded fields and sampling period,
+- `chunk_NNNNNN.npz`: consecutive frames, as flat columns of aircraft values with per-frame offsets, and the actions delivered between frames,
+- `index.jsonl`: one line per chunk with its first and last tick and time, appended as each chunk is written, so a recording can be read before it is closed.
+"""
+
+import bisect
+import datetime
+import json
+import os
+import pathlib
+import queue
+import tempfile
+import threading
+
+import numpy as np
+
+from .actions import ActionQueue, EPOCH, to_ns
+
+
+FORMAT = 1  # Version of the recording layout, bumped when it changes
+DEFAULT_FIELDS = ["lat", "lon", "flight_level", "heading", "speed"]
+
+
+class Recorder:
+    """
+    Records frames of aircraft kinematics, and the actions delivered between them, from a `State` as it evolves.
+    Frames are gathered into chunks in memory and handed to a background thread to write, with at most `max_pending` chunks waiting.
+    Memory use is bounded by `chunk_frames * max_pending` frames, as recording blocks while the writer catches up.
+
+    Use as a context manager, or call `close` to write the last chunk and stop the writer:
+
+        with Recorder("runs/episode") as recorder:
+            recorder.attach(state)
+            state.evolve(datetime.timedelta(minutes=60))
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fields: list[str] = None,
+        every: int = 1,
+        chunk_frames: int = 256,
+        max_pending: int = 4,
+        compress: bool = False,
+    ):
+        """
+        Start a recording in the directory `path`, which must not already hold one.
+        A frame of `fields` is recorded every `every` ticks, and `chunk_frames` frames are written to each chunk file.
+        """
+
+        if every < 1:
+            raise ValueError(
+                f"Recording period must be at least 1 tick. Received: {every}."
+            )
+        if chunk_frames < 1:
+            raise ValueError(
+                f"Chunks must hold at least 1 frame. Received: {chunk_frames}."
+            )
+
+        self.path = pathlib.Path(path)
+        self.fields = list(fields or DEFAULT_FIELDS)
+        self.every = every
+        self.chunk_frames = chunk_frames
+        self.compress = compress
+        self.state = None  # State being recorded
+        self._last_tick = None  # Tick of the last frame recorded
+        self.num_chunks = 0  # Chunks handed to the writer
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        if (self.path / "meta.json").exists():
+            raise ValueError(f"Recording already exists in {self.path}")
+        with open(self.path / "meta.json", "w") as file:
+            json.dump(
+                {"format": FORMAT, "fields": self.fields, "every": self.every}, file
+            )
+
+        self._reset_chunk()
+        self._pending_actions = []  # Actions delivered since the last frame
+        self._queue = queue.Queue(maxsize=max_pending)  # Chunks waiting to be written
+        self._error = None  # Exception raised by the writer, re-raised when recording
+        self._writer = threading.Thread(target=self._write_chunks, daemon=True)
+        self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def attach(self, state):
+        """
+        Record a frame of `state` now, and after every `every` ticks as it evolves.
+        """
+
+        if self.state is not None:
+            raise ValueError("Recorder is already attached to a state.")
+
+        self.state = state
+        state.hooks.append(self._hook)
+        self.record_frame(state)
+
+    def detach(self):
+        """
+        Stop recording the attached state.
+        """
+
+        if self.state is not None:
+            self.state.hooks.remove(self._hook)
+            self.state = None
+
+    def record_frame(self, state):
+        """
+        Record a frame of the aircraft in `state`, along with any actions delivered since the last frame.
+        """
+
+        self._raise_writer_error()
+
+        store = state.aircraft_store
+        if store.callsigns is not self._callsigns:
+            # Callsigns are replaced rather than changed when aircraft come and go
+            self._callsigns = store.callsigns
+            self._codes = np.array(
+                [
+                    self._callsign_codes.setdefault(callsign, len(self._callsign_codes))
+                    for callsign in store.callsigns
+                ],
+                dtype=np.int32,
+            )
+
+        chunk = self._chunk
+        self._last_tick = state.tick
+        chunk["ticks"].append(state.tick)
+        chunk["times"].append(to_ns(state.time))
+        chunk["codes"].append(self._codes)
+        for name in self.fields:
+            chunk[name].append(store[name].copy())
+        chunk["actions"].extend(self._pending_actions)
+        self._pending_actions = []
+
+        if len(chunk["ticks"]) == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """
+        Hand the frames gathered so far to the writer as a chunk.
+        Actions delivered since the last frame are kept for the next one.
+        """
+
+        if not self._chunk["ticks"]:
+            return
+
+        chunk = self._chunk
+        actions = chunk["actions"]
+        arrays = {
+            "ticks": np.array(chunk["ticks"], dtype=np.int64),
+            "times": np.array(chunk["times"], dtype=np.int64),
+            "offsets": np.cumsum(
+                [0] + [len(codes) for codes in chunk["codes"]], dtype=np.int64
+            ),
+            "callsigns": np.array(list(self._callsign_codes), dtype=str),
+            "codes": np.concatenate(chunk["codes"]),
+            "action_ticks": np.array([tick for tick, _ in actions], dtype=np.int64),
+            "action_time": np.array(
+                [action["time"] for _, action in actions], dtype=np.int64
+            ),
+        }
+        for name in self.fields:
+            arrays[f"field_{name}"] = np.concatenate(chunk[name])
+        for name in ActionQueue.columns[1:]:
+            values = [action[name] for _, action in actions]
+            if name == "value":
+                values = [json.dumps(value) for value in values]
+            arrays[f"action_{name}"] = np.array(values, dtype=str)
+
+        self._reset_chunk()
+        self._queue.put((self.num_chunks, arrays))
+        self.num_chunks += 1
+
+    def close(self):
+        """
+        Record a last frame of the state if it has moved on since the last one, detach from it, write any remaining frames and wait for the writer to finish.
+        """
+
+        if self.state is not None and self.state.tick != self._last_tick:
+            self.record_frame(self.state)
+        self.detach()
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+        self._raise_writer_error()
+
+    def _hook(self, state, delivered: range):
+        """
+        Called by `State.evolve` after every step.
+        """
+
+        for n in delivered:
+            self._pending_actions.append((state.tick, state.action_queue.record(n)))
+        if state.tick % self.every == 0:
+            self.record_frame(state)
+
+    def _reset_chunk(self):
+        """
+        Start gathering a new chunk.
+        """
+
+        self._chunk = {"ticks": [], "times": [], "codes": [], "actions": []} | {
+            name: [] for name in self.fields
+        }
+        self._callsign_codes = {}  # Code of each callsign in the chunk
+        self._callsigns = None  # Callsigns the codes were last found for
+        self._codes = None
+
+    def _write_chunks(self):
+        """
+        Write chunks from the queue until it is closed, on the writer thread.
+        """
+
+        index_path = self.path / "index.jsonl"
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue  # Drain the queue so recording does not block
+
+            number, arrays = item
+            name = f"chunk_{number:06d}.npz"
+            try:
+                with tempfile.NamedTemporaryFile(
+                    dir=self.path, suffix=".npz", delete=False
+                ) as file:
+                    (np.savez_compressed if self.compress else np.savez)(file, **arrays)
+                os.replace(file.name, self.path / name)
+                with open(index_path, "a") as file:
+                    entry = {
+                        "file": name,
+                        "frames": len(arrays["ticks"]),
+                        "first_tick": int(arrays["ticks"][0]),
+                        "last_tick": int(arrays["ticks"][-1]),
+                        "first_time": int(arrays["times"][0]),
+                        "last_time": int(arrays["times"][-1]),
+                    }
+                    file.write(json.dumps(entry) + "\n")
+            except Exception as error:
+                self._error = error
+
+    def _raise_writer_error(self):
+        """
+        Re-raise an exception from the writer thread in the recording thread.
+        """
+
+        if self._error is not None:
+            raise RuntimeError(
+                f"Writing recording failed: {self._error}"
+            ) from self._error
+
+
+class Replay:
+    """
+    Reads a recording made by `Recorder`.
+    Frames are found through the chunk index by binary search, and chunks are only read from disk when a frame in them is needed.
+
+    Each frame is a dict of its `tick` and `time`, the `callsigns` of the aircraft, an `aircraft` dict of one array per recorded field, and the `actions` delivered since the previous frame.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open the recording in the directory `path`.
+        """
+
+        self.path = pathlib.Path(path)
+        with open(self.path / "meta.json") as file:
+            meta = json.load(file)
+        if meta["format"] != FORMAT:
+            raise ValueError(f"Unknown recording format {meta['format']}")
+
+        self.fields = meta["fields"]
+        self.every = meta["every"]
+
+        self.chunks = []  # Index entries of the chunks, in order
+        if (self.path / "index.jsonl").exists():
+            with open(self.path / "index.jsonl") as file:
+                self.chunks = [json.loads(line) for line in file if line.strip()]
+        self._first_ticks = [chunk["first_tick"] for chunk in self.chunks]
+        self._first_times = [chunk["first_time"] for chunk in self.chunks]
+        self._loaded = (None, None)  # Number and arrays of the last chunk read
+
+    def __len__(self) -> int:
+        return sum(chunk["frames"] for chunk in self.chunks)
+
+    def __iter__(self):
+        return self.frames()
+
+    def seek(self, tick: int = None, time: datetime.datetime = None) -> dict:
+        """
+        Get the first frame at or after a `tick` or `time`, or None if the recording ends before it.
+        """
+
+        position = self._position(tick, time)
+        if position is None:
+            return None
+
+        return self._frame(*position)
+
+    def frames(
+        self,
+        tick: int = None,
+        time: datetime.datetime = None,
+        end_tick: int = None,
+    ):
+        """
+        Iterate lazily over the frames from the first at or after a `tick` or `time` (the start of the recording by default), up to but not including `end_tick`.
+        """
+
+        if tick is None and time is None:
+            tick = 0
+        position = self._position(tick, time)
+        if position is None:
+            return
+
+        number, row = position
+        while number < len(self.chunks):
+            arrays = self._chunk(number)
+            for row in range(row, len(arrays["ticks"])):
+                if end_tick is not None and arrays["ticks"][row] >= end_tick:
+                    return
+                yield self._frame(number, row)
+            number, row = number + 1, 0
+
+    def _position(self, tick: int, time: datetime.datetime):
+        """
+        Chunk number and row of the first frame at or after a `tick` or `time`, or None if there is none.
+        """
+
+        if (tick is None) == (time is None):
+            raise ValueError("Give exactly one of tick or time.")
+
+        if tick is not None:
+            key, firsts, last, value = "ticks", self._first_ticks, "last_tick", tick
+        else:
+            key, firsts, last, value = (
+                "times",
+                self._first_times,
+                "last_time",
+                to_ns(time),
+            )
+
+        number = max(bisect.bisect_right(firsts, value) - 1, 0)
+        if number < len(self.chunks) and self.chunks[number][last] < value:
+            number += 1
+        if number >= len(self.chunks):
+            return None
+
+        row = int(np.searchsorted(self._chunk(number)[key], value, "left"))
+        return number, row
+
+    def _chunk(self, number: int) -> dict:
+        """
+        Arrays of a chunk, read from disk unless it was the last chunk read.
+        """
+
+        if self._loaded[0] != number:
+            with np.load(self.path / self.chunks[number]["file"]) as file:
+                self._loaded = (number, {name: file[name] for name in file.files})
+
+        return self._loaded[1]
+
+    def _frame(self, number: int, row: int) -> dict:
+        """
+        Build the frame in a row of a chunk.
+        """
+
+        arrays = self._chunk(number)
+        start, end = arrays["offsets"][row], arrays["offsets"][row + 1]
+        tick = arrays["ticks"][row]
+
+        # Actions delivered after the previous frame in the chunk, up to this one
+        after = arrays["ticks"][row - 1] if row > 0 else np.iinfo(np.int64).min
+        ticks = arrays["action_ticks"]
+        actions = [
+            {
+                "time": str(_from_ns(time)),
+                "agent": str(agent),
+                "callsign": str(callsign),
+                "kind": str(kind),
+                "subkind": str(subkind),
+                "value": json.loads(str(value)),
+            }
+            for time, agent, callsign, kind, subkind, value in zip(
+                *[
+                    arrays[f"action_{name}"][(ticks > after) & (ticks <= tick)]
+                    for name in ActionQueue.columns
+                ]
+            )
+        ]
+
+        return {
+            "tick": int(tick),
+            "time": _from_ns(arrays["times"][row]),
+            "callsigns": arrays["callsigns"][arrays["codes"][start:end]].tolist(),
+            "aircraft": {
+                name: arrays[f"field_{name}"][start:end] for name in self.fields
+            },
+            "actions": actions,
+        }
+
+
+def _from_ns(time: int) -> datetime.datetime:
+    """
+    Convert nanoseconds since the epoch to a naive datetime.
+    """
+
+    return EPOCH + datetime.timedelta(microseconds=int(time) // 1000)
@@ -0,0 +1,262 @@
+"""
+Binary cache of parsed scenarios.
+
+A scenario directory is compiled into a `.compiled` directory next to its source files.
+Numeric columns are stored as .npy arrays, which are memory-mapped copy-on-write when read, so loading does not parse any text.
+Strings are stored once in a JSON manifest, with aircraft type, agent, bay and route fixes encoded as integer codes.
+The compiled arrays of the sector index are stored too, so loading does not compile the sector volumes or build their polygons.
+
+The manifest records a hash of the source files' contents, and the cache is ignored once they change.
+It also records the size and modification time of each source file, and the contents are only hashed when these differ from the manifest.
+As modification times are coarse on some file systems, they are only trusted for files last modified `RACY_NS` before the manifest was written.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import settings
+from .actions import ActionQueue
+from .aircraft import AircraftStore
+from .airspace import SectorIndex
+
+
+FORMAT = 2  # Version of the cache layout, bumped when it changes
+CACHE_DIR = ".compiled"  # Directory of the cache, inside the scenario directory
+SOURCES = ["meta.json", "fixes.csv", "sectors.json", "aircraft.csv", "actions.csv"]
+RACY_NS = 2_000_000_000  # Age a source file must have for its stats to be trusted
+
+CATEGORICAL_FIELDS = ["type", "agent", "bay"]  # Aircraft strings stored as codes
+NUMERIC_FIELDS = [  # Aircraft floats stored in one array, one row per field
+    name for name, dtype in AircraftStore.fields.items() if dtype == "float64"
+]
+
+
+def source_hash(scenario_dir: pathlib.Path) -> str:
+    """
+    Hash of the contents of the source files of a scenario.
+    """
+
+    digest = hashlib.sha256()
+    for name in SOURCES:
+        digest.update(name.encode())
+        digest.update((scenario_dir / name).read_bytes())
+
+    return digest.hexdigest()
+
+
+def source_stats(scenario_dir: pathlib.Path) -> list:
+    """
+    Size and modification time (nanoseconds) of each source file of a scenario.
+    """
+
+    stats = [os.stat(scenario_dir / name) for name in SOURCES]
+    return [[stat.st_size, stat.st_mtime_ns] for stat in stats]
+
+
+def write(state, scenario_dir: pathlib.Path):
+    """
+    Compile a freshly loaded `state` into the cache of `scenario_dir`.
+    Every file is written to a temporary name and moved into place, and the manifest is written last.
+    """
+
+    cache_dir = scenario_dir / CACHE_DIR
+    cache_dir.mkdir(exist_ok=True)
+    stats = source_stats(scenario_dir)
+    digest = source_hash(scenario_dir)
+
+    with open(scenario_dir / "sectors.json") as file:
+        sectors = json.load(file)
+
+    store = state.aircraft_store
+    categories = {}
+    codes = np.empty((len(CATEGORICAL_FIELDS), len(store)), dtype=np.int32)
+    for row, name in enumerate(CATEGORICAL_FIELDS):
+        categories[name], codes[row] = np.unique(
+            store[name].astype(str), return_inverse=True
+        )
+
+    routes = store["route"].tolist()
+    route_names, route_fixes = np.unique(
+        np.array([fix for route in routes for fix in route], dtype=str),
+        return_inverse=True,
+    )
+    route_offsets = np.cumsum([0] + [len(route) for route in routes], dtype=np.int64)
+
+    queue = state.action_queue
+    arrays = {
+        "aircraft": np.stack([store[name] for name in NUMERIC_FIELDS]),
+        "codes": codes,
+        "route_fixes": route_fixes.astype(np.int32),
+        "route_offsets": route_offsets,
+        "fixes": state.fixes.to_numpy(dtype=np.float64),
+        "action_times": np.array(queue.times, dtype=np.int64),
+    }
+    for name, values in state.sector_index.to_arrays().items():
+        arrays[f"sector_{name}"] = values
+    for name, values in arrays.items():
+        _replace(cache_dir / f"{name}.npy", lambda file: np.save(file, values))
+
+    manifest = {
+        "format": FORMAT,
+        "hash": digest,
+        "stats": stats,
+        "written_ns": time.time_ns(),
+        "start_time": state.time.strftime(settings.TIME_FORMAT),
+        "fixes": {
+            "index": state.fixes.index.tolist(),
+            "index_name": state.fixes.index.name,
+            "columns": state.fixes.columns.tolist(),
+        },
+        "sectors": sectors,
+        "aircraft": {
+            "callsigns": store.callsigns,
+            "categories": {
+                name: values.tolist() for name, values in categories.items()
+            },
+            "route_names": route_names.tolist(),
+        },
+        "actions": {name: _plain(values) for name, values in queue.records.items()},
+    }
+    _write_manifest(cache_dir, manifest)
+
+
+def read(scenario_dir: pathlib.Path):
+    """
+    Read the cache of `scenario_dir`, or return None if it is missing, unreadable or out of date.
+    Returns a dict of the `start_time`, `fixes` DataFrame, `sectors` as held in sectors.json, `sector_index` arrays, `aircraft_store` and `action_queue`.
+    """
+
+    cache_dir = scenario_dir / CACHE_DIR
+    try:
+        with open(cache_dir / "manifest.json") as file:
+            manifest = json.load(file)
+        if manifest["format"] != FORMAT or not _fresh(scenario_dir, manifest):
+            return None
+
+        arrays = {
+            name: np.load(cache_dir / f"{name}.npy", mmap_mode="c").view(np.ndarray)
+            for name in [
+                "aircraft",
+                "codes",
+                "route_fixes",
+                "route_offsets",
+                "fixes",
+                "action_times",
+            ]
+            + [f"sector_{name}" for name in SectorIndex.ARRAYS]
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+
+    fixes = pd.DataFrame(
+        arrays["fixes"],
+        index=pd.Index(
+            manifest["fixes"]["index"], name=manifest["fixes"]["index_name"]
+        ),
+        columns=manifest["fixes"]["columns"],
+    )
+
+    aircraft = manifest["aircraft"]
+    data = dict(zip(NUMERIC_FIELDS, arrays["aircraft"]))
+    for row, name in enumerate(CATEGORICAL_FIELDS):
+        data[name] = np.array(aircraft["categories"][name], dtype=object)[
+            arrays["codes"][row]
+        ]
+    fixes_flat = np.array(aircraft["route_names"], dtype=object)[
+        arrays["route_fixes"]
+    ].tolist()
+    offsets = arrays["route_offsets"].tolist()
+    data["route"] = np.fromiter(
+        (fixes_flat[start:end] for start, end in zip(offsets[:-1], offsets[1:])),
+        dtype=object,
+        count=len(offsets) - 1,
+    )
+
+    queue = ActionQueue()
+    queue.extend(arrays["action_times"].tolist(), manifest["actions"])
+
+    return {
+        "start_time": datetime.datetime.strptime(
+            manifest["start_time"], settings.TIME_FORMAT
+        ),
+        "fixes": fixes,
+        "sectors": manifest["sectors"],
+        "sector_index": {name: arrays[f"sector_{name}"] for name in SectorIndex.ARRAYS},
+        "aircraft_store": AircraftStore.from_arrays(aircraft["callsigns"], data),
+        "action_queue": queue,
+    }
+
+
+def _fresh(scenario_dir: pathlib.Path, manifest: dict) -> bool:
+    """
+    Whether the source files are those the cache was compiled from.
+    Their contents are only hashed when their stats differ from those in the manifest, or are too recent to trust.
+    The manifest is updated after a hash shows files were touched but not changed, so they are not hashed again.
+    """
+
+    stats = source_stats(scenario_dir)
+    if stats == manifest["stats"] and _trusted(stats, manifest["written_ns"]):
+        return True
+
+    if source_hash(scenario_dir) != manifest["hash"]:
+        return False
+
+    now = time.time_ns()
+    if _trusted(stats, now):
+        try:
+            _write_manifest(
+                scenario_dir / CACHE_DIR,
+                manifest | {"stats": stats, "written_ns": now},
+            )
+        except OSError:
+            pass  # e.g. the scenario directory is read-only
+
+    return True
+
+
+def _trusted(stats: list, written_ns: int) -> bool:
+    """
+    Whether every file was last modified long enough before `written_ns` for a later change to show in its stats.
+    """
+
+    return all(mtime_ns < written_ns - RACY_NS for _, mtime_ns in stats)
+
+
+def _write_manifest(cache_dir: pathlib.Path, manifest: dict):
+    """
+    Write the manifest, which marks the cache as complete.
+    """
+
+    _replace(
+        cache_dir / "manifest.json",
+        lambda file: file.write(json.dumps(manifest).encode()),
+    )
+
+
+def _replace(path: pathlib.Path, write_file):
+    """
+    Write a file under a temporary name and move it over `path`.
+    Memory maps of the old file are left untouched, as they keep the replaced file alive.
+    """
+
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as file:
+        write_file(file)
+    os.replace(file.name, path)
+
+
+def _plain(values: list) -> list:
+    """
+    Convert NumPy scalars in a list to Python values, so they can be encoded as JSON.
+    """
+
+    return [
+        value.item() if isinstance(value, np.generic) else value for value in values
+    ]
@@ -0,0 +1,239 @@
+"""
+Generation of synthetic scenarios of any size, for testing and benchmarking.
+
+Fixes are laid on a jittered grid, about `FIX_SPACING_NM` apart, with the grid growing with the number of aircraft so traffic density stays about the same.
+Sectors tile the grid, each with a lower volume and an upper volume that overhangs it, and each aircraft flies a straight walk along the grid of fixes.
+"""
+
+import datetime
+import json
+import math
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+from . import settings
+
+
+FIX_SPACING_NM = 20.0  # Distance between neighbouring fixes
+AIRCRAFT_PER_FIX = 4.0  # Aircraft per fix, setting the size of the grid
+FIXES_PER_SECTOR = 4  # Fixes along each side of a sector
+SPLIT_LEVEL = 245.0  # Flight level dividing the lower and upper volumes of sectors
+AIRLINES = ["BAW", "EZY", "RYR", "DLH", "AFR", "KLM", "UAE", "VIR"]
+AGENTS = ["human", "AI001", "AI002", "AI003"]
+TYPES = ["light", "medium", "heavy"]
+
+
+def generate(
+    scenario_dir: str,
+    num_aircraft: int,
+    num_actions: int = None,
+    seed: int = 0,
+    centre: tuple = (50.0, 0.0),
+    start_time: datetime.datetime = datetime.datetime(2019, 1, 1),
+    duration: datetime.timedelta = datetime.timedelta(minutes=10),
+):
+    """
+    Write a scenario of `num_aircraft` aircraft to `scenario_dir`, which is created if needed.
+    `num_actions` actions (one per aircraft by default) are spread over the first `duration` of the scenario.
+    The same `seed` always gives the same scenario.
+    """
+
+    if num_aircraft < 1:
+        raise ValueError(
+            f"Scenario must contain at least one aircraft. Received: {num_aircraft}."
+        )
+
+    rng = np.random.default_rng(seed)
+    scenario_dir = pathlib.Path(scenario_dir)
+    os.makedirs(scenario_dir, exist_ok=True)
+
+    # Fixes on a square grid centred on `centre`
+    side = max(FIXES_PER_SECTOR, math.ceil(math.sqrt(num_aircraft / AIRCRAFT_PER_FIX)))
+    spacing_lat = FIX_SPACING_NM / 60.0
+    spacing_lon = spacing_lat / math.cos(math.radians(centre[0]))
+    origin_lat = centre[0] - 0.5 * side * spacing_lat
+    origin_lon = centre[1] - 0.5 * side * spacing_lon
+    rows, columns = np.divmod(np.arange(side * side), side)
+    fix_lat = (
+        origin_lat + (rows + 0.5 + rng.uniform(-0.25, 0.25, rows.size)) * spacing_lat
+    )
+    fix_lon = (
+        origin_lon + (columns + 0.5 + rng.uniform(-0.25, 0.25, rows.size)) * spacing_lon
+    )
+    fix_names = [_fix_name(n) for n in range(side * side)]
+    fixes = pd.DataFrame(
+        {"lat": fix_lat.round(4), "lon": fix_lon.round(4)},
+        index=pd.Index(fix_names, name=""),
+    )
+
+    # Sectors tiling the grid, each a lower volume and an upper volume one fix wider
+    sectors = {}
+    num_sectors = math.ceil(side / FIXES_PER_SECTOR)
+    for row in range(num_sectors):
+        for column in range(num_sectors):
+            bottom = origin_lat + row * FIXES_PER_SECTOR * spacing_lat
+            left = origin_lon + column * FIXES_PER_SECTOR * spacing_lon
+            top = bottom + FIXES_PER_SECTOR * spacing_lat
+            right = left + FIXES_PER_SECTOR * spacing_lon
+            sectors[f"s{row * num_sectors + column}"] = {
+                "agent": AGENTS[(row + column) % len(AGENTS)],
+                "vols": [
+                    {
+                        "boundary": _box(bottom, left, top, right),
+                        "min": 0.0,
+                        "max": SPLIT_LEVEL,
+                    },
+                    {
+                        "boundary": _box(
+                            bottom - 0.5 * spacing_lat,
+                            left - 0.5 * spacing_lon,
+                            top + 0.5 * spacing_lat,
+                            right + 0.5 * spacing_lon,
+                        ),
+                        "min": SPLIT_LEVEL,
+                        "max": 660.0,
+                    },
+                ],
+            }
+
+    # Each aircraft starts near a fix, heading for the next fix of a straight walk across the grid
+    start = rng.integers(0, side * side, num_aircraft)
+    steps = np.array(
+        [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+    )
+    step_rows, step_columns = steps[rng.integers(0, len(steps), num_aircraft)].T
+    route_length = rng.integers(3, 7, num_aircraft)
+    routes = []
+    next_fix = np.empty(num_aircraft, dtype=np.int64)
+    for n in range(num_aircraft):
+        row, column = divmod(int(start[n]), side)
+        route = []
+        for _ in range(route_length[n]):
+            row = min(max(row + step_rows[n], 0), side - 1)
+            column = min(max(column + step_columns[n], 0), side - 1)
+            route.append(row * side + column)
+        next_fix[n] = route[0]
+        routes.append(str([fix_names[fix] for fix in dict.fromkeys(route)]))
+
+    lat = fix_lat[start] + rng.uniform(-0.2, 0.2, num_aircraft) * spacing_lat
+    lon = fix_lon[start] + rng.uniform(-0.2, 0.2, num_aircraft) * spacing_lon
+    heading = (
+        np.degrees(
+            np.arctan2(
+                (fix_lon[next_fix] - lon) * math.cos(math.radians(centre[0])),
+                fix_lat[next_fix] - lat,
+            )
+        )
+        % 360.0
+    )
+    heading = np.where(
+        next_fix == start, rng.uniform(0.0, 360.0, num_aircraft), heading
+    )
+    flight_level = 10.0 * rng.integers(10, 41, num_aircraft)
+    speed = 10.0 * rng.integers(20, 49, num_aircraft)
+    callsigns = [
+        f"{AIRLINES[n % len(AIRLINES)]}{n // len(AIRLINES) + 1:04d}"
+        for n in range(num_aircraft)
+    ]
+    aircraft = pd.DataFrame(
+        {
+            "type": rng.choice(TYPES, num_aircraft),
+            "agent": rng.choice(AGENTS, num_aircraft),
+            "bay": "INCOMM",
+            "lat": lat.round(4),
+            "lon": lon.round(4),
+            "flight_level": flight_level,
+            "target_flight_level": flight_level,
+            "heading": heading.round(1),
+            "target_heading": heading.round(1),
+            "speed": speed,
+            "target_speed": speed,
+            "rise": 0.0,
+            "max_rise_rate": 1.0,
+            "turn": 0.0,
+            "max_turn_rate": 1.0,
+            "acceleration": 0.0,
+            "max_acceleration": 20.0,
+            "route": routes,
+        },
+        index=pd.Index(callsigns, name=""),
+    )
+
+    # Actions for random aircraft, in time order
+    num_actions = num_aircraft if num_actions is None else num_actions
+    offsets = np.sort(rng.uniform(0.0, duration.total_seconds(), num_actions))
+    kinds = rng.choice(["flight_level", "heading", "speed"], num_actions)
+    subkinds = rng.choice(["absolute", "relative"], num_actions)
+    targets = rng.integers(0, num_aircraft, num_actions)
+    values = np.select(
+        [kinds == "flight_level", kinds == "heading"],
+        [
+            np.where(
+                subkinds == "absolute",
+                10.0 * rng.integers(10, 41, num_actions),
+                10.0 * rng.integers(-3, 4, num_actions),
+            ),
+            np.where(
+                subkinds == "absolute",
+                5.0 * rng.integers(0, 72, num_actions),
+                5.0 * rng.integers(-18, 19, num_actions),
+            ),
+        ],
+        np.where(
+            subkinds == "absolute",
+            10.0 * rng.integers(20, 49, num_actions),
+            10.0 * rng.integers(-5, 6, num_actions),
+        ),
+    )
+    actions = pd.DataFrame(
+        {
+            "time": [
+                (start_time + datetime.timedelta(seconds=int(offset))).strftime(
+                    settings.TIME_FORMAT
+                )
+                for offset in offsets
+            ],
+            "agent": aircraft["agent"].to_numpy()[targets],
+            "callsign": np.array(callsigns)[targets],
+            "kind": kinds,
+            "subkind": subkinds,
+            "value": values,
+        }
+    )
+
+    with open(scenario_dir / "meta.json", "w") as file:
+        json.dump({"start_time": start_time.strftime(settings.TIME_FORMAT)}, file)
+    fixes.to_csv(scenario_dir / "fixes.csv")
+    with open(scenario_dir / "sectors.json", "w") as file:
+        json.dump(sectors, file)
+    aircraft.to_csv(scenario_dir / "aircraft.csv")
+    actions.to_csv(scenario_dir / "actions.csv", index=False)
+
+
+def _fix_name(n: int) -> str:
+    """
+    Five letter name of the `n`th fix.
+    """
+
+    letters = []
+    for _ in range(5):
+        n, letter = divmod(n, 26)
+        letters.append(chr(ord("A") + letter))
+
+    return "".join(reversed(letters))
+
+
+def _box(bottom: float, left: float, top: float, right: float) -> list:
+    """
+    Boundary of a lat/lon box, as [lat, lon] points.
+    """
+
+    return [
+        [round(top, 4), round(right, 4)],
+        [round(bottom, 4), round(right, 4)],
+        [round(bottom, 4), round(left, 4)],
+        [round(top, 4), round(left, 4)],
+    ]
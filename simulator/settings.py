@@ -6,6 +6,16 @@ import os
 class Environment(BaseSettings):
     RESOURCES_DIR: str
     TIME_STEP_MS: int
+    HISTORY_DEPTH: int = 5
+    HISTORY_INTERVAL_MS: int = 1000
+    CONFLICT_LATERAL_NM: float = 5.0
+    CONFLICT_VERTICAL_FL: float = 10.0
+    CONFLICT_CHECK_TICKS: int = 0
+    LNAV_TICKS: int = 0
+    GEODESY: str = "exact"
+    SCHEMA: str = "full"
+    STEPPING: str = "fixed"
+    PROFILE: bool = False
 
     class Config:
         env_prefix = ""
@@ -21,3 +31,29 @@ TIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # Format for datetime strings in input files.
 TIME_STEP_DELTA = datetime.timedelta(
     milliseconds=ENV.TIME_STEP_MS
 )  # Steps will always be this amount of time. Longer steps will be broken down into multiple steps of this duration.
+HISTORY_DEPTH = ENV.HISTORY_DEPTH  # Number of past positions kept for each aircraft.
+HISTORY_INTERVAL = datetime.timedelta(
+    milliseconds=ENV.HISTORY_INTERVAL_MS
+)  # Simulated time between samples of the position history, rounded to a whole number of steps.
+CONFLICT_LATERAL_NM = (
+    ENV.CONFLICT_LATERAL_NM
+)  # Lateral separation minimum (nautical miles).
+CONFLICT_VERTICAL_FL = (
+    ENV.CONFLICT_VERTICAL_FL
+)  # Vertical separation minimum (flight levels).
+CONFLICT_CHECK_TICKS = (
+    ENV.CONFLICT_CHECK_TICKS
+)  # Ticks between separation checks, or 0 to never check.
+LNAV_TICKS = (
+    ENV.LNAV_TICKS
+)  # Ticks between steering aircraft along their routes, or 0 to never steer.
+GEODESY = (
+    ENV.GEODESY
+)  # Lateral motion: "exact" with pyproj, or "fast" (see kinematics).
+SCHEMA = (
+    ENV.SCHEMA
+)  # Loaded aircraft: "full", "compact" (coded strings), or "compact32" (also float32 kinematics).
+STEPPING = (
+    ENV.STEPPING
+)  # Ticks: "fixed" runs every phase every tick, "adaptive" advances quiet stretches in one go (see stepping).
+PROFILE = ENV.PROFILE  # Whether states time the phases of each step from the start.
@@ -0,0 +1,224 @@
+"""
+Publishing the live aircraft kinematics in shared memory, for other processes on the same host.
+
+A `SharedAircraftPublisher` owns a `multiprocessing.shared_memory` block laid out as:
+
+- A header of int64 slots (see `HEADER`), starting with a sequence counter.
+- One float64 column per field in `COLUMNS`, with room for `capacity` aircraft.
+- The callsign of each row, as fixed-width bytes.
+
+Rows are in aircraft store order, so row `n` of every column is the aircraft with the `n`th callsign.
+The sequence counter is a seqlock: it is odd while a publish is in progress and moves on by two with each publish, so readers can tell a consistent snapshot from a torn one without locking out the writer.
+Callsigns are only rewritten when the aircraft change, marked by a change of `callsign_version`.
+"""
+
+import time
+
+import numpy as np
+
+from .actions import to_ns
+
+
+HEADER = [  # Int64 slots at the start of the block
+    "sequence",  # Seqlock counter, odd while being written
+    "num_aircraft",  # Rows in use
+    "capacity",  # Rows of room in each column
+    "callsign_width",  # Bytes of each callsign
+    "callsign_version",  # Incremented whenever the callsigns change
+    "tick",  # Tick of the simulation when published
+    "time",  # Simulated time when published (nanoseconds since the epoch)
+    "publish_time",  # Wall-clock time when published (nanoseconds since the epoch)
+]
+COLUMNS = ["lat", "lon", "flight_level", "heading", "speed"]  # Published fields
+CALLSIGN_WIDTH = 16  # Default bytes of room for each callsign
+
+
+class SharedAircraftPublisher:
+    """
+    Writer of a shared memory block holding the current kinematics of every aircraft in a state. See the module docstring for the layout.
+    """
+
+    def __init__(
+        self,
+        name: str = None,
+        capacity: int = 1024,
+        callsign_width: int = CALLSIGN_WIDTH,
+    ):
+        """
+        Create a block with room for `capacity` aircraft, named `name` or a random name (see `name`).
+        """
+
+        from multiprocessing import shared_memory
+
+        if capacity < 1:
+            raise ValueError(f"Capacity must be at least 1. Received: {capacity}.")
+
+        self.memory = shared_memory.SharedMemory(
+            name=name, create=True, size=_size(capacity, callsign_width)
+        )
+        self.header, self.columns, self.callsigns = _views(
+            self.memory.buf, capacity, callsign_width
+        )
+        self.header[:] = 0
+        self.header[HEADER.index("capacity")] = capacity
+        self.header[HEADER.index("callsign_width")] = callsign_width
+        self._published_callsigns = None  # Callsign list last written
+
+    @property
+    def name(self) -> str:
+        """
+        Name of the block, for readers to open.
+        """
+
+        return self.memory.name
+
+    def publish(self, state):
+        """
+        Write the current kinematics of every aircraft in `state`, bracketed by the seqlock.
+        """
+
+        store = state.aircraft_store
+        header = self.header
+        capacity = header[HEADER.index("capacity")]
+        if len(store) > capacity:
+            raise ValueError(
+                f"Too many aircraft to share. Capacity: {capacity}, received: {len(store)}."
+            )
+
+        rows = len(store)
+        changed = store.callsigns is not self._published_callsigns
+        if changed:
+            callsigns = [callsign.encode() for callsign in store.callsigns]
+            width = header[HEADER.index("callsign_width")]
+            if any(len(callsign) > width for callsign in callsigns):
+                raise ValueError(f"Callsigns must fit in {width} bytes to share")
+
+        header[0] += 1  # Odd: writing
+        if changed:
+            self.callsigns[:rows] = callsigns
+            self.callsigns[rows:] = b""
+            header[HEADER.index("callsign_version")] += 1
+            self._published_callsigns = store.callsigns
+        for name in COLUMNS:
+            self.columns[name][:rows] = store.data[name]
+        header[HEADER.index("num_aircraft")] = rows
+        header[HEADER.index("tick")] = state.tick
+        header[HEADER.index("time")] = to_ns(state.time)
+        header[HEADER.index("publish_time")] = time.time_ns()
+        header[0] += 1  # Even: consistent
+
+    def close(self):
+        """
+        Close and remove the block. Readers that still have it open keep their mapping.
+        """
+
+        self.header = self.columns = self.callsigns = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SharedAircraftReader:
+    """
+    Reader of a block written by a `SharedAircraftPublisher`, mapping its columns as NumPy arrays without copying.
+
+    `columns` are live views of the block, which a publish can change under the reader.
+    `snapshot` copies them out under the seqlock, retrying until it gets a consistent copy, which costs about a memcpy of the columns.
+    """
+
+    def __init__(self, name: str):
+        """
+        Open the block called `name`.
+        """
+
+        from multiprocessing import shared_memory
+
+        try:
+            self.memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Before Python 3.13, every opener is tracked
+            from multiprocessing import resource_tracker
+
+            self.memory = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self.memory._name, "shared_memory")
+
+        header = np.ndarray(len(HEADER), dtype=np.int64, buffer=self.memory.buf)
+        self.header, self.columns, self._callsigns = _views(
+            self.memory.buf,
+            int(header[HEADER.index("capacity")]),
+            int(header[HEADER.index("callsign_width")]),
+        )
+        self._callsign_cache = (None, [])  # Callsign version and decoded callsigns
+
+    @property
+    def sequence(self) -> int:
+        """
+        Current seqlock counter: odd while a publish is in progress, and moving on with each publish.
+        """
+
+        return int(self.header[0])
+
+    def snapshot(self, max_attempts: int = 1000) -> dict:
+        """
+        A consistent copy of the published data: the `sequence`, `tick` and `time` (a numpy datetime64) it was published at, the `callsigns`, and an array per column.
+        """
+
+        for _ in range(max_attempts):
+            sequence = self.header[0]
+            if sequence % 2:
+                time.sleep(0)
+                continue
+
+            header = self.header.copy()
+            rows = header[HEADER.index("num_aircraft")]
+            columns = {name: self.columns[name][:rows].copy() for name in COLUMNS}
+            version = header[HEADER.index("callsign_version")]
+            if version != self._callsign_cache[0]:
+                callsigns = [callsign.decode() for callsign in self._callsigns[:rows]]
+            else:
+                callsigns = self._callsign_cache[1]
+
+            if self.header[0] == sequence:
+                self._callsign_cache = (version, callsigns)
+                return {
+                    "sequence": int(sequence),
+                    "tick": int(header[HEADER.index("tick")]),
+                    "time": np.datetime64(int(header[HEADER.index("time")]), "ns"),
+                    "callsigns": list(callsigns),
+                } | columns
+
+        raise TimeoutError(f"No consistent snapshot in {max_attempts} attempts")
+
+    def close(self):
+        """
+        Close the mapping, after which the column views must not be used.
+        """
+
+        self.header = self.columns = self._callsigns = None
+        self.memory.close()
+
+
+def _size(capacity: int, callsign_width: int) -> int:
+    """
+    Bytes of a block with room for `capacity` aircraft.
+    """
+
+    return 8 * len(HEADER) + capacity * (8 * len(COLUMNS) + callsign_width)
+
+
+def _views(buffer, capacity: int, callsign_width: int):
+    """
+    Header, columns and callsigns of a block, as arrays over its `buffer`.
+    """
+
+    header = np.ndarray(len(HEADER), dtype=np.int64, buffer=buffer)
+    offset = header.nbytes
+    columns = {}
+    for name in COLUMNS:
+        columns[name] = np.ndarray(
+            capacity, dtype=np.float64, buffer=buffer, offset=offset
+        )
+        offset += columns[name].nbytes
+    callsigns = np.ndarray(
+        capacity, dtype=f"S{callsign_width}", buffer=buffer, offset=offset
+    )
+
+    return header, columns, callsigns
@@ -1,12 +1,15 @@
-import ast
+import copy
 import datetime
 import json
 import os
+import time
 
-from interface import Simulator as SimABC
+from interface import Simulator as SimABC  # Imported eagerly, as the base class
 
-from . import settings
-from .state import State
+from . import catalogue, settings
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
 
 
 class Simulator(SimABC):
@@ -16,10 +19,7 @@ class Simulator(SimABC):
         List the available scenario categories.
         """
 
-        scenario_categories = os.listdir(settings.SCENARIO_DIR)
-        scenario_categories.sort()
-
-        return scenario_categories
+        return list(catalogue.scenarios(settings.SCENARIO_DIR))
 
     @classmethod
     def list_scenarios(cls, category: str) -> list[str]:
@@ -27,10 +27,11 @@ class Simulator(SimABC):
         List the scenarios in a given category.
         """
 
-        scenario_names = os.listdir(os.path.join(settings.SCENARIO_DIR, category))
-        scenario_names.sort()
+        scenarios = catalogue.scenarios(settings.SCENARIO_DIR)
+        if category not in scenarios:
+            raise ValueError(f"Unknown scenario category {category}")
 
-        return scenario_names
+        return list(scenarios[category])
 
     @classmethod
     def scenario_info(cls, category: str, scenario_name: str) -> dict:
@@ -38,16 +39,14 @@ class Simulator(SimABC):
         Get information about a specific scenario.
         """
 
+        scenarios = catalogue.scenarios(settings.SCENARIO_DIR)
+        if scenario_name not in scenarios.get(category, {}):
+            raise ValueError(f"Unknown scenario {category}/{scenario_name}")
+
         return {
             "category": category,
             "scenario_name": scenario_name,
-            "meta": json.load(
-                open(
-                    os.path.join(
-                        settings.SCENARIO_DIR, category, scenario_name, "meta.json"
-                    )
-                )
-            ),
+            "meta": copy.deepcopy(scenarios[category][scenario_name]),
         }
 
     def __init__(self, category: str, scenario_name: str):
@@ -55,10 +54,26 @@ class Simulator(SimABC):
         Initialise a simulation instance from a given scenario.
         """
 
+        from .state import State
+
         self.scenario_name = scenario_name
         self.state = State.load(
             os.path.join(settings.SCENARIO_DIR, category, scenario_name)
         )
+        self._static_cache = None  # Static data and the sources it was built from
+        self._publisher = None  # Shared memory block published to after each evolve
+
+    def fork(self):
+        """
+        Branch the simulation: the returned simulator evolves independently from this one.
+        Static scenario data is shared between the two, and only this one publishes to shared memory.
+        """
+
+        simulator = copy.copy(self)
+        simulator.state = self.state.fork()
+        simulator._publisher = None
+
+        return simulator
 
     def evolve(self, delta: float) -> bool:
         """
@@ -68,10 +83,75 @@ class Simulator(SimABC):
         if delta <= 0:
             raise ValueError("Time delta must be positive. Received: {}.", delta)
 
+        profile = self.state.profile
+        if profile is None:
+            self.state.evolve(datetime.timedelta(seconds=delta))
+            if self._publisher is not None:
+                self._publisher.publish(self.state)
+            return True
+
+        start = time.perf_counter_ns()
         self.state.evolve(datetime.timedelta(seconds=delta))
+        if self._publisher is not None:
+            self._publisher.publish(self.state)
+        profile.observe("evolve", time.perf_counter_ns() - start)
 
         return True
 
+    def share(self, name: str = None, capacity: int = None) -> str:
+        """
+        Publish the aircraft kinematics to a shared memory block after every `evolve`, starting now, and return the name of the block.
+        Other processes can map it with `sharing.SharedAircraftReader(name)`.
+        The block has room for `capacity` aircraft, by default twice as many as there are now (at least 1024).
+        """
+
+        from .sharing import SharedAircraftPublisher
+
+        if self._publisher is not None:
+            raise ValueError(f"Already sharing as {self._publisher.name}")
+        if capacity is None:
+            capacity = max(1024, 2 * len(self.state.aircraft_store))
+
+        publisher = SharedAircraftPublisher(name, capacity)
+        try:
+            publisher.publish(self.state)
+        except ValueError:
+            publisher.close()
+            raise
+        self._publisher = publisher
+
+        return publisher.name
+
+    def unshare(self):
+        """
+        Stop publishing to shared memory, and remove the block.
+        """
+
+        if self._publisher is not None:
+            self._publisher.close()
+            self._publisher = None
+
+    def profile(self, enabled: bool = True):
+        """
+        Start profiling the simulation afresh, or stop if not `enabled`.
+        Profiling times each phase of every step, and the latency of `evolve` and `dynamic_data` calls. See `stats`.
+        """
+
+        from .profiling import Profile
+
+        self.state.profile = Profile() if enabled else None
+
+    def stats(self) -> dict:
+        """
+        Profiling statistics since profiling started, or None if it is off.
+        `phases` gives the calls and time spent in each phase of the steps, and `latencies` histograms of the time taken by each `evolve` and `dynamic_data` call.
+        """
+
+        if self.state.profile is None:
+            return None
+
+        return self.state.profile.stats()
+
     def environment(self, _sector_id: str) -> dict:
         """
         Get the current environment state.
@@ -79,61 +159,177 @@ class Simulator(SimABC):
 
         return {}
 
-    def static_data(self, _sector_id: str) -> dict:
+    def static_data(self, _sector_id: str = None) -> dict:
         """
         Get the static scenario data.
+        It is built on the first call and cached until the scenario name, fixes, sectors or bay names change, so the returned dict must not be modified.
+        Fixes and sectors are compared by identity: call `invalidate_static_data` after changing them in place.
         """
 
-        sectors = {}
-        for name, sector in self.state.sectors.iterrows():
-            boundaries = []
-            for vol in sector.airspace.vols:
-                boundaries.append(vol["boundary"])
-            sectors[name] = boundaries
+        return self._static_data()["data"]
 
-        return {
-            "scenario_name": self.scenario_name,
-            "bay_names": self.state.bay_names,
-            "sectors": sectors,
-            "fixes": [
-                {"id": i, "name": name} | self.state.fixes.loc[name].to_dict()
-                for i, name in enumerate(self.state.fixes.index)
-            ],
-        }
+    def static_data_json(self, _sector_id: str = None) -> bytes:
+        """
+        Get the static scenario data encoded as JSON, cached alongside `static_data`.
+        """
+
+        cache = self._static_data()
+        if cache["json"] is None:
+            cache["json"] = json.dumps(cache["data"]).encode()
+
+        return cache["json"]
+
+    def invalidate_static_data(self):
+        """
+        Drop the cached static data, so the next call to `static_data` rebuilds it.
+        """
+
+        self._static_cache = None
+
+    def _static_data(self) -> dict:
+        """
+        The static data cache, rebuilt if any of its sources have changed.
+        """
+
+        state = self.state
+        cache = self._static_cache
+        if (
+            cache is None
+            or cache["scenario_name"] != self.scenario_name
+            or cache["fixes"] is not state.fixes
+            or cache["sectors"] is not state.sectors
+            or cache["bay_names"] != state.bay_names
+        ):
+            sectors = {
+                name: [vol["boundary"] for vol in airspace.vols]
+                for name, airspace in zip(
+                    state.sectors.index, state.sectors["airspace"]
+                )
+            }
+            fixes = [
+                {"id": i, "name": name} | values
+                for i, (name, values) in enumerate(
+                    zip(state.fixes.index, state.fixes.to_dict("records"))
+                )
+            ]
 
-    def dynamic_data(self, _sector_id: str) -> dict:
+            # Replaced rather than updated, as forks share the cache
+            cache = self._static_cache = {
+                "scenario_name": self.scenario_name,
+                "fixes": state.fixes,
+                "sectors": state.sectors,
+                "bay_names": list(state.bay_names),
+                "data": {
+                    "scenario_name": self.scenario_name,
+                    "bay_names": list(state.bay_names),
+                    "sectors": sectors,
+                    "fixes": fixes,
+                },
+                "json": None,
+            }
+
+        return cache
+
+    def dynamic_data(self, _sector_id: str = None, format: str = "records") -> dict:
         """
         Get the volatile scenario data.
+        With `format="records"` (the default), actions and aircraft are lists of dicts.
+        Conflicts are the pairs of aircraft found breaking the separation minima at the last check.
+        With `format="columns"`, they are dicts of parallel NumPy arrays, one per field, with the current and past positions as (aircraft, 1 + history depth) `lats`/`lons` arrays.
         """
 
-        data = {
-            "time": self.state.time.isoformat(sep=" "),
-            "actions": [
-                {"id": i, "time": f"{time}"} | self.state.actions.loc[time].to_dict()
-                for i, time in enumerate(self.state.actions.index)
-            ],
-            "aircraft": [
-                {"id": i, "callsign": callsign}
-                | self.state.aircraft.loc[callsign].to_dict()
-                for i, callsign in enumerate(self.state.aircraft.index)
-            ],
-        }
+        if format not in ["records", "columns"]:
+            raise ValueError(f"Unknown dynamic data format {format}.")
 
-        for aircraft in data["aircraft"]:
-            aircraft["route"] = ast.literal_eval(aircraft["route"])
+        profile = self.state.profile
+        if profile is None:
+            return self._dynamic_data(format)
 
-            lats = [aircraft["lat"]]
-            lons = [aircraft["lon"]]
-            for n in range(5):
-                lats.append(aircraft[f"lat_{n + 1}"])
-                aircraft.pop(f"lat_{n + 1}")
-                lons.append(aircraft[f"lon_{n + 1}"])
-                aircraft.pop(f"lon_{n + 1}")
-            aircraft["lats"] = lats
-            aircraft["lons"] = lats
+        start = time.perf_counter_ns()
+        data = self._dynamic_data(format)
+        profile.observe("dynamic_data", time.perf_counter_ns() - start)
 
         return data
 
+    def _dynamic_data(self, format: str) -> dict:
+        """
+        Build the dynamic data, see `dynamic_data`.
+        """
+
+        return state_dynamic_data(self.state, format)
+
+    def dynamic_data_since(self, version: int, _sector_id: str = None) -> dict:
+        """
+        Get the volatile scenario data that changed after `version`, the "version" of an earlier call.
+        Aircraft are keyed by callsign and hold only the fields that changed, with `removed` listing callsigns no longer in the simulation.
+        Actions queued since `version` are in `actions_added`, and the ids of actions delivered since are in `actions_consumed`.
+        `conflicts` always holds every pair in conflict at the last check.
+        If changes since `version` can't be tracked, e.g. across a restore or an insertion into the action queue, the full records are returned with `"full": True`.
+        """
+
+        state = self.state
+        store = state.aircraft_store
+        queue = state.action_queue
+
+        if (
+            not state.base_version <= version <= state.version
+            or queue.reordered > version
+        ):
+            return self.dynamic_data(_sector_id) | {"full": True}
+
+        # Which output fields of each aircraft changed, as a (fields, aircraft) mask
+        # The `lats`/`lons` histories change with `lat`/`lon`, and all at once when sampled
+        fields = list(store.fields) + ["lats", "lons"]
+        changed = np.stack(
+            [store.versions[name] > version for name in store.fields]
+            + [store.versions[name] > version for name in ["lat", "lon"]]
+        )
+        if store.history.version > version:
+            changed[-2:] = True
+
+        # Aircraft that changed the same fields are converted together
+        rows = np.flatnonzero(changed.any(axis=0))
+        columns = _aircraft_columns(store, rows)
+        columns["route"] = [list(route) for route in columns["route"]]
+        aircraft = [None] * len(rows)
+        patterns, inverse = np.unique(changed[:, rows].T, axis=0, return_inverse=True)
+        for n, pattern in enumerate(patterns):
+            members = np.flatnonzero(inverse == n)
+            names = ["callsign"] + [name for name, keep in zip(fields, pattern) if keep]
+            records = _records(
+                {
+                    name: (
+                        columns[name][members]
+                        if isinstance(columns[name], np.ndarray)
+                        else [columns[name][member] for member in members]
+                    )
+                    for name in names
+                }
+            )
+            for member, record in zip(members, records):
+                aircraft[member] = record
+
+        added = np.flatnonzero(np.array(queue.added, dtype=np.int64) > version)
+        consumed = np.flatnonzero(np.array(queue.consumed, dtype=np.int64) > version)
+        actions = {
+            name: values[added] for name, values in _action_columns(queue).items()
+        }
+
+        return {
+            "version": state.version,
+            "time": state.time.isoformat(sep=" "),
+            "full": False,
+            "actions_added": _records(actions),
+            "actions_consumed": consumed.tolist(),
+            "aircraft": aircraft,
+            "conflicts": _records(_conflict_columns(state.conflicts)),
+            "removed": [
+                callsign
+                for removed, callsign in state.removals
+                if removed > version and callsign not in store
+            ],
+        }
+
     def action(self, actions: list[dict]) -> bool:
         """
         Add actions to the queue.
@@ -146,5 +342,101 @@ class Simulator(SimABC):
         Move an aircraft to a different bay.
         """
 
-        self.state.aircraft.loc[(callsign, "bay")] = bay_id
+        self.state.update_aircraft(callsign, bay=bay_id)
+        return True
+
+    def update_aircraft_bays(
+        self, _sector_id: str, callsigns: list[str], bay_id: str
+    ) -> bool:
+        """
+        Move many aircraft to the same bay.
+        """
+
+        self.state.update_aircraft_bays(callsigns, bay_id)
         return True
+
+
+def state_dynamic_data(state, format: str = "records") -> dict:
+    """
+    Dynamic data of a `State`, as returned by `Simulator.dynamic_data`.
+    """
+
+    store = state.aircraft_store
+    aircraft = {"id": np.arange(len(store))} | _aircraft_columns(store)
+    actions = _action_columns(state.action_queue)
+    conflicts = _conflict_columns(state.conflicts)
+
+    if format == "records":
+        aircraft["route"] = [list(route) for route in aircraft["route"]]
+        aircraft = _records(aircraft)
+        actions = _records(actions)
+        conflicts = _records(conflicts)
+
+    return {
+        "version": state.version,
+        "time": state.time.isoformat(sep=" "),
+        "actions": actions,
+        "aircraft": aircraft,
+        "conflicts": conflicts,
+    }
+
+
+def _aircraft_columns(store, rows: "np.ndarray" = None) -> dict:
+    """
+    Aircraft fields as parallel arrays, with the current and past positions as (aircraft, 1 + history depth) `lats`/`lons` arrays.
+    Only the given `rows` are taken, or every aircraft if `rows` is None.
+    """
+
+    if rows is None:
+        rows = slice(None)
+
+    columns = {"callsign": np.array(store.callsigns, dtype=object)[rows]}
+    for name in store.fields:
+        columns[name] = store[name][rows].copy()
+    history = store.history.positions()[rows]
+    for n, name in enumerate(["lat", "lon"]):
+        columns[f"{name}s"] = np.concatenate(
+            [columns[name][:, None], history[:, :, n]], axis=1
+        )
+
+    return columns
+
+
+def _action_columns(queue) -> dict:
+    """
+    Queued actions as parallel arrays, in time order.
+    """
+
+    actions = {
+        "id": np.arange(len(queue)),
+        "time": np.array(queue.time_strings(), dtype=object),
+    }
+    for name, values in queue.records.items():
+        actions[name] = np.array(values, dtype=object)
+
+    return actions
+
+
+def _conflict_columns(conflicts: dict) -> dict:
+    """
+    Callsigns of the pairs of aircraft in conflict, as parallel arrays.
+    """
+
+    callsigns = np.array(conflicts["callsigns"], dtype=object)
+    return {
+        "first": callsigns[conflicts["first"]],
+        "second": callsigns[conflicts["second"]],
+    }
+
+
+def _records(columns: dict) -> list[dict]:
+    """
+    Convert a dict of parallel arrays to a list of dicts of Python values.
+    """
+
+    names = list(columns)
+    values = [
+        column.tolist() if isinstance(column, np.ndarray) else column
+        for column in columns.values()
+    ]
+    return [dict(zip(names, row)) for row in zip(*values)]
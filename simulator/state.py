@@ -1,13 +1,21 @@
+import ast
+import copy
 import datetime
+import functools
 import json
 import numpy as np
 import os
 import pandas as pd
 import pathlib
-import pyproj
 
-from . import settings
-from .airspace import Airspace
+from . import kinematics, prediction, scenario_cache, settings, stepping
+from .actions import ActionQueue, parse_actions, to_ns
+from .aircraft import AircraftStore
+from .history import PositionHistory
+from .navigation import RouteFollower
+from .airspace import Airspace, SectorIndex
+from .conflicts import ConflictDetector
+from .profiling import Profile
 
 
 class State:
@@ -15,8 +23,6 @@ class State:
     Complete description world state, at a single instance in time.
     """
 
-    geod = pyproj.Geod(ellps="WGS84")
-
     def __init__(self, time: datetime.datetime):
         """
         Initialise a new simulation.
@@ -42,51 +48,129 @@ class State:
             },
             dtype="str",
         )
-        self.aircraft = pd.DataFrame(  # Flying machines in the simulation
-            {
-                "type": pd.Series(dtype="str"),  # Vortex type of aircraft
-                "agent": pd.Series(dtype="str"),  # Agent controlling the aircraft
-                "bay": pd.Series(dtype="str"),  # Bay to hold the aircraft strip
-                "lat": pd.Series(dtype="float"),  # Degrees North/South
-                "lon": pd.Series(dtype="float"),  # Degrees East/West
-                "lat_1": pd.Series(dtype="float"),  # Historical position 1
-                "lon_1": pd.Series(dtype="float"),  # Historical position 1
-                "lat_2": pd.Series(dtype="float"),  # Historical position 2
-                "lon_2": pd.Series(dtype="float"),  # Historical position 2
-                "lat_3": pd.Series(dtype="float"),  # Historical position 3
-                "lon_3": pd.Series(dtype="float"),  # Historical position 3
-                "lat_4": pd.Series(dtype="float"),  # Historical position 4
-                "lon_4": pd.Series(dtype="float"),  # Historical position 4
-                "lat_5": pd.Series(dtype="float"),  # Historical position 5
-                "lon_5": pd.Series(dtype="float"),  # Historical position 5
-                "flight_level": pd.Series(dtype="float"),  # Flight level
-                "target_flight_level": pd.Series(dtype="float"),  # Target flight level
-                "heading": pd.Series(dtype="float"),  # Degrees clockwise from North
-                "target_heading": pd.Series(
-                    dtype="float"
-                ),  # Degrees clockwise from North
-                "speed": pd.Series(dtype="float"),  # Knots
-                "target_speed": pd.Series(dtype="float"),  # Knots
-                "rise": pd.Series(
-                    dtype="float"
-                ),  # Flight levels per second (absolute value)
-                "max_rise_rate": pd.Series(
-                    dtype="float"
-                ),  # Maximum rate of rise and fall (flight_levels per second)
-                "turn": pd.Series(dtype="float"),  # Degrees clockwise per second
-                "max_turn_rate": pd.Series(
-                    dtype="float"
-                ),  # Maximum rate of turn (degrees per second)
-                "acceleration": pd.Series(dtype="float"),  # Knots
-                "max_acceleration": pd.Series(dtype="float"),  # Knots
-                "route": pd.Series(dtype="object"),  # List of fixes to route through
-            },
-            dtype="str",
-        )
-        self.actions = pd.DataFrame(
-            columns=["time", "agent", "callsign", "kind", "subkind", "value"],
-            index=pd.to_datetime([]),
-        )
+        self.sector_index = SectorIndex([])  # Spatial index over the sector volumes
+        self.aircraft_store = AircraftStore()  # Flying machines in the simulation
+        self._aircraft_view = None  # Lazily materialised DataFrame of the aircraft
+        self.action_queue = ActionQueue()  # Actions to perform, in time order
+        self.history_interval = (
+            settings.HISTORY_INTERVAL
+        )  # Simulated time between samples of the position history
+        self.conflict_detector = ConflictDetector(
+            settings.CONFLICT_LATERAL_NM, settings.CONFLICT_VERTICAL_FL
+        )  # Finds aircraft breaking the separation minima
+        self.conflict_ticks = settings.CONFLICT_CHECK_TICKS  # 0 to never check
+        self.geodesy = settings.GEODESY  # "exact" or "fast" lateral motion
+        self.lnav_ticks = settings.LNAV_TICKS  # 0 to never steer along routes
+        self.stepping = settings.STEPPING  # "fixed" or "adaptive" ticks
+        self.route_follower = None  # Progress along routes, encoded on first use
+        self.conflicts = {  # Pairs of aircraft in conflict at the last check
+            "callsigns": [],  # Callsigns of the aircraft rows when checked
+            "first": np.empty(0, dtype=np.intp),  # Row of each first aircraft
+            "second": np.empty(0, dtype=np.intp),  # Row of each second aircraft
+        }
+        self.hooks = []  # Callables run after every step, e.g. by a `Recorder`
+        self.version = 0  # Incremented on every change to the aircraft or actions
+        self.base_version = 0  # Changes at or before this version are not tracked
+        self.removals = []  # (version, callsign) of each aircraft removed
+        self.profile = Profile() if settings.PROFILE else None  # None when off
+
+    @property
+    def geod(self):
+        """
+        WGS84 ellipsoid used to move aircraft, shared by every state and created on first use.
+        """
+
+        return _wgs84()
+
+    @property
+    def aircraft(self) -> pd.DataFrame:
+        """
+        DataFrame of the aircraft, materialised from the aircraft store on first access.
+        The DataFrame is a read-only copy, so writing to it raises a ValueError: change aircraft with `update_aircraft` and the other `State` methods, or assign a new DataFrame.
+        """
+
+        if self._aircraft_view is None:
+            self._aircraft_view = self.aircraft_store.to_frame(read_only=True)
+
+        return self._aircraft_view
+
+    @aircraft.setter
+    def aircraft(self, aircraft: pd.DataFrame):
+        self.aircraft_store = AircraftStore.from_frame(aircraft)
+        self._aircraft_view = None
+        self._reset_version()
+
+    @property
+    def actions(self) -> pd.DataFrame:
+        """
+        DataFrame of the queued actions indexed by time, materialised from the action queue on first access.
+        """
+
+        return self.action_queue.to_frame()
+
+    @actions.setter
+    def actions(self, actions: pd.DataFrame):
+        self.action_queue = ActionQueue.from_frame(actions)
+        self._reset_version()
+
+    def _reset_version(self):
+        """
+        Start a new version that changes can't be tracked across, e.g. after replacing the aircraft or actions wholesale.
+        """
+
+        self.version += 1
+        self.base_version = self.version
+        self.removals = []
+
+    def snapshot(self) -> dict:
+        """
+        Capture the mutable parts of the state: aircraft, action queue, clock and the conflicts found at the last check.
+        Static data (fixes, sectors and their index) is not copied, as it is shared with any restored state.
+        """
+
+        return {
+            "time": self.time,
+            "tick": self.tick,
+            "extra_time": self.extra_time,
+            "version": self.version,
+            "aircraft_store": self.aircraft_store.copy(),
+            "action_queue": self.action_queue.copy(),
+            "route_follower": _copy_or_none(self.route_follower),
+            "conflicts": dict(self.conflicts),
+        }
+
+    def restore(self, snapshot: dict):
+        """
+        Return to a state captured by `snapshot`. A snapshot can be restored any number of times.
+        The version moves forward past both the current and snapshot versions, so no change is tracked across a restore.
+        """
+
+        self.time = snapshot["time"]
+        self.tick = snapshot["tick"]
+        self.extra_time = snapshot["extra_time"]
+        self.aircraft_store = snapshot["aircraft_store"].copy()
+        self.action_queue = snapshot["action_queue"].copy()
+        self.route_follower = _copy_or_none(snapshot["route_follower"])
+        self.conflicts = dict(snapshot["conflicts"])
+        self._aircraft_view = None
+        self.version = max(self.version, snapshot["version"])
+        self._reset_version()
+
+    def fork(self):
+        """
+        Copy the state, sharing static data by reference and copying only the mutable parts.
+        """
+
+        state = copy.copy(self)
+        state.aircraft_store = self.aircraft_store.copy()
+        state.action_queue = self.action_queue.copy()
+        state.route_follower = _copy_or_none(self.route_follower)
+        state._aircraft_view = None
+        state.conflict_detector = copy.copy(self.conflict_detector)
+        state.hooks = []
+        state.profile = None
+
+        return state
 
     def display(self, **kwargs):
         """
@@ -137,24 +221,50 @@ class State:
         print(buffer)
 
     @staticmethod
-    def load(scenario_dir: str):
+    def load(scenario_dir: str, compiled: bool = True):
         """
         Initialise a simulation from a saved state.
+        If `compiled`, the scenario is read from its binary cache when that is up to date, and the cache is written otherwise.
+        See `scenario_cache` for details.
         """
 
+        if settings.SCHEMA not in ["full", "compact", "compact32"]:
+            raise ValueError(f"Unknown aircraft schema {settings.SCHEMA}")
+
         scenario_dir = pathlib.Path(scenario_dir)
+        state = None
+
+        if compiled:
+            cached = scenario_cache.read(scenario_dir)
+            if cached is not None:
+                state = State(cached["start_time"])
+                state._set_fixes(cached["fixes"])
+                state._set_sectors(cached["sectors"], cached["sector_index"])
+                state.aircraft_store = cached["aircraft_store"]
+                state.action_queue = cached["action_queue"]
+                state._reset_version()
+
+        if state is None:
+            with open(os.path.join(scenario_dir, "meta.json")) as file:
+                meta = json.load(file)
+                start_time = datetime.datetime.strptime(
+                    meta["start_time"], settings.TIME_FORMAT
+                )
+            state = State(start_time)
 
-        with open(os.path.join(scenario_dir, "meta.json")) as file:
-            meta = json.load(file)
-            start_time = datetime.datetime.strptime(
-                meta["start_time"], settings.TIME_FORMAT
-            )
-        state = State(start_time)
+            state._load_fixes(os.path.join(scenario_dir, "fixes.csv"))
+            state._load_sectors(os.path.join(scenario_dir, "sectors.json"))
+            state._load_aircraft(os.path.join(scenario_dir, "aircraft.csv"))
+            state._load_actions(os.path.join(scenario_dir, "actions.csv"))
 
-        state._load_fixes(os.path.join(scenario_dir, "fixes.csv"))
-        state._load_sectors(os.path.join(scenario_dir, "sectors.json"))
-        state._load_aircraft(os.path.join(scenario_dir, "aircraft.csv"))
-        state._load_actions(os.path.join(scenario_dir, "actions.csv"))
+            if compiled:
+                try:
+                    scenario_cache.write(state, scenario_dir)
+                except OSError:
+                    pass  # e.g. the scenario directory is read-only
+
+        if settings.SCHEMA != "full":
+            state.compact(float32=settings.SCHEMA == "compact32")
 
         return state
 
@@ -175,6 +285,13 @@ class State:
                     f"Column headings for fixes dataframe differ to those expected"
                 )
 
+        self._set_fixes(fixes)
+
+    def _set_fixes(self, fixes: pd.DataFrame):
+        """
+        Replace the fixes, and the bays named after them.
+        """
+
         self.fixes = fixes
         self.bay_names = ["INCOMM"] + fixes.index.tolist() + ["OFFCOMM"]
 
@@ -184,14 +301,32 @@ class State:
         Note this will replace the current sector state.
         """
 
-        # Clear the current sectors
-        self.sectors = pd.DataFrame(columns=self.sectors.columns)
         with open(file_path) as file:
-            for name, data in json.load(file).items():
-                self.sectors.loc[name] = [
-                    data["agent"],
-                    Airspace(data["vols"]),
-                ]
+            self._set_sectors(json.load(file))
+
+    def _set_sectors(self, sectors: dict, index_arrays: dict = None):
+        """
+        Replace the sectors with those in a dict of sector names to their `agent` and `vols`, as held in sectors.json.
+        The sector index is rebuilt from `index_arrays` (see `SectorIndex.to_arrays`) if given, and compiled afresh otherwise.
+        """
+
+        self.sectors = pd.DataFrame(
+            {
+                "agent": [data["agent"] for data in sectors.values()],
+                "airspace": [
+                    Airspace(data["vols"], self.fixes) for data in sectors.values()
+                ],
+            },
+            index=pd.Index(list(sectors), dtype="object"),
+            columns=self.sectors.columns,
+            dtype="object",
+        )
+
+        airspaces = self.sectors["airspace"].tolist()
+        if index_arrays is None:
+            self.sector_index = SectorIndex(airspaces)
+        else:
+            self.sector_index = SectorIndex.from_arrays(airspaces, index_arrays)
 
     def _load_aircraft(self, file_path: str):
         """
@@ -202,26 +337,10 @@ class State:
         with open(file_path) as file:
             aircraft = pd.read_csv(file, index_col=0, skipinitialspace=True)
 
-            start_lats = aircraft["lat"].tolist()
-            start_lons = aircraft["lon"].tolist()
-
-            start_index = 5
-            for n in range(5):
-                aircraft.insert(
-                    start_index + (2 * n), f"lat_{n + 1}", start_lats, False
-                )
-                aircraft.insert(
-                    start_index + (2 * n) + 1, f"lon_{n + 1}", start_lons, False
-                )
-
-            # Check column headings match
-            if set(self.aircraft.columns) != set(aircraft.columns):
-                print(f"Expected headings: {self.aircraft.columns}")
-                print(f"Given headings: {aircraft.columns}")
-                raise ValueError(
-                    f"Column headings for aircraft dataframe differ to those expected"
-                )
+            # Parse routes once, rather than every time they are read
+            aircraft["route"] = aircraft["route"].map(ast.literal_eval)
 
+        # Column headings are checked when the aircraft store is built
         self.aircraft = aircraft
 
     def _load_actions(self, file_path: str):
@@ -234,8 +353,8 @@ class State:
             actions = pd.read_csv(file, skipinitialspace=True)
 
         # Check column headings match
-        if set(self.actions.columns) != set(actions.columns):
-            print(f"Expected headings: {self.actions.columns}")
+        if set(ActionQueue.columns) != set(actions.columns):
+            print(f"Expected headings: {ActionQueue.columns}")
             print(f"Given headings: {actions.columns}")
             raise ValueError(
                 f"Column headings for actions dataframe differ to those expected"
@@ -263,104 +382,351 @@ class State:
         max_turn_rate: float,
         acceleration: float,
         max_acceleration: float,
+        type: str = "medium",
+        bay: str = "INCOMM",
+        route: list = None,
     ):
         """
         Add an aircraft to the simulation.
         """
 
-        if callsign in self.aircraft.index:
-            raise ValueError(f"Aircraft {callsign} already exists")
-
-        self.aircraft.loc[callsign] = [
-            agent,
-            lat,
-            lon,
-            flight_level,
-            target_flight_level,
-            heading,
-            target_heading,
-            speed,
-            target_speed,
-            rise,
-            max_rise_rate,
-            turn,
-            max_turn_rate,
-            acceleration,
-            max_acceleration,
-        ]
+        values = {
+            "type": type,
+            "agent": agent,
+            "bay": bay,
+            "lat": lat,
+            "lon": lon,
+            "flight_level": flight_level,
+            "target_flight_level": target_flight_level,
+            "heading": heading,
+            "target_heading": target_heading,
+            "speed": speed,
+            "target_speed": target_speed,
+            "rise": rise,
+            "max_rise_rate": max_rise_rate,
+            "turn": turn,
+            "max_turn_rate": max_turn_rate,
+            "acceleration": acceleration,
+            "max_acceleration": max_acceleration,
+            "route": list(route or []),
+        }
+        self.version += 1
+        self.aircraft_store.append(callsign, values, self.version)
+        self._aircraft_view = None
 
     def remove_aircraft(self, callsign: str):
         """
         Remove an aircraft from the simulation.
         """
 
-        if callsign not in self.aircraft.index:
+        self.aircraft_store.remove(callsign)
+        self._aircraft_view = None
+        self.version += 1
+        # Replaced rather than appended to, as forks share the list
+        self.removals = self.removals + [(self.version, callsign)]
+
+    def detach_aircraft(self, callsigns: list) -> dict:
+        """
+        Remove many aircraft in one go, returning them with their history and progress along their routes for `attach_aircraft`.
+        Changes are not tracked across detaching aircraft.
+        """
+
+        store = self.aircraft_store
+        missing = [callsign for callsign in callsigns if callsign not in store]
+        if missing:
+            raise ValueError(f"Aircraft {missing} do not exist")
+
+        rows = np.array(
+            [store.index[callsign] for callsign in callsigns], dtype=np.intp
+        )
+        detached = {"aircraft": store.take(rows), "route_progress": None}
+        if self.lnav_ticks:
+            detached["route_progress"] = self._route_follower().progress(rows)
+
+        keep = np.ones(len(store), dtype=bool)
+        keep[rows] = False
+        self.aircraft_store = store.take(np.flatnonzero(keep))
+        self._aircraft_view = None
+        self._reset_version()
+
+        return detached
+
+    def attach_aircraft(self, detached: dict):
+        """
+        Add aircraft returned by `detach_aircraft` on another state that has been evolved to the same tick.
+        """
+
+        store = AircraftStore.concatenate([self.aircraft_store, detached["aircraft"]])
+        rows = np.arange(len(self.aircraft_store), len(store))
+        self.aircraft_store = store
+        self._aircraft_view = None
+        self._reset_version()
+
+        if self.lnav_ticks and detached["route_progress"] is not None:
+            self._route_follower().set_progress(rows, detached["route_progress"])
+
+    def update_aircraft_bays(self, callsigns: list, bay: str):
+        """
+        Move many aircraft to the same bay in one go.
+        """
+
+        missing = [
+            callsign for callsign in callsigns if callsign not in self.aircraft_store
+        ]
+        if missing:
+            raise ValueError(f"Aircraft {missing} do not exist")
+
+        self.version += 1
+        self.aircraft_store.set_many(callsigns, "bay", bay, self.version)
+        self._aircraft_view = None
+
+    def update_aircraft(self, callsign: str, **values):
+        """
+        Set fields of a single aircraft, e.g. `state.update_aircraft("BAW123", bay="OUTCOMM")`.
+        """
+
+        if callsign not in self.aircraft_store:
             raise ValueError(f"Aircraft {callsign} does not exist")
 
-        self.aircraft.drop(callsign, inplace=True)
+        self.version += 1
+        for name, value in values.items():
+            self.aircraft_store.set(callsign, name, value, self.version)
+        self._aircraft_view = None
 
-    def queue_actions(self, actions: list[dict]):
+    def compact(self, float32: bool = False):
         """
-        Add a list of actions to the the queue.
+        Switch to the compact schema to save memory (see `AircraftStore.compacted`).
+        Aircraft strings and routes are held as codes, with bays coded in `bay_names` order, sector agents become categoricals, and equal action strings are shared.
+        If `float32`, aircraft fields other than the position are held in float32.
         """
 
-        for action in actions:
-            # Remove time from action and convert to datetime for indexing
-            time = datetime.datetime.strptime(action.pop("time"), settings.TIME_FORMAT)
+        self.aircraft_store = self.aircraft_store.compacted(self.bay_names, float32)
+        self._aircraft_view = None
+        self.sectors = self.sectors.astype({"agent": "category"})
+        self.action_queue.compact()
+        self._reset_version()
 
-            # Convert values to correct types
-            if action["kind"] in ["flight_level", "heading", "speed"]:
-                if action["subkind"] == "absolute":
-                    action["value"] = float(action["value"])
+    def memory_usage(self) -> dict:
+        """
+        Bytes held by each table of the state: the aircraft fields, their versions and position history, the fixes, sectors and actions.
+        Objects are followed, but sector airspace geometry is only counted by its Python objects.
+        """
 
-            # Add action to queue
-            self.actions = pd.concat([self.actions, pd.DataFrame(action, index=[time])])
+        return self.aircraft_store.memory_usage() | {
+            "fixes": int(self.fixes.memory_usage(deep=True).sum()),
+            "sectors": int(self.sectors.memory_usage(deep=True).sum()),
+            "actions": self.action_queue.memory_usage(),
+        }
+
+    def configure_history(self, depth: int = None, interval: datetime.timedelta = None):
+        """
+        Change the number of past positions kept for each aircraft, and the simulated time between them.
+        Changing the depth restarts the history from the current positions.
+        """
+
+        if interval is not None:
+            if interval <= datetime.timedelta(0):
+                raise ValueError(f"History interval must be positive")
+            self.history_interval = interval
+
+        store = self.aircraft_store
+        if depth is not None and depth != store.history.depth:
+            store.history = PositionHistory.filled(
+                depth, store.data["lat"], store.data["lon"]
+            )
+            self.version += 1
+            store.history.version = self.version
+
+    def detect_conflicts(self):
+        """
+        Find the pairs of aircraft breaking the separation minima, and keep them in `conflicts`.
+        Run by `evolve` every `conflict_ticks` ticks.
+        """
+
+        store = self.aircraft_store
+        first, second = self.conflict_detector.detect(
+            store["lat"], store["lon"], store["flight_level"], store.callsigns
+        )
+        self.conflicts = {
+            "callsigns": store.callsigns,
+            "first": first,
+            "second": second,
+        }
+
+    def predict(
+        self,
+        horizon: datetime.timedelta,
+        step: datetime.timedelta,
+        resolution: datetime.timedelta = None,
+    ) -> np.ndarray:
+        """
+        Predict the position of every aircraft at each `step` up to `horizon` ahead, following their targets and the queued actions.
+        Returns an (aircraft, steps, 3) array of lat, lon and flight level, in aircraft store order. See `prediction.predict`.
+        """
+
+        return prediction.predict(self, horizon, step, resolution)
+
+    def locate_aircraft(self):
+        """
+        Find the sector and volume containing each aircraft, in aircraft store order.
+        Returns two integer arrays indexing `sectors` rows and their volumes, with -1 outside every sector.
+        """
+
+        data = self.aircraft_store.data
+        return self.sector_index.locate(data["lat"], data["lon"], data["flight_level"])
+
+    def follow_routes(self):
+        """
+        Steer every aircraft following its route towards its active fix, moving on from fixes it has reached.
+        Run by `evolve` every `lnav_ticks` ticks. See `navigation.RouteFollower`.
+        """
+
+        self._route_follower().steer(self.aircraft_store.data, self.geod, self.geodesy)
+
+    def _route_follower(self) -> RouteFollower:
+        """
+        Route follower matching the current aircraft, encoding their routes against the fixes if they have changed.
+        """
+
+        store = self.aircraft_store
+        if self.route_follower is None:
+            self.route_follower = RouteFollower(store, self.fixes)
+        elif not self.route_follower.matches(store):
+            self.route_follower = self.route_follower.reencoded(store, self.fixes)
+
+        return self.route_follower
+
+    def queue_actions(self, actions: list[dict]):
+        """
+        Add a list of actions to the the queue.
+        """
+
+        self.version += 1
+        self.action_queue.extend(*parse_actions(actions), self.version)
 
     def evolve(self, evolve_delta: datetime.timedelta):
         """
         Evolve the simulation by a given time delta.
+        All steps are run directly on the aircraft store, without touching pandas.
+        Fields that end up with different values are stamped with the new version.
+        After every step, each of `hooks` is called with the state and the range of `action_queue` indices delivered in the step.
+        With `lnav_ticks`, aircraft are steered along their routes at the start of every `lnav_ticks`th step.
+        With `stepping` "adaptive", stretches of ticks in which only the kinematics run are advanced in one go (see `stepping`), with the same `time`, `tick` and `extra_time` as fixed stepping.
+        With a `profile`, the time spent in each phase of the step is added to it.
         """
 
         if evolve_delta < datetime.timedelta(seconds=0):
             raise ValueError(f"Evolve delta must be positive")
+        if self.stepping not in stepping.STEPPING_MODES:
+            raise ValueError(
+                f"Stepping must be one of {stepping.STEPPING_MODES}. Received: {self.stepping}."
+            )
 
-        evolve_delta -= self.extra_time
-        num_steps = int(evolve_delta / settings.TIME_STEP_DELTA)
-        if (num_steps * settings.TIME_STEP_DELTA) < evolve_delta:
-            num_steps += 1
-        self.extra_time = (num_steps * settings.TIME_STEP_DELTA) - evolve_delta
-
-        for _ in range(num_steps):
-            self._process_action_queue(settings.TIME_STEP_DELTA)
-            self._rotate_aircraft(settings.TIME_STEP_DELTA)
-            self._accelerate_aircraft(settings.TIME_STEP_DELTA)
-            self._move_aircraft_laterally(settings.TIME_STEP_DELTA)
-            self._move_aircraft_vertically(settings.TIME_STEP_DELTA)
+        num_steps, self.extra_time = split_steps(evolve_delta, self.extra_time)
+
+        self._aircraft_view = None
+
+        self.version += 1
+        data = self.aircraft_store.data
+        before = {
+            name: values.copy()
+            for name, values in data.items()
+            if values.dtype != object
+        }
+
+        history = self.aircraft_store.history
+        history_ticks = max(1, round(self.history_interval / settings.TIME_STEP_DELTA))
+
+        # Phases of a step, wrapped to be timed when profiling
+        process_action_queue = self._process_action_queue
+        follow_routes = self.follow_routes
+        advance_aircraft = stepping.advance
+        rotate_aircraft = self._rotate_aircraft
+        accelerate_aircraft = self._accelerate_aircraft
+        move_aircraft_laterally = self._move_aircraft_laterally
+        move_aircraft_vertically = self._move_aircraft_vertically
+        record_history = history.record
+        detect_conflicts = self.detect_conflicts
+        run_hooks = self._run_hooks
+        if self.profile is not None:
+            wrap = self.profile.wrap
+            process_action_queue = wrap("process_action_queue", process_action_queue)
+            if self.lnav_ticks:
+                follow_routes = wrap("follow_routes", follow_routes)
+            if self.stepping == "adaptive":
+                advance_aircraft = wrap("advance_aircraft", advance_aircraft)
+            rotate_aircraft = wrap("rotate_aircraft", rotate_aircraft)
+            accelerate_aircraft = wrap("accelerate_aircraft", accelerate_aircraft)
+            move_aircraft_laterally = wrap(
+                "move_aircraft_laterally", move_aircraft_laterally
+            )
+            move_aircraft_vertically = wrap(
+                "move_aircraft_vertically", move_aircraft_vertically
+            )
+            record_history = wrap("record_history", record_history)
+            detect_conflicts = wrap("detect_conflicts", detect_conflicts)
+            run_hooks = wrap("hooks", run_hooks)
+
+        steps_left = num_steps
+        while steps_left:
+            if self.stepping == "adaptive":
+                quiet = stepping.quiet_ticks(self, steps_left)
+                if quiet > 1:
+                    advance_aircraft(self, quiet, history_ticks, record_history)
+                    steps_left -= quiet
+                    if self.conflict_ticks and self.tick % self.conflict_ticks == 0:
+                        detect_conflicts()
+                    continue
+
+            delivered = process_action_queue(settings.TIME_STEP_DELTA)
+            if self.lnav_ticks and self.tick % self.lnav_ticks == 0:
+                follow_routes()
+            rotate_aircraft(settings.TIME_STEP_DELTA)
+            accelerate_aircraft(settings.TIME_STEP_DELTA)
+            move_aircraft_laterally(settings.TIME_STEP_DELTA)
+            move_aircraft_vertically(settings.TIME_STEP_DELTA)
             self.time += settings.TIME_STEP_DELTA
             self.tick += 1
+            if self.tick % history_ticks == 0:
+                record_history(data["lat"], data["lon"], self.version)
+            if self.conflict_ticks and self.tick % self.conflict_ticks == 0:
+                detect_conflicts()
+            if self.hooks:
+                run_hooks(delivered)
+            steps_left -= 1
 
-        self.aircraft["lat_1"] = self.aircraft["lat"]
-        self.aircraft["lon_1"] = self.aircraft["lon"]
-        for n in reversed(range(4)):
-            self.aircraft[f"lat_{n + 2}"] = self.aircraft[f"lat_{n + 1}"]
-            self.aircraft[f"lon_{n + 2}"] = self.aircraft[f"lon_{n + 1}"]
+        versions = self.aircraft_store.versions
+        for name, values in before.items():
+            versions[name][data[name] != values] = self.version
 
-    def _process_action_queue(self, time_delta: datetime.timedelta):
+    def _run_hooks(self, delivered: range):
         """
-        Find the actions in the queue that are due to be processed.
+        Call each of `hooks` after a step.
         """
 
-        actions = self.actions.loc[
-            (self.actions.index >= self.time)
-            & (self.actions.index < (self.time + settings.TIME_STEP_DELTA))
-        ]
+        for hook in self.hooks:
+            hook(self, delivered)
 
-        for _, action in actions.iterrows():
-            self._handle_action(action)
+    def _process_action_queue(self, time_delta: datetime.timedelta) -> range:
+        """
+        Find the actions in the queue that are due to be processed, and process them.
+        Returns the range of their indices in the queue.
+        """
+
+        start = to_ns(self.time)
+        end = to_ns(self.time + time_delta)
+        due = self.action_queue.due(start, end)
+        for n in due:
+            self.action_queue.consume(n, self.version)
+            self._handle_action(self.action_queue.record(n))
+
+        return due
 
     def _handle_action(self, action: dict):
         """
         Perform the given action.
+        Actions for aircraft that are not in the simulation are ignored.
+        Heading actions take aircraft off their routes when steering along routes.
         """
 
         kind = action["kind"]
@@ -373,17 +739,25 @@ class State:
             "speed",
             "heading",
         ]:
+            if callsign not in self.aircraft_store:
+                return
+            if kind == "heading" and self.lnav_ticks:
+                self._route_follower().disengage(self.aircraft_store.index[callsign])
             if subkind == "absolute":
                 new_target = float(value)
-                self.aircraft.loc[(callsign, f"target_{kind}")] = new_target
+                self.aircraft_store.set(
+                    callsign, f"target_{kind}", new_target, self.version
+                )
                 return
             elif subkind == "relative":
-                new_target = self.aircraft.loc[(callsign, f"target_{kind}")] + float(
-                    value
-                )
+                new_target = self.aircraft_store.get(
+                    callsign, f"target_{kind}"
+                ) + float(value)
                 if kind == "bearing" and new_target < 0.0:
                     new_target += 360.0
-                self.aircraft.loc[(callsign, f"target_{kind}")] = new_target
+                self.aircraft_store.set(
+                    callsign, f"target_{kind}", new_target, self.version
+                )
                 return
 
         if kind == "select_aircraft":
@@ -398,80 +772,68 @@ class State:
         Evolve the speed of the aircraft.
         """
 
-        dt = time_delta.total_seconds()
-
-        def accelerate_aircraft_helper(aircraft):
-            aircraft["acceleration"] = (
-                calc_sign(aircraft["speed"], aircraft["target_speed"], 10.0)
-                * aircraft["max_acceleration"]
-            )
-            return pd.Series(aircraft)
-
-        self.aircraft = self.aircraft.apply(accelerate_aircraft_helper, axis=1)
-
-        self.aircraft["speed"] += (
-            self.aircraft["acceleration"] * time_delta.total_seconds()
-        )
+        kinematics.accelerate(self.aircraft_store.data, time_delta.total_seconds())
 
     def _move_aircraft_laterally(self, time_delta: datetime.timedelta):
         """
         Evolve the lateral (lat, lon) position of the aircraft.
         """
 
-        dt = time_delta.total_seconds()
-        distances = self.aircraft["speed"] * (1852.0 / 3600.0) * dt
-        proj_lon, proj_lat, _ = self.geod.fwd(
-            self.aircraft["lon"],
-            self.aircraft["lat"],
-            self.aircraft["heading"],
-            distances,
+        kinematics.move_laterally(
+            self.aircraft_store.data,
+            time_delta.total_seconds(),
+            self.geod,
+            self.geodesy,
         )
 
-        self.aircraft["lat"] = proj_lat
-        self.aircraft["lon"] = proj_lon
-
     def _move_aircraft_vertically(self, time_delta: datetime.timedelta):
         """
         Evolve the altitude (flight_level) of the aircraft forward in time.
         """
 
-        def move_aircraft_vertically_helper(aircraft):
-            aircraft["rise"] = (
-                calc_sign(
-                    aircraft["flight_level"], aircraft["target_flight_level"], 10.0
-                )
-                * aircraft["max_rise_rate"]
-            )
-            return pd.Series(aircraft)
-
-        self.aircraft = self.aircraft.apply(move_aircraft_vertically_helper, axis=1)
-
-        dt = time_delta.total_seconds()
-        self.aircraft["flight_level"] += self.aircraft["rise"] * dt
+        kinematics.move_vertically(self.aircraft_store.data, time_delta.total_seconds())
 
     def _rotate_aircraft(self, time_delta: datetime.timedelta):
         """
         Evolve the turn (heading) of the aircraft forward in time.
+        Turns take the shorter way round when steering along routes.
         """
 
-        def rotate_aircraft_helper(aircraft):
-            delta = aircraft["target_heading"] - aircraft["heading"]
-            if delta < -180.0:
-                delta += 360.0
-            aircraft["turn"] = calc_sign(0, delta, 5.0) * aircraft["max_turn_rate"]
-            return pd.Series(aircraft)
+        kinematics.rotate(
+            self.aircraft_store.data,
+            time_delta.total_seconds(),
+            shortest_turn=self.lnav_ticks > 0,
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _wgs84():
+    """
+    The WGS84 ellipsoid, importing pyproj on first use.
+    """
+
+    import pyproj
+
+    return pyproj.Geod(ellps="WGS84")
 
-        self.aircraft = self.aircraft.apply(rotate_aircraft_helper, axis=1)
 
-        dt = time_delta.total_seconds()
-        self.aircraft["heading"] += self.aircraft["turn"] * dt
-        self.aircraft["heading"] %= 360.0
+def _copy_or_none(value):
+    """
+    Copy of `value`, or None if it is None.
+    """
+
+    return None if value is None else value.copy()
 
 
-def calc_sign(x, target_x, length_scale):
-    n = (target_x - x) / length_scale
-    return clamp(n, -1.0, 1.0)
+def split_steps(evolve_delta: datetime.timedelta, extra_time: datetime.timedelta):
+    """
+    Number of whole settings.TIME_STEP_DELTA steps needed to cover `evolve_delta`, less time already stepped past.
+    Returns the number of steps and the new extra time stepped past the requested delta.
+    """
 
+    evolve_delta -= extra_time
+    num_steps = int(evolve_delta / settings.TIME_STEP_DELTA)
+    if (num_steps * settings.TIME_STEP_DELTA) < evolve_delta:
+        num_steps += 1
 
-def clamp(num, min_value, max_value):
-    return max(min(num, max_value), min_value)
+    return num_steps, (num_steps * settings.TIME_STEP_DELTA) - evolve_delta
@@ -0,0 +1,101 @@
+def test_airspace_contains_loaded_volumes():
+    from simulator.airspace import Airspace
+
+    airspace = Airspace(
+        [
+            {
+                "boundary": [[51.5, 0.48], [51.41, 0.48], [51.41, 0.42], [51.5, 0.42]],
+                "min": 100,
+                "max": 150,
+            }
+        ]
+    )
+
+    assert airspace.contains(51.45, 0.45, 120.0)
+    assert airspace.contains(51.5, 0.48, 150.0)  # On the boundary
+    assert not airspace.contains(51.45, 0.45, 151.0)
+    assert not airspace.contains(51.55, 0.45, 120.0)
+
+
+def test_sector_index_matches_shapely():
+    import numpy as np
+    import shapely.geometry
+    from simulator.airspace import Airspace, SectorIndex
+
+    rng = np.random.default_rng(0)
+    airspaces = []
+    for _ in range(20):
+        lon, lat = rng.uniform(-1.0, 1.0, 2)
+        angles = np.sort(rng.uniform(0.0, 2.0 * np.pi, 5))
+        boundary = [[lat + 0.3 * np.sin(a), lon + 0.3 * np.cos(a)] for a in angles]
+        airspaces.append(Airspace([{"boundary": boundary, "min": 100, "max": 300}]))
+    index = SectorIndex(airspaces)
+
+    lats = rng.uniform(-1.5, 1.5, 500)
+    lons = rng.uniform(-1.5, 1.5, 500)
+    flight_levels = rng.uniform(0.0, 400.0, 500)
+    sectors, vols = index.locate(lats, lons, flight_levels)
+
+    for lat, lon, flight_level, sector in zip(lats, lons, flight_levels, sectors):
+        expected = -1
+        for n, airspace in enumerate(airspaces):
+            if 100 <= flight_level <= 300 and airspace.areas[0].covers(
+                shapely.geometry.Point(lon, lat)
+            ):
+                expected = n
+                break
+        assert sector == expected
+    assert np.all(vols[sectors >= 0] == 0)
+
+
+def test_sector_index_handles_holes_and_dense_points(monkeypatch):
+    import numpy as np
+    import shapely.geometry
+    from simulator import airspace
+    from simulator.airspace import Airspace, SectorIndex
+
+    rng = np.random.default_rng(1)
+    angles = np.linspace(0.0, 2.0 * np.pi, 200, endpoint=False)
+    ring = Airspace(
+        [
+            {
+                "boundary": [[51.5, 0.0], [51.5, 1.0], [52.5, 1.0], [52.5, 0.0]],
+                "holes": [[[51.8, 0.3], [52.2, 0.3], [52.2, 0.7], [51.8, 0.7]]],
+                "min": 0,
+                "max": 500,
+            }
+        ]
+    )
+    large = Airspace(  # Far larger than the spread of the points
+        [
+            {
+                "boundary": [
+                    [52.0 + 30.0 * np.sin(a), 60.0 * np.cos(a)] for a in angles
+                ],
+                "min": 0,
+                "max": 500,
+            }
+        ]
+    )
+    index = SectorIndex([ring, large])
+
+    assert ring.contains(52.0, 0.1, 100.0)
+    assert not ring.contains(52.0, 0.5, 100.0)  # In the hole
+    assert ring.contains(52.0, 0.3, 100.0)  # On the edge of the hole
+
+    lats = rng.normal(52.0, 0.4, 20000)
+    lons = rng.normal(0.5, 0.4, 20000)
+    flight_levels = np.full(20000, 100.0)
+    sectors, _ = index.locate(lats, lons, flight_levels)
+
+    # Small batches give the same answer
+    monkeypatch.setattr(airspace, "MAX_PAIRS", 1000)
+    monkeypatch.setattr(airspace, "MAX_EDGE_TESTS", 5000)
+    assert np.array_equal(index.locate(lats, lons, flight_levels)[0], sectors)
+
+    for lat, lon, sector in zip(lats[:2000], lons[:2000], sectors[:2000]):
+        point = shapely.geometry.Point(lon, lat)
+        if ring.areas[0].covers(point):
+            assert sector == 0
+        else:
+            assert sector == (1 if large.areas[0].covers(point) else -1)
@@ -0,0 +1,64 @@
+def test_batch_results_are_deterministic():
+    import numpy as np
+    from simulator.batch import run_batch
+
+    action = {
+        "time": "2019-01-01 00:00:02",
+        "agent": "human",
+        "callsign": "BAW123",
+        "kind": "heading",
+        "subkind": "absolute",
+        "value": "90.0",
+    }
+    jobs = [
+        ("Basic", "Mission1", [action], 10.0),
+        ("Basic", "Mission2", [], 10.0),
+        ("Basic", "Mission1", [], 5.0),
+    ]
+
+    first = {result["index"]: result for result in run_batch(jobs, max_workers=2)}
+    second = {result["index"]: result for result in run_batch(jobs, max_workers=1)}
+
+    assert sorted(first) == [0, 1, 2]
+    for index, result in first.items():
+        assert result["seed"] == second[index]["seed"]
+        for name, values in result["aircraft"].items():
+            assert np.array_equal(values, second[index]["aircraft"][name])
+    assert first[0]["aircraft"]["heading"][0] > 0.0
+    assert first[2]["tick"] == 40
+
+
+def random_heading(rng) -> list:
+    return [
+        {
+            "time": "2019-01-01 00:00:02",
+            "agent": "human",
+            "callsign": "BAW123",
+            "kind": "heading",
+            "subkind": "absolute",
+            "value": str(rng.uniform(0.0, 360.0)),
+        }
+    ]
+
+
+def test_batch_seeds_callable_actions():
+    import numpy as np
+    from simulator.batch import run_batch
+
+    jobs = [("Basic", "Mission1", random_heading, 400.0)] * 3
+
+    def headings(seed, max_workers):
+        results = run_batch(jobs, max_workers=max_workers, seed=seed)
+        return {
+            result["index"]: result["aircraft"]["heading"].copy() for result in results
+        }
+
+    first = headings(1, 2)
+    again = headings(1, 1)
+    other = headings(2, 2)
+
+    for index in range(3):
+        assert np.array_equal(first[index], again[index])
+        assert not np.array_equal(first[index], other[index])
+    assert not np.array_equal(first[0], first[1])
+    assert not np.array_equal(first[1], first[2])
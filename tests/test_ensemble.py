@@ -0,0 +1,42 @@
+def test_unperturbed_members_match_state():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.ensemble import Ensemble
+    from simulator.state import State
+
+    ensemble = Ensemble.load("Basic", "Mission1", 3)
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+
+    ensemble.evolve(datetime.timedelta(seconds=20.0))
+    state.evolve(datetime.timedelta(seconds=20.0))
+
+    positions = ensemble.positions()
+    assert positions.shape == (3, len(state.aircraft_store), 3)
+    for member in positions:
+        assert np.array_equal(member[:, 0], state.aircraft_store["lat"])
+        assert np.array_equal(member[:, 1], state.aircraft_store["lon"])
+        assert np.array_equal(member[:, 2], state.aircraft_store["flight_level"])
+
+
+def test_perturbed_members_differ_and_are_reproducible():
+    import datetime
+    import numpy as np
+    from simulator.ensemble import Ensemble
+
+    perturbations = {"heading": 2.0, "speed": 5.0, "max_turn_rate": 1.0}
+    first, again, other = (
+        Ensemble.load("Basic", "Mission1", 4, perturbations=perturbations, seed=seed)
+        for seed in [7, 7, 8]
+    )
+    for ensemble in [first, again, other]:
+        ensemble.evolve(datetime.timedelta(seconds=20.0))
+
+    positions = first.positions()
+    assert np.array_equal(positions, again.positions())
+    assert not np.array_equal(positions, other.positions())
+    for n in range(1, len(positions)):
+        assert not np.allclose(positions[0, :, :2], positions[n, :, :2])
+    assert (first.data["max_turn_rate"] >= 0.0).all()
+    assert (first.data["max_turn_rate"] == 0.0).any()
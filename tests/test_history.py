@@ -0,0 +1,35 @@
+def test_history_is_newest_first():
+    import numpy as np
+    from simulator.history import PositionHistory
+
+    history = PositionHistory.filled(3, np.array([0.0, 10.0]), np.array([0.0, 20.0]))
+    for n in range(1, 5):
+        history.record(np.array([n, n + 10.0]), np.array([-n, n + 20.0]))
+
+    positions = history.positions()
+    assert positions.shape == (2, 3, 2)
+    assert positions[0, :, 0].tolist() == [4.0, 3.0, 2.0]
+    assert positions[1, :, 1].tolist() == [24.0, 23.0, 22.0]
+    assert np.shares_memory(positions, history.buffer)
+
+    history.remove(0)
+    assert history.positions()[:, :, 0].tolist() == [[14.0, 13.0, 12.0]]
+
+
+def test_state_samples_history_at_interval():
+    import datetime
+    import os
+    from simulator import settings
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    state.configure_history(depth=8, interval=datetime.timedelta(seconds=0.5))
+    lats = []
+    for _ in range(4):
+        state.evolve(datetime.timedelta(seconds=0.5))
+        lats.append(state.aircraft_store["lat"].copy())
+
+    history = state.aircraft_store.history.positions()
+    assert history.shape == (len(state.aircraft_store), 8, 2)
+    for n, lat in enumerate(reversed(lats)):
+        assert (history[:, n, 0] == lat).all()
@@ -12,3 +12,46 @@ def test_simulator_is_runnable():
     print(sim.dynamic_data())
     sim.evolve(60.0)
     print(sim.dynamic_data())
+
+
+def test_listing_scenarios_is_fast():
+    import os
+    import subprocess
+    import sys
+
+    # Time imports in a fresh interpreter with -X importtime, which gives the time spent in each module's own code.
+    # That leaves out interpreter start-up and, as `interface` is imported eagerly as the base class, everything it imports.
+    script = """
+import sys
+
+import interface
+
+sys.stderr.write("listing\\n")
+from simulator import Simulator
+
+scenario_category = Simulator.list_scenario_categories()[0]
+scenario_name = Simulator.list_scenarios(scenario_category)[0]
+Simulator.scenario_info(scenario_category, scenario_name)
+"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+        env=os.environ,
+        check=True,
+    )
+    lines = result.stderr.split("listing\n", 1)[1].splitlines()
+    self_times = {}  # Microseconds spent in each module imported for listing
+    for line in lines:
+        if line.startswith("import time:") and "|" in line:
+            self_time, _, name = line[len("import time:") :].split("|")
+            if self_time.strip().isdigit():
+                self_times[name.strip()] = int(self_time)
+
+    assert not {"pandas", "numpy.core", "pyproj", "shapely"} & set(self_times)
+    own = sum(
+        time
+        for name, time in self_times.items()
+        if name == "simulator" or name.startswith("simulator.")
+    )
+    assert own < 100_000  # About 10 ms on a laptop
@@ -0,0 +1,41 @@
+def test_partitioned_run_matches_single_state(tmp_path):
+    import datetime
+    import numpy as np
+    from simulator.partition import PartitionedSimulation
+    from simulator.scenario_generator import generate
+    from simulator.state import State
+
+    generate(tmp_path, 100, seed=1)
+    single = State.load(tmp_path, compiled=False)
+    single.conflict_ticks = 1
+    state = State.load(tmp_path, compiled=False)
+    state.conflict_ticks = 1
+    split = PartitionedSimulation(state, 3)
+
+    try:
+        for seconds in [7.3, 60.0, 52.9]:
+            single.evolve(datetime.timedelta(seconds=seconds))
+            split.evolve(datetime.timedelta(seconds=seconds))
+        merged = split.gather()
+        sizes = split.worker_sizes()
+        data = split.dynamic_data(format="columns")
+    finally:
+        split.close()
+
+    assert split.handoffs > 0
+    assert sum(sizes) == 100
+    assert (merged.time, merged.tick, merged.extra_time) == (
+        single.time,
+        single.tick,
+        single.extra_time,
+    )
+    assert merged.aircraft_store.callsigns == single.aircraft_store.callsigns
+    for name in ["lat", "lon", "flight_level", "heading", "speed"]:
+        assert np.array_equal(merged.aircraft_store[name], single.aircraft_store[name])
+    assert np.array_equal(
+        merged.aircraft_store.history.positions(),
+        single.aircraft_store.history.positions(),
+    )
+    assert len(single.conflicts["first"]) > 0
+    assert np.array_equal(merged.conflicts["first"], single.conflicts["first"])
+    assert list(data["aircraft"]["callsign"]) == single.aircraft_store.callsigns
@@ -0,0 +1,139 @@
+class FakeClock:
+    """
+    A monotonic clock that only moves when slept on, or when advanced by hand.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []  # Delays slept for, in order
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    async def sleep(self, delay: float):
+        import asyncio
+
+        self.sleeps.append(delay)
+        self.now += max(delay, 0.0)
+        await asyncio.sleep(0)
+
+
+def test_driver_keeps_simulated_time_locked_to_wall_clock():
+    import asyncio
+    from simulator import Simulator
+    from simulator.realtime import RealtimeDriver
+
+    clock = FakeClock()
+    sim = Simulator("Basic", "Mission1")
+    start_time = sim.state.time
+    evolve = sim.evolve
+    ticks = []
+
+    def timed_evolve(delta):
+        ticks.append((clock(), delta))
+        if len(ticks) == 3:
+            clock.advance(0.75)  # Overruns the update period
+        return evolve(delta)
+
+    sim.evolve = timed_evolve
+    driver = RealtimeDriver(
+        sim, update_period=0.25, rate_of_time=8.0, clock=clock, sleep=clock.sleep
+    )
+
+    asyncio.run(driver.run(duration=4.0))
+
+    # The first tick owes nothing, the missed deadlines are skipped, and the next tick catches up
+    assert ticks[:4] == [(0.25, 2.0), (0.5, 2.0), (0.75, 2.0), (1.75, 8.0)]
+    assert ticks[4:] == [(0.25 * n, 2.0) for n in range(8, 16)]
+    assert clock.sleeps == [0.25] * 13
+    assert driver.ticks == 13
+    assert driver.overruns == 1
+    assert (sim.state.time - start_time).total_seconds() == 30.0
+
+
+def test_changing_the_rate_of_time_does_not_jump_simulated_time():
+    import asyncio
+    from simulator import Simulator
+    from simulator.realtime import RealtimeDriver
+
+    clock = FakeClock()
+    sim = Simulator("Basic", "Mission1")
+    start_time = sim.state.time
+    driver = RealtimeDriver(
+        sim, update_period=0.5, rate_of_time=2.0, clock=clock, sleep=clock.sleep
+    )
+
+    asyncio.run(driver.run(duration=2.0))
+    driver.set_rate_of_time(4.0)
+    asyncio.run(driver.run(duration=2.0))
+
+    assert driver.overruns == 0
+    assert (sim.state.time - start_time).total_seconds() == 1.5 * 2.0 + 1.5 * 4.0
+
+
+def test_slow_observers_do_not_hold_up_ticks():
+    import asyncio
+    import threading
+    from simulator import Simulator
+    from simulator.realtime import RealtimeDriver
+
+    clock = FakeClock()
+    sim = Simulator("Basic", "Mission1")
+    evolve = sim.evolve
+    evolved = []
+    released = threading.Event()
+
+    def counted_evolve(delta):
+        evolved.append(delta)
+        if len(evolved) == 4:
+            released.set()
+        return evolve(delta)
+
+    sim.evolve = counted_evolve
+    driver = RealtimeDriver(
+        sim, update_period=0.25, rate_of_time=8.0, clock=clock, sleep=clock.sleep
+    )
+    observed = []
+
+    def slow_observer(observed_sim):
+        observed.append(observed_sim)
+        # Only returns once the simulation has ticked on without it
+        released.wait(timeout=10.0)
+
+    driver.observe(slow_observer, period=1.0)
+
+    asyncio.run(driver.run(duration=4.0))
+
+    assert released.is_set()
+    assert observed and all(observed_sim is not sim for observed_sim in observed)
+    assert len(evolved) >= 4
+
+
+def test_recorders_are_hooked_to_the_live_simulator(tmp_path):
+    import asyncio
+    from simulator import Simulator
+    from simulator.realtime import RealtimeDriver
+    from simulator.recorder import Recorder, Replay
+
+    clock = FakeClock()
+    sim = Simulator("Basic", "Mission1")
+    driver = RealtimeDriver(
+        sim, update_period=0.25, rate_of_time=1.0, clock=clock, sleep=clock.sleep
+    )
+    observed = []
+    driver.observe(lambda snapshot: observed.append(snapshot.state), period=1.0)
+
+    with Recorder(tmp_path / "run") as recorder:
+        recorder.attach(sim.state)
+        asyncio.run(driver.run(duration=2.0))
+        assert len(sim.state.hooks) == 1
+
+    # Snapshots carry no hooks, so only the recorder on the live state sees the ticks
+    assert observed and all(state.hooks == [] for state in observed)
+    assert all(state is not sim.state for state in observed)
+    replay = Replay(tmp_path / "run")
+    assert len(replay) == sim.state.tick + 1
+    assert [frame["tick"] for frame in replay] == list(range(sim.state.tick + 1))
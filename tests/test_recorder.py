@@ -0,0 +1,49 @@
+def test_replay_matches_recorded_run(tmp_path):
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.recorder import Recorder, Replay
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    state.queue_actions(
+        [
+            {
+                "time": "2019-01-01 00:00:02",
+                "agent": "human",
+                "callsign": "FLY456",
+                "kind": "speed",
+                "subkind": "absolute",
+                "value": "230",
+            }
+        ]
+    )
+
+    expected = {}
+    with Recorder(tmp_path / "run", every=2, chunk_frames=4) as recorder:
+        recorder.attach(state)
+        for _ in range(9):
+            state.evolve(datetime.timedelta(seconds=0.25))
+            expected[state.tick] = state.aircraft_store["lat"].copy()
+    assert state.hooks == []
+
+    replay = Replay(tmp_path / "run")
+    assert len(replay) == 10
+    for tick, lat in expected.items():
+        frame = replay.seek(tick=tick)
+        assert frame["tick"] == tick
+        assert np.array_equal(frame["aircraft"]["lat"], lat)
+        assert frame["callsigns"] == state.aircraft_store.callsigns
+
+    frame = replay.seek(time=datetime.datetime(2019, 1, 1, 0, 0, 1, 100000))
+    assert frame["tick"] == 10
+    assert replay.seek(tick=1000) is None
+
+    frames = list(replay.frames(tick=5, end_tick=15))
+    assert [frame["tick"] for frame in frames] == [6, 8, 10, 12, 14]
+    actions = [
+        (frame["tick"], action) for frame in replay for action in frame["actions"]
+    ]
+    assert len(actions) == 1 and actions[0][0] == 18
+    assert actions[0][1]["callsign"] == "FLY456" and actions[0][1]["value"] == 230.0
@@ -0,0 +1,51 @@
+def test_compiled_load_matches_source(tmp_path, monkeypatch):
+    import datetime
+    import numpy as np
+    import os
+    import shutil
+    import time
+    from simulator import scenario_cache, settings
+    from simulator.state import State
+
+    scenario_dir = tmp_path / "Mission2"
+    shutil.copytree(
+        os.path.join(settings.SCENARIO_DIR, "Basic", "Mission2"), scenario_dir
+    )
+    past = time.time() - 60.0
+    for name in scenario_cache.SOURCES:
+        os.utime(scenario_dir / name, (past, past))
+
+    parsed = State.load(scenario_dir, compiled=False)
+    State.load(scenario_dir)
+    assert (scenario_dir / ".compiled" / "manifest.json").exists()
+    cached = State.load(scenario_dir)
+
+    assert cached.aircraft.equals(parsed.aircraft)
+    assert cached.actions.equals(parsed.actions)
+    assert cached.fixes.equals(parsed.fixes)
+    assert cached.bay_names == parsed.bay_names
+    assert cached.sectors["agent"].equals(parsed.sectors["agent"])
+    for name, values in parsed.sector_index.to_arrays().items():
+        assert np.array_equal(getattr(cached.sector_index, name), values)
+    assert all(airspace._areas is None for airspace in cached.sectors["airspace"])
+
+    # Sources older than the cache are not hashed while their stats are unchanged
+    def fail(_):
+        raise AssertionError("Sources hashed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(scenario_cache, "source_hash", fail)
+        assert State.load(scenario_dir).aircraft.equals(parsed.aircraft)
+
+    for state in [parsed, cached]:
+        state.evolve(datetime.timedelta(seconds=10.0))
+    assert cached.aircraft.equals(parsed.aircraft)
+
+    # Touching a source file without changing it keeps the cache, and editing one invalidates it
+    os.utime(scenario_dir / "fixes.csv")
+    assert State.load(scenario_dir).fixes.equals(parsed.fixes)
+    aircraft_csv = scenario_dir / "aircraft.csv"
+    aircraft_csv.write_text(aircraft_csv.read_text().replace("100.0", "120.0", 1))
+    assert State.load(scenario_dir).aircraft.equals(
+        State.load(scenario_dir, compiled=False).aircraft
+    )
@@ -0,0 +1,24 @@
+def test_generated_scenario_loads(tmp_path):
+    import datetime
+    import numpy as np
+    from simulator import scenario_generator
+    from simulator.state import State
+
+    scenario_generator.generate(tmp_path / "scenario", 200, num_actions=50, seed=1)
+    state = State.load(tmp_path / "scenario", compiled=False)
+
+    assert len(state.aircraft_store) == 200
+    assert len(state.action_queue) == 50
+    assert all(len(airspace.vols) == 2 for airspace in state.sectors["airspace"])
+    fixes = set(state.fixes.index)
+    assert all(set(route) <= fixes for route in state.aircraft_store["route"])
+
+    # Every aircraft starts in some sector
+    sectors, _ = state.sector_index.locate(
+        state.aircraft_store["lat"],
+        state.aircraft_store["lon"],
+        state.aircraft_store["flight_level"],
+    )
+    assert np.all(sectors >= 0)
+
+    state.evolve(datetime.timedelta(minutes=1))
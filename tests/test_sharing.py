@@ -0,0 +1,29 @@
+def test_shared_aircraft_follow_evolve():
+    import numpy as np
+    from simulator import Simulator
+    from simulator.sharing import SharedAircraftReader
+
+    sim = Simulator("Basic", "Mission1")
+    name = sim.share()
+    reader = SharedAircraftReader(name)
+
+    try:
+        first = reader.snapshot()
+        sim.evolve(30.0)
+        second = reader.snapshot()
+        rows = len(sim.state.aircraft_store)
+        assert np.array_equal(
+            reader.columns["lat"][:rows], sim.state.aircraft_store["lat"]
+        )
+    finally:
+        sim.unshare()
+        reader.close()
+
+    store = sim.state.aircraft_store
+    assert first["sequence"] % 2 == 0 and second["sequence"] > first["sequence"]
+    assert second["tick"] == sim.state.tick
+    assert second["time"] == np.datetime64(sim.state.time, "ns")
+    assert second["callsigns"] == store.callsigns
+    for column in ["lat", "lon", "flight_level", "heading", "speed"]:
+        assert np.array_equal(second[column], store[column])
+    assert not np.array_equal(first["lat"], second["lat"])
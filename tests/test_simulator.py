@@ -0,0 +1,127 @@
+def test_dynamic_data_formats_agree():
+    from simulator import Simulator
+
+    sim = Simulator("Basic", "Mission1")
+    sim.evolve(2.0)
+    records = sim.dynamic_data()
+    columns = sim.dynamic_data(format="columns")
+
+    assert records["aircraft"][0]["route"] == ["a", "b", "c", "d"]
+    for n, aircraft in enumerate(records["aircraft"]):
+        assert aircraft["callsign"] == columns["aircraft"]["callsign"][n]
+        assert aircraft["lats"] == columns["aircraft"]["lats"][n].tolist()
+        assert aircraft["lons"] == columns["aircraft"]["lons"][n].tolist()
+        assert aircraft["lons"][0] == aircraft["lon"]
+    for n, action in enumerate(records["actions"]):
+        assert action["time"] == columns["actions"]["time"][n]
+
+
+def test_dynamic_data_since_rebuilds_full_data():
+    from simulator import Simulator
+
+    sim = Simulator("Basic", "Mission1")
+    data = sim.dynamic_data()
+    client = {}
+    for aircraft in data["aircraft"]:
+        del aircraft["id"]
+        client[aircraft.pop("callsign")] = aircraft
+    version = data["version"]
+
+    sim.evolve(2.0)
+    sim.update_aircraft_bay(None, "BAW123", "OUTCOMM")
+    sim.state.remove_aircraft(sim.state.aircraft_store.callsigns[-1])
+    sim.evolve(2.0)
+
+    delta = sim.dynamic_data_since(version)
+    assert not delta["full"]
+    for aircraft in delta["aircraft"]:
+        client[aircraft.pop("callsign")].update(aircraft)
+    for callsign in delta["removed"]:
+        del client[callsign]
+
+    full = sim.dynamic_data()
+    assert delta["version"] == full["version"]
+    for aircraft in full["aircraft"]:
+        del aircraft["id"]
+        assert client[aircraft.pop("callsign")] == aircraft
+    assert len(client) == len(full["aircraft"])
+
+    snapshot = sim.state.snapshot()
+    sim.state.restore(snapshot)
+    assert sim.dynamic_data_since(delta["version"])["full"]
+
+
+def test_static_data_cached_until_changed():
+    import json
+    from simulator import Simulator
+
+    sim = Simulator("Basic", "Mission1")
+    static = sim.static_data()
+    assert sim.static_data() is static
+    assert json.loads(sim.static_data_json()) == static
+
+    sim.state.bay_names.append("HOLD")
+    assert sim.static_data() is not static
+    assert sim.static_data()["bay_names"][-1] == "HOLD"
+
+
+def test_stats_profile_each_phase():
+    from simulator import Simulator, settings
+
+    sim = Simulator("Basic", "Mission1")
+    assert sim.stats() is None
+
+    sim.profile()
+    sim.evolve(1.0)
+    sim.dynamic_data()
+    stats = sim.stats()
+
+    steps = round(1.0 / settings.TIME_STEP_DELTA.total_seconds())
+    for phase in [
+        "process_action_queue",
+        "rotate_aircraft",
+        "accelerate_aircraft",
+        "move_aircraft_laterally",
+        "move_aircraft_vertically",
+    ]:
+        assert stats["phases"][phase]["calls"] == steps
+    assert stats["latencies"]["evolve"]["count"] == 1
+    assert stats["latencies"]["dynamic_data"]["count"] == 1
+
+    sim.profile(enabled=False)
+    assert sim.stats() is None
+
+
+def test_adaptive_stepping_gives_the_same_dynamic_data():
+    import numpy as np
+    from simulator import Simulator
+
+    fixed = Simulator("Basic", "Mission1")
+    fixed.action(
+        [
+            {
+                "time": "2019-01-01 00:00:30",
+                "agent": "human",
+                "callsign": "BAW123",
+                "kind": "heading",
+                "subkind": "absolute",
+                "value": "90.0",
+            }
+        ]
+    )
+    adaptive = fixed.fork()
+    adaptive.state.stepping = "adaptive"
+    for sim in [fixed, adaptive]:
+        sim.evolve(5.0)
+        sim.evolve(300.0)
+
+    expected = fixed.dynamic_data(format="columns")["aircraft"]
+    aircraft = adaptive.dynamic_data(format="columns")["aircraft"]
+    assert aircraft.keys() == expected.keys()
+    for name, values in expected.items():
+        if values.dtype.kind == "f":
+            assert np.allclose(aircraft[name], values, atol=1e-5), name
+        else:
+            assert aircraft[name].tolist() == values.tolist(), name
+    for name in ["turn", "rise", "acceleration"]:
+        assert np.array_equal(aircraft[name] == 0.0, np.abs(expected[name]) < 1e-5)
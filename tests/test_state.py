@@ -0,0 +1,515 @@
+def test_restore_is_deterministic():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    state.evolve(datetime.timedelta(seconds=3.0))
+    snapshot = state.snapshot()
+
+    state.evolve(datetime.timedelta(seconds=10.0))
+    lats = state.aircraft_store["lat"].copy()
+    tick = state.tick
+
+    state.restore(snapshot)
+    state.queue_actions(
+        [
+            {
+                "time": "2019-01-01 00:00:04",
+                "agent": "human",
+                "callsign": "BAW123",
+                "kind": "heading",
+                "subkind": "absolute",
+                "value": "90.0",
+            }
+        ]
+    )
+    state.evolve(datetime.timedelta(seconds=10.0))
+    assert not np.array_equal(state.aircraft_store["lat"], lats)
+
+    state.restore(snapshot)
+    state.evolve(datetime.timedelta(seconds=10.0))
+    assert np.array_equal(state.aircraft_store["lat"], lats)
+    assert state.tick == tick
+
+
+def test_fork_shares_static_data():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission2"))
+    fork = state.fork()
+    fork.remove_aircraft("NAX123")
+    fork.evolve(datetime.timedelta(seconds=5.0))
+
+    assert fork.sectors is state.sectors
+    assert len(state.aircraft_store) == 3
+    assert state.tick == 0
+    assert np.array_equal(state.aircraft_store["lat"][:2], [44.922, 44.927])
+
+
+def test_conflicts_match_pairwise_check():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.conflicts import ConflictDetector
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    state.conflict_detector = ConflictDetector(lateral=0.5, vertical=10.0)
+    state.conflict_ticks = 1
+    for _ in range(20):
+        state.evolve(datetime.timedelta(seconds=3.0))
+
+        store = state.aircraft_store
+        first, second = np.triu_indices(len(store), 1)
+        dy = (store["lat"][second] - store["lat"][first]) * 60.0
+        dx = (
+            (store["lon"][second] - store["lon"][first])
+            * 60.0
+            * np.cos(np.radians(0.5 * (store["lat"][first] + store["lat"][second])))
+        )
+        conflicts = (np.hypot(dx, dy) < 0.5) & (
+            np.abs(store["flight_level"][second] - store["flight_level"][first]) < 10.0
+        )
+        assert state.conflicts["first"].tolist() == first[conflicts].tolist()
+        assert state.conflicts["second"].tolist() == second[conflicts].tolist()
+
+
+def test_restore_brings_back_conflicts():
+    import datetime
+    import os
+    from simulator import settings
+    from simulator.conflicts import ConflictDetector
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    state.conflict_detector = ConflictDetector(lateral=0.5, vertical=10.0)
+    state.conflict_ticks = 1000
+    state.detect_conflicts()
+    snapshot = state.snapshot()
+    conflicts = state.conflicts["first"].tolist()
+
+    store = state.aircraft_store
+    state.add_aircraft(
+        "TST001",
+        agent="human",
+        **{
+            name: store.get("BAW123", name)
+            for name in ["lat", "lon", "flight_level", "heading", "speed"]
+        },
+        target_flight_level=store.get("BAW123", "flight_level"),
+        target_heading=store.get("BAW123", "heading"),
+        target_speed=store.get("BAW123", "speed"),
+        rise=0.0,
+        max_rise_rate=1.0,
+        turn=0.0,
+        max_turn_rate=1.0,
+        acceleration=0.0,
+        max_acceleration=20.0,
+    )
+    state.evolve(datetime.timedelta(seconds=1.0))
+    state.detect_conflicts()
+    assert len(state.conflicts["first"]) > len(conflicts)
+
+    state.restore(snapshot)
+    assert state.conflicts["first"].tolist() == conflicts
+    assert state.conflicts["callsigns"] == state.aircraft_store.callsigns
+
+
+def test_action_queue_keeps_time_order():
+    from simulator.actions import ActionQueue
+
+    def records(*callsigns):
+        return {
+            "agent": ["human"] * len(callsigns),
+            "callsign": list(callsigns),
+            "kind": ["heading"] * len(callsigns),
+            "subkind": ["absolute"] * len(callsigns),
+            "value": [90.0] * len(callsigns),
+        }
+
+    queue = ActionQueue()
+    queue.extend([10, 30, 20], records("A", "C", "B"))
+    queue.extend([20, 20], records("B2", "B3"), version=1)
+    assert queue.times == [10, 20, 20, 20, 30]
+    assert queue.records["callsign"] == ["A", "B", "B2", "B3", "C"]
+    assert queue.reordered == 1
+
+    assert [queue.record(n)["callsign"] for n in queue.due(0, 15)] == ["A"]
+    copy = queue.copy()
+
+    # Inserting before the cursor moves it on, and the late action is never due
+    queue.extend([5, 25], records("Z", "D"))
+    assert queue.records["callsign"][queue.cursor] == "B"
+    due = [queue.record(n)["callsign"] for n in queue.due(15, 25)]
+    assert due == ["B", "B2", "B3"]
+    due = [queue.record(n)["callsign"] for n in queue.due(25, 40)]
+    assert due == ["D", "C"]
+    assert list(queue.due(40, 50)) == []
+
+    # The copy keeps its own cursor and lists
+    queue.consume(1, 2)
+    assert copy.records["callsign"] == ["A", "B", "B2", "B3", "C"]
+    assert copy.consumed == [-1] * 5
+    due = [copy.record(n)["callsign"] for n in copy.due(15, 25)]
+    assert due == ["B", "B2", "B3"]
+
+
+def test_actions_are_delivered_once_on_time():
+    import datetime
+    import os
+    import pandas as pd
+    from simulator import settings
+    from simulator.state import State
+
+    path = os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1")
+    state = State.load(path)
+    expected = pd.read_csv(os.path.join(path, "actions.csv"), skipinitialspace=True)
+    expected["time"] = pd.to_datetime(expected["time"], format=settings.TIME_FORMAT)
+    pd.testing.assert_frame_equal(state.actions, expected.set_index("time"))
+
+    state.evolve(datetime.timedelta(seconds=10.0))
+    heading = state.aircraft_store.get("BAW123", "target_heading")
+    num_aircraft = len(state.aircraft_store)
+
+    def action(delay: float, callsign: str, value: str) -> dict:
+        return {
+            "time": (state.time + datetime.timedelta(seconds=delay)).strftime(
+                settings.TIME_FORMAT
+            ),
+            "agent": "human",
+            "callsign": callsign,
+            "kind": "heading",
+            "subkind": "relative",
+            "value": value,
+        }
+
+    state.queue_actions(
+        [
+            action(0.0, "BAW123", "10"),
+            action(-2.0, "BAW123", "100"),
+            action(0.0, "XXX999", "10"),
+        ]
+    )
+    assert state.actions.index[-1] == state.time
+    assert state.actions["callsign"].tolist()[-2:] == ["BAW123", "XXX999"]
+
+    # Evolves shorter than a tick deliver due actions once, and never those in the past
+    for _ in range(4):
+        state.evolve(datetime.timedelta(seconds=0.05))
+    assert state.aircraft_store.get("BAW123", "target_heading") == heading + 10.0
+    assert len(state.aircraft_store) == num_aircraft
+    assert "XXX999" not in state.aircraft_store
+
+
+def test_actions_may_leave_out_fields():
+    import datetime
+    import os
+    from simulator import settings
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    state.queue_actions(
+        [
+            {
+                "time": "2019-01-01 00:00:01",
+                "callsign": "FLY456",
+                "kind": "speed",
+                "subkind": "absolute",
+                "value": "230",
+            }
+        ]
+    )
+    assert state.action_queue.records["agent"].count(None) == 1
+
+    state.evolve(datetime.timedelta(seconds=2.0))
+    assert state.aircraft_store.get("FLY456", "target_speed") == 230.0
+
+
+def test_predict_matches_evolve():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    state.queue_actions(
+        [
+            {
+                "time": "2019-01-01 00:00:03",
+                "agent": "human",
+                "callsign": "BAW123",
+                "kind": "heading",
+                "subkind": "relative",
+                "value": "-100",
+            },
+            {
+                "time": "2019-01-01 00:00:04",
+                "agent": "human",
+                "callsign": "BAW123",
+                "kind": "flight_level",
+                "subkind": "relative",
+                "value": "-15",
+            },
+        ]
+    )
+    step = datetime.timedelta(seconds=10.0)
+    predicted = state.predict(
+        datetime.timedelta(minutes=2), step, resolution=settings.TIME_STEP_DELTA
+    )
+
+    store = state.aircraft_store
+    for n in range(predicted.shape[1]):
+        state.evolve(step)
+        actual = np.stack([store["lat"], store["lon"], store["flight_level"]], axis=-1)
+        assert np.allclose(predicted[:, n], actual, atol=1e-6)
+
+
+def test_routes_turn_the_shorter_way():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import kinematics, settings
+    from simulator.state import State
+
+    assert kinematics.turn_rate(0.0, 341.0, 3.0) > 0.0
+    assert kinematics.turn_rate(0.0, 341.0, 3.0, shortest_turn=True) < 0.0
+    assert kinematics.turn_rate(341.0, 0.0, 3.0, shortest_turn=True) > 0.0
+    assert kinematics.heading_difference(350.0, 10.0) == 20.0
+
+    # A turn from 000 to 341 goes right as it always has, and left when steering along routes
+    for lnav_ticks in [0, 8]:
+        state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+        state.lnav_ticks = lnav_ticks
+        state.add_aircraft(
+            "TST001",
+            agent="human",
+            lat=51.3,
+            lon=0.3,
+            flight_level=100.0,
+            target_flight_level=100.0,
+            heading=0.0,
+            target_heading=341.0,
+            speed=200.0,
+            target_speed=200.0,
+            rise=0.0,
+            max_rise_rate=1.0,
+            turn=0.0,
+            max_turn_rate=3.0,
+            acceleration=0.0,
+            max_acceleration=20.0,
+        )
+        step = datetime.timedelta(seconds=2.0)
+        predicted = state.predict(
+            datetime.timedelta(seconds=20), step, resolution=settings.TIME_STEP_DELTA
+        )
+
+        store = state.aircraft_store
+        for n in range(predicted.shape[1]):
+            state.evolve(step)
+            actual = [store["lat"][-1], store["lon"][-1], store["flight_level"][-1]]
+            assert np.allclose(predicted[-1, n], actual, atol=1e-6)
+        if lnav_ticks:
+            assert 341.0 <= store.get("TST001", "heading") < 360.0
+            assert store.get("TST001", "lon") < 0.3
+        else:
+            assert 0.0 < store.get("TST001", "heading") <= 90.0
+            assert store.get("TST001", "lon") > 0.3
+
+
+def test_fast_geodesy_follows_exact():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.state import State
+
+    exact = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    exact.geodesy = "exact"
+    fast = exact.fork()
+    fast.geodesy = "fast"
+
+    exact.evolve(datetime.timedelta(minutes=10))
+    fast.evolve(datetime.timedelta(minutes=10))
+
+    _, _, drift = exact.geod.inv(
+        exact.aircraft_store["lon"],
+        exact.aircraft_store["lat"],
+        fast.aircraft_store["lon"],
+        fast.aircraft_store["lat"],
+    )
+    assert np.abs(drift).max() < 0.01
+
+
+def test_aircraft_follow_routes():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    state.lnav_ticks = 8
+    kinematics = dict(
+        agent="human",
+        lat=51.3,
+        lon=0.3,
+        flight_level=100.0,
+        target_flight_level=100.0,
+        heading=0.0,
+        target_heading=0.0,
+        speed=200.0,
+        target_speed=200.0,
+        rise=0.0,
+        max_rise_rate=1.0,
+        turn=0.0,
+        max_turn_rate=1.0,
+        acceleration=0.0,
+        max_acceleration=20.0,
+    )
+    state.add_aircraft("TST001", route=["d", "a"], **kinematics)
+    state.add_aircraft("TST002", route=["d", "a"], **kinematics)
+    state.queue_actions(
+        [
+            {
+                "time": (state.time + datetime.timedelta(minutes=1)).strftime(
+                    settings.TIME_FORMAT
+                ),
+                "agent": "human",
+                "callsign": "TST002",
+                "kind": "heading",
+                "subkind": "absolute",
+                "value": "270.0",
+            }
+        ]
+    )
+
+    # Fly past D then A, in order, without flying the route given a heading
+    fixes = state.fixes.loc[["D", "A"]]
+    closest = []
+    for _ in range(60):
+        state.evolve(datetime.timedelta(seconds=10))
+        _, _, distances = state.geod.inv(
+            np.full(2, state.aircraft_store.get("TST001", "lon")),
+            np.full(2, state.aircraft_store.get("TST001", "lat")),
+            fixes["lon"].to_numpy(),
+            fixes["lat"].to_numpy(),
+        )
+        closest.append(distances)
+    closest = np.array(closest)
+    assert (closest.min(axis=0) < 1852.0).all()
+    assert closest[:, 0].argmin() < closest[:, 1].argmin()
+    assert state.route_follower.active_fixes()[-2] == -1
+    assert state.aircraft_store.get("TST002", "target_heading") == 270.0
+
+
+def test_adaptive_stepping_follows_fixed():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.state import State
+
+    fixed = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    fixed.conflict_ticks = 0
+    fixed.queue_actions(
+        [
+            {
+                "time": "2019-01-01 00:02:00",
+                "agent": "human",
+                "callsign": "BAW123",
+                "kind": "heading",
+                "subkind": "absolute",
+                "value": "90.0",
+            }
+        ]
+    )
+    adaptive = fixed.fork()
+    adaptive.stepping = "adaptive"
+
+    for _ in range(10):
+        fixed.evolve(datetime.timedelta(seconds=61.3))
+        adaptive.evolve(datetime.timedelta(seconds=61.3))
+
+    assert adaptive.time == fixed.time
+    assert adaptive.tick == fixed.tick
+    assert adaptive.extra_time == fixed.extra_time
+    _, _, drift = fixed.geod.inv(
+        fixed.aircraft_store["lon"],
+        fixed.aircraft_store["lat"],
+        adaptive.aircraft_store["lon"],
+        adaptive.aircraft_store["lat"],
+    )
+    assert np.abs(drift).max() < 1.0
+    assert np.allclose(
+        adaptive.aircraft_store["heading"], fixed.aircraft_store["heading"], atol=1e-5
+    )
+    assert np.allclose(
+        adaptive.aircraft_store.history.positions(),
+        fixed.aircraft_store.history.positions(),
+        atol=1e-5,
+    )
+
+
+def test_compact_schema_keeps_values():
+    import datetime
+    import numpy as np
+    import os
+    from simulator import settings
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    compact = state.fork()
+    compact.compact(float32=True)
+
+    callsigns = state.aircraft_store.callsigns[:2]
+    for s in [state, compact]:
+        s.update_aircraft_bays(callsigns, "OUTCOMM")
+        s.evolve(datetime.timedelta(seconds=10.0))
+
+    for name in ["type", "agent", "bay", "route"]:
+        assert (
+            state.aircraft_store[name].tolist() == compact.aircraft_store[name].tolist()
+        )
+    assert np.allclose(
+        state.aircraft_store["heading"], compact.aircraft_store["heading"], atol=1e-3
+    )
+    assert set(compact.memory_usage()) == {
+        "aircraft",
+        "versions",
+        "history",
+        "fixes",
+        "sectors",
+        "actions",
+    }
+
+
+def test_aircraft_frame_is_read_only():
+    import os
+    import pytest
+    from simulator import settings
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", "Mission1"))
+    compact = state.fork()
+    compact.compact()
+    for state in [state, compact]:
+        aircraft = state.aircraft
+        with pytest.raises(ValueError, match="read-only"):
+            aircraft.loc["BAW123", "speed"] = 100.0
+        with pytest.raises(ValueError, match="read-only"):
+            aircraft.loc["BAW123", "bay"] = aircraft.loc["FLY456", "bay"]
+        assert state.aircraft_store.get("BAW123", "speed") != 100.0
+
+        # Changes go through the state, and show in the next frame
+        state.update_aircraft("BAW123", speed=100.0)
+        assert state.aircraft.loc["BAW123", "speed"] == 100.0
+        assert aircraft.copy().loc["BAW123", "speed"] != 100.0
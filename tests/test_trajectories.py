@@ -0,0 +1,86 @@
+"""
+Golden trajectories of the bundled scenarios, to catch any change to the kinematics.
+The baselines in data/trajectories.npz were recorded before the kinematics were vectorised, and must match bit for bit.
+Run this file to record them afresh after a deliberate change to the trajectories.
+"""
+
+import os
+
+FIELDS = ["lat", "lon", "flight_level", "heading", "speed"]
+BASELINES = os.path.join(os.path.dirname(__file__), "data", "trajectories.npz")
+
+
+def _trajectory(scenario_name: str):
+    """
+    Fields of every aircraft after each of 20 evolves of 7.3 s, with turns, a speed change and a descent given along the way.
+    The turn from 000 to 300 is over 180 degrees, which has always been flown to the right.
+    """
+
+    import datetime
+    import numpy as np
+    from simulator import settings
+    from simulator.state import State
+
+    state = State.load(os.path.join(settings.SCENARIO_DIR, "Basic", scenario_name))
+    state.geodesy = "exact"
+    state.stepping = "fixed"
+    state.lnav_ticks = 0
+    callsigns = state.aircraft_store.callsigns
+    state.queue_actions(
+        [
+            {
+                "time": time,
+                "agent": "human",
+                "callsign": callsign,
+                "kind": kind,
+                "subkind": subkind,
+                "value": value,
+            }
+            for time, callsign, kind, subkind, value in [
+                ("2019-01-01 00:00:12", callsigns[0], "heading", "relative", "-60"),
+                ("2019-01-01 00:00:20", callsigns[-1], "speed", "relative", "-30"),
+                (
+                    "2019-01-01 00:00:30",
+                    callsigns[0],
+                    "flight_level",
+                    "relative",
+                    "-40",
+                ),
+                ("2019-01-01 00:00:40", callsigns[1], "heading", "absolute", "300"),
+            ]
+        ]
+    )
+
+    trajectory = []
+    for _ in range(20):
+        state.evolve(datetime.timedelta(seconds=7.3))
+        store = state.aircraft_store
+        trajectory.append(np.stack([store[name] for name in FIELDS], axis=-1))
+
+    return np.array(trajectory, dtype=np.float64)
+
+
+def test_trajectories_match_baselines():
+    import datetime
+    import numpy as np
+    from simulator import settings
+
+    baselines = np.load(BASELINES)
+    assert settings.TIME_STEP_DELTA == datetime.timedelta(
+        milliseconds=int(baselines["time_step_ms"])
+    )
+    for scenario_name in ["Mission1", "Mission2"]:
+        assert np.array_equal(_trajectory(scenario_name), baselines[scenario_name])
+
+
+if __name__ == "__main__":
+    import datetime
+    import numpy as np
+    from simulator import settings
+
+    np.savez(
+        BASELINES,
+        time_step_ms=settings.TIME_STEP_DELTA // datetime.timedelta(milliseconds=1),
+        Mission1=_trajectory("Mission1"),
+        Mission2=_trajectory("Mission2"),
+    )